@@ -0,0 +1,378 @@
+import os
+import re
+import json
+import time
+import threading
+
+from backend.ai.text import normalize
+
+# --------------------------------------------------
+# CATÁLOGO DE SERVIÇOS
+# --------------------------------------------------
+# Índices montados uma vez a partir de data/price_list.json:
+#
+#   numeração  → lista na ordem do menu (número exibido - 1 = posição)
+#   categorias → serviços agrupados na ordem de CATEGORY_ORDER
+#   nomes      → dict nome normalizado → serviço (match exato)
+#   tokens     → índice invertido token → serviços que o contêm
+#   trigramas  → índice trigrama → tokens do vocabulário (typos: "sobrancelia")
+#
+# A busca só olha os serviços que compartilham algum token com a mensagem,
+# então o custo cresce com o tamanho da mensagem, não com o do catálogo.
+#
+# O catálogo em uso vem de get_catalog() (ver CatalogProvider no fim do
+# arquivo), que recarrega o price_list.json quando ele muda em disco.
+
+CATEGORY_ORDER = [
+    "Depilação",
+    "Estética Facial",
+    "Cílios & Sobrancelhas",
+    "Design na Linha",
+    "Tratamentos Corporais",
+    "Nail Designer",
+    "Manicure & Pedicure"
+]
+
+STOPWORDS = frozenset([
+    "a", "o", "e", "de", "da", "do", "das", "dos", "na", "no", "nas", "nos",
+    "em", "com", "para", "pra", "por", "um", "uma",
+])
+
+# Similaridade mínima (Dice sobre trigramas) para aceitar um token com typo
+FUZZY_THRESHOLD = 0.5
+FUZZY_MIN_LENGTH = 4
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+def default_catalog_path() -> str:
+    base_dir = os.path.dirname(os.path.abspath(__file__))
+    project_root = os.path.abspath(os.path.join(base_dir, "..", ".."))
+    return os.path.join(project_root, "data", "price_list.json")
+
+def load_services_file(file_path: str) -> list:
+    with open(file_path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    return data["services"]
+
+def _stem(token: str) -> str:
+    # Plural simples: "axilas" → "axila", "pernas" → "perna"
+    if len(token) > 3 and token.endswith("s"):
+        return token[:-1]
+    return token
+
+def tokenize(normalized_text: str) -> list:
+    """Tokens significativos (sem stopwords, plural simples removido)."""
+    return [
+        _stem(token)
+        for token in _TOKEN_RE.findall(normalized_text)
+        if token not in STOPWORDS
+    ]
+
+def _trigrams(token: str) -> frozenset:
+    padded = f" {token} "
+    return frozenset(padded[i:i + 3] for i in range(len(padded) - 2))
+
+class ServiceCatalog:
+    """
+    Catálogo imutável de serviços com índices para busca por número,
+    nome exato, tokens e tokens aproximados (typos).
+    """
+
+    def __init__(self, services: list, category_order: list = None, version: int = 0):
+        category_order = category_order or CATEGORY_ORDER
+        self.version = version
+
+        grouped = {}
+        for service in services:
+            grouped.setdefault(service.get("category", "Outros"), []).append(service)
+
+        # Categorias conhecidas primeiro, depois as novas (na ordem do arquivo)
+        ordered = [c for c in category_order if c in grouped]
+        ordered += [c for c in grouped if c not in category_order]
+
+        self.categories = {category: grouped[category] for category in ordered}
+        self.services = [service for category in ordered for service in grouped[category]]
+
+        self._names = [normalize(service["name"]) for service in self.services]
+        self._name_tokens = [frozenset(tokenize(name)) for name in self._names]
+
+        self._durations = {
+            service["name"]: service.get("duration_minutes", 30) for service in self.services
+        }
+
+        self._by_name = {}
+        for position, name in enumerate(self._names):
+            self._by_name.setdefault(name, position)
+
+        self._token_index = {}
+        for position, tokens in enumerate(self._name_tokens):
+            for token in tokens:
+                self._token_index.setdefault(token, []).append(position)
+
+        # Cada nome também entra no índice pelo seu token mais raro: para o
+        # nome estar inteiro na mensagem, esse token precisa estar nela, então
+        # o match estrito só visita listas curtas mesmo com tokens comuns
+        # ("virilha", "comum") espalhados pelo catálogo.
+        self._anchor_index = {}
+        for position, tokens in enumerate(self._name_tokens):
+            if tokens:
+                anchor = min(tokens, key=lambda token: (len(self._token_index[token]), token))
+                self._anchor_index.setdefault(anchor, []).append(position)
+
+        self._vocabulary_trigrams = {}
+        self._trigram_index = {}
+        for token in self._token_index:
+            grams = _trigrams(token)
+            self._vocabulary_trigrams[token] = grams
+            for gram in grams:
+                self._trigram_index.setdefault(gram, []).append(token)
+
+    @classmethod
+    def from_file(cls, file_path: str = None, version: int = 0):
+        return cls(load_services_file(file_path or default_catalog_path()), version=version)
+
+    def __len__(self):
+        return len(self.services)
+
+    # --------------------------------------------------
+    # BUSCA
+    # --------------------------------------------------
+
+    def by_number(self, number: int):
+        """Serviço pelo número exibido no menu (1-indexado)."""
+        if 1 <= number <= len(self.services):
+            return self.services[number - 1]
+        return None
+
+    def duration_of(self, service_name: str, default: int = 30) -> int:
+        """Duração em minutos pelo nome exato do serviço (como gravado na agenda)."""
+        return self._durations.get(service_name, default)
+
+    def number_of(self, service: dict):
+        """Número do serviço no menu (1-indexado) ou None."""
+        position = self._by_name.get(normalize(service["name"]))
+        return position + 1 if position is not None else None
+
+    def _fuzzy_tokens(self, token: str) -> dict:
+        """Tokens do vocabulário parecidos com `token` → similaridade."""
+        if len(token) < FUZZY_MIN_LENGTH:
+            return {}
+
+        grams = _trigrams(token)
+        shared = {}
+        for gram in grams:
+            for candidate in self._trigram_index.get(gram, ()):
+                shared[candidate] = shared.get(candidate, 0) + 1
+
+        similar = {}
+        for candidate, count in shared.items():
+            score = 2 * count / (len(grams) + len(self._vocabulary_trigrams[candidate]))
+            if score >= FUZZY_THRESHOLD:
+                similar[candidate] = score
+        return similar
+
+    def _rank(self, normalized_text: str, fuzzy: bool) -> list:
+        """
+        Lista de (score, nº de tokens do nome, posição, tokens encontrados),
+        melhor primeiro. score = fração dos tokens do nome presentes na
+        mensagem (1.0 = todos); typos contam pela similaridade.
+
+        Nomes inteiros na mensagem têm prioridade: a cobertura parcial só é
+        calculada (com fuzzy) quando nenhum nome aparece por completo.
+        """
+        text = normalized_text.strip()
+
+        if text.isdigit():
+            number = int(text)
+            if 1 <= number <= len(self.services):
+                return [(2.0, 0, number - 1, frozenset())]
+            return []
+
+        position = self._by_name.get(text)
+        if position is not None:
+            return [(2.0, 0, position, frozenset())]
+
+        tokens = tokenize(text)
+        present = frozenset(tokens)
+
+        ranked = []
+        for token in present:
+            for position in self._anchor_index.get(token, ()):
+                name_tokens = self._name_tokens[position]
+                if name_tokens <= present:
+                    ranked.append((1.0, len(name_tokens), position, name_tokens))
+
+        if ranked or not fuzzy:
+            ranked.sort(key=lambda item: (-item[1], item[2]))
+            return ranked
+
+        # Nenhum nome inteiro na mensagem: cobertura parcial + typos
+        # (token do vocabulário → similaridade com a mensagem, 1.0 = exato)
+        weights = {}
+        for token in tokens:
+            if token in self._token_index:
+                weights[token] = 1.0
+            else:
+                for similar, score in self._fuzzy_tokens(token).items():
+                    weights[similar] = max(weights.get(similar, 0.0), score)
+
+        hits = {}
+        for token in weights:
+            for position in self._token_index[token]:
+                hits.setdefault(position, []).append(token)
+
+        for position, matched in hits.items():
+            name_tokens = len(self._name_tokens[position])
+            score = sum(weights[token] for token in matched) / name_tokens
+            ranked.append((score, name_tokens, position, frozenset(matched)))
+
+        # Melhor cobertura; empate → nome mais específico, depois ordem do menu
+        ranked.sort(key=lambda item: (-item[0], -item[1], item[2]))
+        return ranked
+
+    def match(self, normalized_text: str, fuzzy: bool = True, limit: int = 5) -> list:
+        """
+        Candidatos ranqueados para o texto normalizado.
+
+        Returns:
+            lista de (score, serviço), melhor primeiro. score >= 1.0 significa
+            que todos os tokens do nome estão na mensagem.
+        """
+        return [
+            (score, self.services[position])
+            for score, _, position, _ in self._rank(normalized_text, fuzzy)[:limit]
+        ]
+
+    def find(self, normalized_text: str, fuzzy: bool = False):
+        """
+        Melhor serviço para o texto, ou None se não houver candidato claro.
+
+        Sem fuzzy, só aceita nomes cujos tokens aparecem todos na mensagem.
+        Com fuzzy, aceita cobertura parcial e typos, mas devolve None quando
+        outro candidato casa com os mesmos tokens (ex.: "virilha") — nesse
+        caso use `match` para oferecer as opções.
+        """
+        ranked = self._rank(normalized_text, fuzzy)
+        if not ranked:
+            return None
+
+        score, _, position, tokens = ranked[0]
+        if score < 1.0 and any(tokens <= other for _, _, _, other in ranked[1:]):
+            return None
+        return self.services[position]
+
+# --------------------------------------------------
+# PROVEDOR COM HOT-RELOAD
+# --------------------------------------------------
+# Um único catálogo compartilhado por engine, menu e agenda (durações).
+# A origem é o price_list.json (recarregado quando o mtime/tamanho muda) ou,
+# se CATALOG_SHEET_TAB estiver definido, uma aba da planilha relida a cada
+# CATALOG_SHEET_TTL segundos. Cada recarga monta um ServiceCatalog novo e
+# troca a referência de uma vez: quem já pegou o catálogo anterior continua
+# usando uma versão consistente até o fim da mensagem.
+
+CATALOG_CHECK_INTERVAL = float(os.getenv("CATALOG_CHECK_INTERVAL", "5"))
+CATALOG_SHEET_TAB = os.getenv("CATALOG_SHEET_TAB", "")
+CATALOG_SHEET_TTL = float(os.getenv("CATALOG_SHEET_TTL", "60"))
+
+class CatalogProvider:
+    """
+    Mantém o ServiceCatalog atual e o substitui quando a origem muda.
+    Se a recarga falhar, continua servindo o último catálogo válido.
+    """
+
+    def __init__(self, file_path: str = None, sheet_tab: str = "",
+                 check_interval: float = CATALOG_CHECK_INTERVAL):
+        self.file_path = file_path or default_catalog_path()
+        self.sheet_tab = sheet_tab
+        self.check_interval = CATALOG_SHEET_TTL if sheet_tab else check_interval
+
+        self._catalog = None
+        self._source_version = None
+        self._listeners = []
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+        # Métricas
+        self.reloads = 0
+        self.reload_errors = 0
+        self.last_error = None
+
+    def _read_source(self):
+        """(versão da origem, serviços) — serviços é None se nada mudou."""
+        if self.sheet_tab:
+            # Import tardio: sheets depende deste módulo para as durações
+            from backend.integrations.sheets import load_services_from_sheet
+
+            services = load_services_from_sheet(self.sheet_tab)
+            return services, services
+
+        stat = os.stat(self.file_path)
+        version = (stat.st_mtime_ns, stat.st_size)
+        if version == self._source_version:
+            return version, None
+        return version, load_services_file(self.file_path)
+
+    def _reload(self):
+        try:
+            version, services = self._read_source()
+        except Exception as e:
+            self.reload_errors += 1
+            self.last_error = str(e)
+            print(f"❌ [CATALOG] Falha ao recarregar catálogo: {e}")
+            if self._catalog is None:
+                raise
+            return
+
+        if services is None or version == self._source_version:
+            return
+
+        next_version = self._catalog.version + 1 if self._catalog else 1
+        catalog = ServiceCatalog(services, version=next_version)
+
+        # Troca atômica da referência
+        self._catalog = catalog
+        self._source_version = version
+        self.reloads += 1
+        print(f"📚 [CATALOG] Catálogo v{catalog.version} carregado ({len(catalog)} serviços)")
+
+        for listener in self._listeners:
+            try:
+                listener(catalog)
+            except Exception as e:
+                print(f"⚠️ [CATALOG] Erro em listener de recarga: {e}")
+
+    def add_reload_listener(self, listener):
+        """Registra `listener(catalog)`, chamado a cada novo catálogo (ex.: caches derivados)."""
+        self._listeners.append(listener)
+
+    def get(self) -> ServiceCatalog:
+        now = time.monotonic()
+        if self._catalog is not None and now - self._checked_at < self.check_interval:
+            return self._catalog
+
+        with self._lock:
+            if self._catalog is None or now - self._checked_at >= self.check_interval:
+                self._reload()
+                self._checked_at = time.monotonic()
+
+        return self._catalog
+
+    def stats(self) -> dict:
+        catalog = self._catalog
+        return {
+            "source": f"sheet:{self.sheet_tab}" if self.sheet_tab else "file",
+            "version": catalog.version if catalog else None,
+            "services": len(catalog) if catalog else 0,
+            "reloads": self.reloads,
+            "reload_errors": self.reload_errors,
+            "last_error": self.last_error,
+        }
+
+catalog_provider = CatalogProvider(sheet_tab=CATALOG_SHEET_TAB)
+
+def get_catalog() -> ServiceCatalog:
+    return catalog_provider.get()
+
+def get_catalog_stats() -> dict:
+    return catalog_provider.stats()
@@ -0,0 +1,190 @@
+import re
+from datetime import date, timedelta
+
+# --------------------------------------------------
+# EXTRATOR DE DATA E HORÁRIO (PASSADA ÚNICA)
+# --------------------------------------------------
+# Um único regex pré-compilado funciona como tokenizador: finditer percorre o
+# texto uma vez e cada token nomeado vira data ou horário. O primeiro token de
+# data e o primeiro de horário vencem. O texto deve vir normalizado
+# (minúsculo, sem acentos — ver ai/text.normalize).
+#
+# Formatos aceitos:
+#   datas:    hoje, amanha, depois de amanha, dia 20, 20/01, 20/01/2026,
+#             sexta, sexta-feira, sexta que vem, proxima sexta
+#   horários: 15h, 15hs, 15 horas, 15:00, 14h30, 3 da tarde, 9 e meia da manha,
+#             as 15, as 9 e meia, as 3 da tarde, meio-dia, meia-noite
+
+WEEKDAYS = {
+    "segunda": 0,
+    "terca": 1,
+    "quarta": 2,
+    "quinta": 3,
+    "sexta": 4,
+    "sabado": 5,
+    "domingo": 6,
+}
+
+_PERIOD = r"(?:\s*(?:da|de)\s+|\s+)(?P<{name}>manha|tarde|noite)"
+_HOUR_SUFFIX = r"(?:horas|hrs|hs|h|:)"
+
+_TOKENS = re.compile(
+    # Filtro barato: todo token começa em fronteira de palavra, com dígito ou
+    # com uma destas palavras — as demais posições (ex.: "pode", "quero",
+    # "tem") são descartadas sem testar cada alternativa.
+    r"\b(?=\d|hoje|amanha|depois|proxim|segunda|terca|quarta|quinta|sexta|sabado|domingo"
+    r"|dia\s|meio|meia|as\s)(?:" + "|".join([
+        # Datas relativas
+        r"(?P<relday>\bdepois\s+de\s+amanha\b|\bamanha\b|\bhoje\b)",
+        # Dia da semana (opcionalmente "proxima"/"que vem")
+        r"(?P<weekday>\b(?P<next1>proxim[ao]\s+)?"
+        r"(?P<wd>" + "|".join(WEEKDAYS) + r")(?:[\s-]*feira)?\b(?P<next2>\s+que\s+vem)?)",
+        # DD/MM[/AAAA] (com ou sem "dia")
+        r"(?P<dmy>(?:\bdia\s+)?(?P<d1>\d{1,2})/(?P<m1>\d{1,2})(?:/(?P<y1>\d{4}|\d{2}))?)",
+        # "dia 20"
+        r"(?P<dia>\bdia\s+(?P<d2>\d{1,2})(?![\d/]))",
+        # Meio-dia / meia-noite
+        r"(?P<noon>\bmeio[\s-]?dia\b)",
+        r"(?P<midnight>\bmeia[\s-]?noite\b)",
+        # 15h, 15:00, 14h30, 15 horas, 3h da tarde
+        r"(?P<hm>\b(?P<h1>\d{1,2})\s*" + _HOUR_SUFFIX + r"(?:\s*(?P<mi1>\d{2})(?![\d/]))?"
+        r"(?:" + _PERIOD.format(name="per1") + r")?)",
+        # 3 da tarde, 9 e meia da manha
+        r"(?P<hper>\b(?P<h2>\d{1,2})(?P<half2>\s+e\s+meia)?" + _PERIOD.format(name="per2") + r")",
+        # as 15, as 9 e meia
+        r"(?P<ash>\bas\s+(?P<h3>\d{1,2})(?![\d/:h])(?P<half3>\s+e\s+meia)?"
+        r"(?:" + _PERIOD.format(name="per3") + r")?)",
+    ]) + ")"
+)
+
+def _apply_period(hour: int, period: str) -> int:
+    if period in ("tarde", "noite") and hour < 12:
+        return hour + 12
+    return hour
+
+def _format_time(hour: int, minutes: int):
+    if 0 <= hour <= 23 and 0 <= minutes <= 59:
+        return f"{hour:02d}:{minutes:02d}"
+    return None
+
+def _build_date(today: date, day: int, month: int = None, year: int = None):
+    """
+    Monta a data. Sem mês, usa o mês atual (ou o próximo, se o dia já passou);
+    sem ano, usa o ano atual (ou o próximo, se a data já passou).
+    """
+    try:
+        if month is None:
+            candidate = date(today.year, today.month, day)
+            if candidate < today:
+                next_month = today.replace(day=1) + timedelta(days=32)
+                candidate = date(next_month.year, next_month.month, day)
+            return candidate
+
+        if year is None:
+            candidate = date(today.year, month, day)
+            if candidate < today:
+                candidate = date(today.year + 1, month, day)
+            return candidate
+
+        if year < 100:
+            year += 2000
+        return date(year, month, day)
+
+    except ValueError:
+        return None
+
+def _date_from_token(match, today: date):
+    kind = match.lastgroup
+
+    if kind == "relday":
+        word = match.group("relday")
+        if word == "hoje":
+            return today
+        if word == "amanha":
+            return today + timedelta(days=1)
+        return today + timedelta(days=2)
+
+    if kind == "weekday":
+        target = WEEKDAYS[match.group("wd")]
+        days_ahead = (target - today.weekday()) % 7
+        if days_ahead == 0 and (match.group("next1") or match.group("next2")):
+            days_ahead = 7
+        return today + timedelta(days=days_ahead)
+
+    if kind == "dmy":
+        year = match.group("y1")
+        return _build_date(
+            today,
+            int(match.group("d1")),
+            int(match.group("m1")),
+            int(year) if year else None
+        )
+
+    return _build_date(today, int(match.group("d2")))
+
+def _time_from_token(match):
+    kind = match.lastgroup
+
+    if kind == "noon":
+        return "12:00"
+
+    if kind == "midnight":
+        return "00:00"
+
+    if kind == "hm":
+        hour = _apply_period(int(match.group("h1")), match.group("per1"))
+        minutes = int(match.group("mi1")) if match.group("mi1") else 0
+        return _format_time(hour, minutes)
+
+    if kind == "hper":
+        hour = _apply_period(int(match.group("h2")), match.group("per2"))
+        return _format_time(hour, 30 if match.group("half2") else 0)
+
+    hour = _apply_period(int(match.group("h3")), match.group("per3"))
+    return _format_time(hour, 30 if match.group("half3") else 0)
+
+_DATE_TOKENS = {"relday", "weekday", "dmy", "dia"}
+
+# Valor de cada token já convertido, pelo tipo e texto do token (e pela data
+# de referência, no caso das datas). O vocabulário de tokens é pequeno
+# ("15h", "amanha", "dia 20"...), então a conversão quase sempre vira uma
+# leitura de dict. Limpo inteiro ao passar de _TOKEN_CACHE_MAX entradas.
+_TOKEN_CACHE_MAX = 4096
+_token_cache = {}
+
+def _token_value(match, today: date = None):
+    """Data (today informado) ou horário do token, convertido uma vez por texto."""
+    key = (match.lastgroup, match.group(), today)
+
+    try:
+        return _token_cache[key]
+    except KeyError:
+        pass
+
+    value = _date_from_token(match, today) if today is not None else _time_from_token(match)
+    if len(_token_cache) >= _TOKEN_CACHE_MAX:
+        _token_cache.clear()
+    _token_cache[key] = value
+    return value
+
+def parse_date_and_time(normalized_text: str, today: date):
+    """
+    Extrai (data, horário) do texto normalizado em uma única passada.
+
+    Returns:
+        (datetime.date | None, "HH:MM" | None)
+    """
+    date_part = None
+    time_part = None
+
+    for match in _TOKENS.finditer(normalized_text):
+        if match.lastgroup in _DATE_TOKENS:
+            if date_part is None:
+                date_part = _token_value(match, today)
+        elif time_part is None:
+            time_part = _token_value(match)
+
+        if date_part is not None and time_part is not None:
+            break
+
+    return date_part, time_part
@@ -1,53 +1,22 @@
-import os
-import json
-import re
 from datetime import datetime, timedelta, timezone
-import unicodedata
-import google.generativeai as genai
+
+from backend.ai.text import normalize, normalize_all
+from backend.ai.intents import match_intents
+from backend.ai.catalog import get_catalog
+from backend.ai.menu import format_service_line, get_services_menu
+from backend.ai.datetime_parser import parse_date_and_time
 
 from backend.integrations.sheets import (
     get_available_dates,
     get_available_times_for_date,
+    get_next_available_slots,
     book_appointment,
+    BOOKING_CONFLICT,
+    BOOKING_ERROR,
     cancel_appointment,
     set_robot_mute
 )
 
-# --------------------------------------------------
-# CONFIGURAÇÃO GEMINI API
-# --------------------------------------------------
-GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
-GEMINI_MODEL = os.getenv("AI_MODEL", "models/gemini-2.0-flash-exp")
-
-if not GEMINI_API_KEY:
-    raise ValueError("GEMINI_API_KEY não encontrada nas variáveis de ambiente!")
-
-genai.configure(api_key=GEMINI_API_KEY)
-
-print(f"🤖 [GEMINI] Usando modelo: {GEMINI_MODEL}")
-
-# Configuração do modelo Gemini
-generation_config = {
-    "temperature": 0.7,
-    "top_p": 0.95,
-    "top_k": 40,
-    "max_output_tokens": 1024,
-}
-
-safety_settings = [
-    {"category": "HARM_CATEGORY_HARASSMENT", "threshold": "BLOCK_NONE"},
-    {"category": "HARM_CATEGORY_HATE_SPEECH", "threshold": "BLOCK_NONE"},
-    {"category": "HARM_CATEGORY_SEXUALLY_EXPLICIT", "threshold": "BLOCK_NONE"},
-    {"category": "HARM_CATEGORY_DANGEROUS_CONTENT", "threshold": "BLOCK_NONE"},
-]
-
-# Inicializa modelo Gemini com configuração dinâmica
-gemini_model = genai.GenerativeModel(
-    model_name=GEMINI_MODEL,
-    generation_config=generation_config,
-    safety_settings=safety_settings
-)
-
 # --------------------------------------------------
 # CONFIGURAÇÕES
 # --------------------------------------------------
@@ -55,55 +24,50 @@ def get_brazil_time():
     offset = timezone(timedelta(hours=-3))
     return datetime.now(offset)
 
-def load_services():
-    base_dir = os.path.dirname(os.path.abspath(__file__))
-    project_root = os.path.abspath(os.path.join(base_dir, "..", ".."))
-    file_path = os.path.join(project_root, "data", "price_list.json")
-    
-    with open(file_path, "r", encoding="utf-8") as f:
-        data = json.load(f)
-    return data["services"]
-
-SERVICES = load_services()
+# Catálogo de serviços: get_catalog() (ai/catalog.py) devolve a versão atual,
+# recarregada automaticamente quando o price_list.json muda.
 
 # --------------------------------------------------
 # UTILIDADES
 # --------------------------------------------------
-def normalize(text: str) -> str:
-    text = text.lower().strip()
-    text = unicodedata.normalize("NFD", text)
-    text = "".join(c for c in text if unicodedata.category(c) != "Mn")
-    return text
+# normalize() vive em ai/text.py (com cache LRU); as tabelas abaixo já são
+# normalizadas no import, então nenhuma comparação renormaliza vocabulário.
+
+GREETINGS = normalize_all([
+    "oi", "ola", "olá", "oi!", "ola!",
+    "bom dia", "boa tarde", "boa noite",
+    "hey", "ei", "opa", "e ai", "e aí",
+    "alo", "alô", "hello", "hi"
+])
+
+# Saudações que reiniciam a conversa em qualquer etapa. Subconjunto de
+# GREETINGS: as demais ("opa", "ei", "hey"...) aparecem no meio de um
+# agendamento e são tratadas por is_greeting em cada etapa.
+RESET_GREETINGS = normalize_all([
+    "oi", "ola", "olá", "bom dia", "boa tarde", "boa noite"
+])
+
+NEGATIVE_PHRASES = normalize_all([
+    "nao", "não", "nao obrigada", "não obrigada",
+    "nao obrigado", "não obrigado", "obrigada",
+    "obrigado", "valeu", "vlw", "ta bom", "tá bom",
+    "ta bem", "tá bem", "beleza", "tranquilo",
+    "so isso", "só isso", "ok", "okay",
+    "tudo certo", "tudo bem", "de boa"
+])
 
 def is_greeting(text: str) -> bool:
     """
     Verifica se texto é uma saudação
     Retorna: True se for saudação, False caso contrário
     """
-    greetings = [
-        "oi", "ola", "olá", "oi!", "ola!",
-        "bom dia", "boa tarde", "boa noite",
-        "hey", "ei", "opa", "e ai", "e aí",
-        "alo", "alô", "hello", "hi"
-    ]
-    
-    normalized = normalize(text)
-    return normalized in greetings
+    return normalize(text) in GREETINGS
 
 def is_negative_response(text: str) -> bool:
     """
     Verifica se texto é uma resposta negativa/despedida
     Retorna: True se for resposta negativa, False caso contrário
     """
-    negative_phrases = [
-        "nao", "não", "nao obrigada", "não obrigada",
-        "nao obrigado", "não obrigado", "obrigada",
-        "obrigado", "valeu", "vlw", "ta bom", "tá bom",
-        "ta bem", "tá bem", "beleza", "tranquilo",
-        "so isso", "só isso", "ok", "okay",
-        "tudo certo", "tudo bem", "de boa"
-    ]
-    
     normalized = normalize(text)
     
     # Verifica se a mensagem contém APENAS resposta negativa (sem outras palavras significativas)
@@ -111,9 +75,7 @@ def is_negative_response(text: str) -> bool:
     
     # Se mensagem tem 1-3 palavras e contém negativa, considera negativa
     if len(words) <= 3:
-        for phrase in negative_phrases:
-            if phrase in normalized:
-                return True
+        return any(phrase in normalized for phrase in NEGATIVE_PHRASES)
     
     return False
 
@@ -159,67 +121,88 @@ def format_services_list():
     """
     Formata a lista de serviços agrupada por categorias
     Retorna: string formatada com todos os serviços organizados
-    """
-    category_emojis = {
-        "Depilação": "✨",
-        "Estética Facial": "💆‍♀️",
-        "Cílios & Sobrancelhas": "👁️",
-        "Design na Linha": "✂️",
-        "Tratamentos Corporais": "💎",
-        "Nail Designer": "💅",
-        "Manicure & Pedicure": "🌸"
-    }
     
-    categories = {}
-    for service in SERVICES:
-        category = service.get("category", "Outros")
-        if category not in categories:
-            categories[category] = []
-        categories[category].append(service)
-    
-    result = []
-    service_number = 1
-    
-    category_order = [
-        "Depilação",
-        "Estética Facial", 
-        "Cílios & Sobrancelhas",
-        "Design na Linha",
-        "Tratamentos Corporais",
-        "Nail Designer",
-        "Manicure & Pedicure"
+    Renderizada uma vez por versão do catálogo: ver ai/menu.py
+    """
+    return get_services_menu().text
+
+def format_service_options(candidates: list) -> str:
+    """
+    Pergunta qual serviço o cliente quis dizer quando o nome é ambíguo
+    (ex.: "virilha" → Virilha Completa / Virilha Cavada)
+    """
+    catalog = get_catalog()
+    lines = [
+        format_service_line(catalog.number_of(service), service)
+        for _, service in candidates
     ]
-    
-    for category in category_order:
-        if category not in categories:
-            continue
-            
-        emoji = category_emojis.get(category, "✨")
-        result.append(f"\n{emoji} *{category.upper()}*")
-        
-        for service in categories[category]:
-            price = service['price']
-            price_str = f"R$ {price:.2f}" if isinstance(price, (int, float)) else price
-            result.append(f"{service_number}. {service['name']} — {price_str}")
-            service_number += 1
-    
-    return "\n".join(result)
+    return (
+        "Encontrei mais de uma opção 😊\n\n"
+        + "\n".join(lines)
+        + "\n\n👉 Qual delas você prefere? Pode responder com o *número*."
+    )
 
-def detect_service_by_number_or_name(text: str):
+def detect_service_by_number_or_name(text: str, fuzzy: bool = False):
     """
     Detecta serviço por número (1, 2, 3...) ou por nome (sobrancelha, buço...)
-    Retorna: service dict ou None
-    """
-    if text.isdigit():
-        service_index = int(text) - 1
-        if 0 <= service_index < len(SERVICES):
-            return SERVICES[service_index]
     
-    for service in SERVICES:
-        if normalize(service["name"]) in text:
-            return service
+    Sem fuzzy, o nome inteiro precisa estar na mensagem (atalhos em qualquer
+    etapa). Com fuzzy (etapa de escolha do serviço), aceita nome parcial e
+    typos ("sobrancelia"), desde que não seja ambíguo.
     
-    return None
+    Retorna: service dict ou None
+    """
+    return get_catalog().find(text, fuzzy=fuzzy)
+
+def service_duration(state: dict) -> int:
+    """
+    Duração (minutos) do serviço escolhido, pelo catálogo atual
+    Usada para só oferecer horários em que o serviço cabe inteiro
+    """
+    service = state.get("service") or {}
+    return get_catalog().duration_of(service.get("name"), service.get("duration_minutes", 30))
+
+# Terça (1) a Sábado (5)
+OPEN_WEEKDAYS = frozenset(range(1, 6))
+
+WEEKDAYS_SHORT_PT = ["seg", "ter", "qua", "qui", "sex", "sáb", "dom"]
+
+def suggest_available_slots(state: dict) -> str:
+    """
+    Bloco com os próximos horários livres para o serviço escolhido
+    (uma única consulta à agenda). Retorna "" se não houver sugestões.
+    """
+    slots = get_next_available_slots(
+        service_duration(state), get_brazil_time(), weekdays=OPEN_WEEKDAYS
+    )
+    if not slots:
+        return ""
+    
+    by_date = {}
+    for date_str, hora in slots:
+        by_date.setdefault(date_str, []).append(hora)
+    
+    lines = []
+    for date_str, horas in by_date.items():
+        day = datetime.strptime(date_str, "%d/%m/%Y")
+        lines.append(f"📅 *{day.strftime('%d/%m')}* ({WEEKDAYS_SHORT_PT[day.weekday()]}): {', '.join(horas)}")
+    
+    first_date, first_time = slots[0]
+    return (
+        "📋 Próximos horários disponíveis:\n"
+        + "\n".join(lines)
+        + f"\n\n💡 Pode responder com a data e o horário, ex.: *{first_date[:5]} às {first_time}*"
+    )
+
+NO_SLOTS_MESSAGE = "📭 Não encontrei horários livres para esse serviço nos próximos dias."
+
+def suggest_available_slots_or_notice(state: dict) -> str:
+    """
+    Como suggest_available_slots, mas nunca vazio: sem sugestões, devolve
+    o aviso de que não há horários livres (para respostas em que o bloco
+    é o único conteúdo entre o aviso e a pergunta).
+    """
+    return suggest_available_slots(state) or NO_SLOTS_MESSAGE
 
 def is_working_day(date_obj):
     """
@@ -239,7 +222,7 @@ def is_working_day(date_obj):
     }
     
     day_name = days_pt[weekday]
-    is_open = weekday >= 1 and weekday <= 5
+    is_open = weekday in OPEN_WEEKDAYS
     
     return is_open, day_name
 
@@ -263,73 +246,16 @@ def extract_date_and_time(text: str):
     - "dia 20 as 15h"
     - "20/01 15h"
     - "amanhã às 15"
+    - "sexta que vem", "depois de amanhã"
+    - "14h30", "3 da tarde", "meio-dia"
     - "dia 20" (só data)
     - "15h" (só horário)
     
+    Implementação em passada única: ver ai/datetime_parser.py
+    
     Retorna: (date_part, time_part)
     """
-    text = normalize(text)
-    date_part = None
-    time_part = None
-    
-    print(f"🔍 [PARSING] Analisando texto: '{text}'")
-    
-    # Extração de horário
-    time_patterns = [
-        r'(?:as|às)?\s*(\d{1,2})\s*(?:h|:|hs|horas)\s*(\d{2})?',
-        r'(\d{1,2})\s+(?:da\s+)?(?:manha|manhã|tarde|noite)',
-    ]
-    
-    for pattern in time_patterns:
-        time_match = re.search(pattern, text)
-        if time_match:
-            hour = int(time_match.group(1))
-            minutes = int(time_match.group(2)) if len(time_match.groups()) > 1 and time_match.group(2) else 0
-            
-            if 0 <= hour <= 23 and 0 <= minutes <= 59:
-                time_part = f"{hour:02d}:{minutes:02d}"
-                print(f"✅ [PARSING] Horário extraído: {time_part}")
-                break
-    
-    # Extração de data
-    now_br = get_brazil_time()
-    
-    if "hoje" in text:
-        date_part = now_br.date()
-        print(f"✅ [PARSING] Data extraída (hoje): {date_part}")
-    
-    elif "amanha" in text or "amanhã" in text:
-        date_part = (now_br + timedelta(days=1)).date()
-        print(f"✅ [PARSING] Data extraída (amanhã): {date_part}")
-    
-    else:
-        dia_pattern = r'dia\s+(\d{1,2})(?:/(\d{1,2}))?'
-        dia_match = re.search(dia_pattern, text)
-        
-        if dia_match:
-            day = int(dia_match.group(1))
-            month = int(dia_match.group(2)) if dia_match.group(2) else now_br.month
-            year = now_br.year
-            
-            try:
-                date_part = datetime(year, month, day).date()
-                print(f"✅ [PARSING] Data extraída (dia X): {date_part}")
-            except ValueError:
-                print(f"❌ [PARSING] Data inválida: dia={day}, month={month}")
-        
-        else:
-            date_match = re.search(r'(\d{1,2})/(\d{1,2})', text)
-            if date_match:
-                day, month = map(int, date_match.groups())
-                year = now_br.year
-                try:
-                    date_part = datetime(year, month, day).date()
-                    print(f"✅ [PARSING] Data extraída (DD/MM): {date_part}")
-                except ValueError:
-                    print(f"❌ [PARSING] Data inválida: {day}/{month}")
-
-    print(f"📊 [PARSING] Resultado final - Data: {date_part}, Horário: {time_part}")
-    return date_part, time_part
+    return parse_date_and_time(normalize(text), get_brazil_time().date())
 
 def standardize_sheet_dates(date_list):
     """
@@ -403,7 +329,7 @@ def prepare_session_update(state: dict) -> dict:
     }
 
 # --------------------------------------------------
-# ENGINE PRINCIPAL COM GEMINI API
+# ENGINE PRINCIPAL
 # --------------------------------------------------
 def generate_ai_response(
     phone: str,
@@ -413,7 +339,7 @@ def generate_ai_response(
     session_data: dict = None
 ) -> tuple[str, dict]:
     """
-    🔥 VERSÃO GEMINI API - Gerenciamento completo de agendamento
+    Gerenciamento completo de agendamento
     
     Gera resposta automatizada para mensagens do WhatsApp, gerenciando
     todo o fluxo de agendamento com PERSISTÊNCIA em banco de dados.
@@ -431,6 +357,9 @@ def generate_ai_response(
     
     text = normalize(message)
     
+    # Todas as intenções da mensagem em uma única passada (ver ai/intents.py)
+    intents = match_intents(text)
+    
     if session_data is None:
         session_data = {}
     
@@ -472,9 +401,8 @@ def generate_ai_response(
     # ========================================================================
     # 🔥 SAUDAÇÕES SEMPRE INICIAM NOVA CONVERSA (exceto após resposta negativa)
     # ========================================================================
-    initial_greetings = ["oi", "ola", "olá", "bom dia", "boa tarde", "boa noite"]
-    
-    if any(greeting == text for greeting in initial_greetings):
+    # text já vem normalizado: teste de pertinência direto no frozenset
+    if text in RESET_GREETINGS:
         print(f"👋 [SAUDAÇÃO] Detectada! Limpando sessão e iniciando nova conversa...")
         
         # SEMPRE limpa sessão quando detecta saudação
@@ -516,14 +444,7 @@ def generate_ai_response(
     # DETECÇÃO PRIORITÁRIA DE TAG E INTENÇÃO DE HUMANO
     # ========================================================================
     
-    human_request_keywords = [
-        "#solicitar_humano#",
-        "responsavel", "responsável", "dono", "dona", 
-        "atendente", "humano", "pessoa", "alguem", "alguém", 
-        "proprietario", "proprietária", "gerente"
-    ]
-    
-    if any(palavra in text for palavra in human_request_keywords):
+    if "human_handoff" in intents:
         is_in_booking_flow = state.get("service") is not None
         has_provided_name = state.get("name") is not None
         
@@ -565,7 +486,7 @@ def generate_ai_response(
     if state.get("status") == "completed":
         # Esta seção não deve mais ser atingida para respostas negativas simples
         # pois elas são tratadas no topo, mas mantemos para outros casos
-        if any(x in text for x in ["nao quero", "não quero", "nao preciso", "não preciso"]):
+        if "decline_more" in intents:
             name = state.get("last_booking", {}).get("name", "")
             
             state["status"] = "farewell_sent"
@@ -587,24 +508,17 @@ def generate_ai_response(
     # DETECÇÃO DE PERGUNTA SOBRE SERVIÇOS
     # ========================================================================
     
-    if any(palavra in text for palavra in ["servico", "serviços", "servicos", "lista", "quais servico", "que servico", "tem quais", "oferece"]):
+    if "services" in intents:
         if state.get("status") not in ["awaiting_welcome_response", "awaiting_name", "awaiting_confirmation"]:
             state["status"] = "awaiting_service_selection"
             
-            services_list = format_services_list()
-            return (
-                "Confira nossos serviços:\n\n"
-                f"{services_list}\n\n"
-                "👉 Digite o número ou nome do serviço que deseja agendar!\n\n"
-                "💡 Exemplo: *1* ou *sobrancelha*",
-                prepare_session_update(state)
-            )
+            return (get_services_menu().reply, prepare_session_update(state))
     
     # ========================================================================
     # CANCELAMENTO
     # ========================================================================
     
-    if "cancelar" in text or "desmarcar" in text:
+    if "cancel" in intents:
         if state.get("last_booking"):
             last_booking = state["last_booking"]
             cancelado = cancel_appointment(phone)
@@ -682,7 +596,7 @@ def generate_ai_response(
     # DESPEDIDA
     # ========================================================================
     
-    if "tchau" in text or "ate logo" in text or "até logo" in text:
+    if "goodbye" in intents:
         name = ""
         if state.get("last_booking"):
             name = state["last_booking"]["name"]
@@ -702,7 +616,7 @@ def generate_ai_response(
     # ========================================================================
     
     # ENDEREÇO
-    if any(palavra in text for palavra in ["endereco", "endereço", "local", "onde", "localizacao", "localização"]):
+    if "address" in intents:
         if state.get("last_booking"):
             booking = state["last_booking"]
             return (
@@ -736,7 +650,7 @@ def generate_ai_response(
             )
     
     # TELEFONE
-    if any(palavra in text for palavra in ["telefone", "contato", "whatsapp", "ligar"]):
+    if "contact_phone" in intents:
         if state.get("last_booking"):
             booking = state["last_booking"]
             return (
@@ -768,7 +682,7 @@ def generate_ai_response(
             )
     
     # INSTAGRAM
-    if any(palavra in text for palavra in ["instagram", "insta", "rede social", "redes sociais", "facebook", "social", "fotos", "portfolio"]):
+    if "instagram" in intents:
         if state.get("last_booking"):
             booking = state["last_booking"]
             return (
@@ -818,20 +732,15 @@ def generate_ai_response(
     # ========================================================================
     
     if state.get("status") == "awaiting_engagement_response":
-        if any(x in text for x in ["sim", "claro", "quero", "pode", "gostaria", "ok"]):
+        if "engagement_yes" in intents:
             state["status"] = "awaiting_service_selection"
             
-            services_list = format_services_list()
             return (
-                "Perfeito! ✨ Vou te ajudar com o agendamento 💖\n\n"
-                "Confira nossos serviços:\n\n"
-                f"{services_list}\n\n"
-                "👉 Digite o número ou nome do serviço que deseja agendar!\n\n"
-                "💡 Exemplo: *1* ou *sobrancelha*",
+                "Perfeito! ✨ Vou te ajudar com o agendamento 💖\n\n" + get_services_menu().reply,
                 prepare_session_update(state)
             )
         
-        elif any(x in text for x in ["nao", "não", "agora nao", "agora não", "depois"]):
+        elif "engagement_no" in intents:
             state = {"status": "start", "service": None, "date": None, "time": None, "name": None}
             return (
                 "Tudo bem 😊 Quando quiser conhecer ou agendar um serviço, é só me chamar. Estarei por aqui ✨",
@@ -929,18 +838,11 @@ def generate_ai_response(
     # ========================================================================
     
     if state["status"] == "awaiting_welcome_response":
-        if any(x in text for x in ["sim", "claro", "quero", "pode", "gostaria", "lista", "sim por favor", "com certeza", "aceito"]):
+        if "welcome_yes" in intents:
             state["status"] = "awaiting_service_selection"
             
-            services_list = format_services_list()
-            return (
-                "Confira nossos serviços:\n\n"
-                f"{services_list}\n\n"
-                "👉 Digite o número ou nome do serviço que deseja agendar!\n\n"
-                "💡 Exemplo: *1* ou *sobrancelha*",
-                prepare_session_update(state)
-            )
-        elif any(x in text for x in ["nao", "não", "agora nao", "agora não", "depois", "talvez depois"]):
+            return (get_services_menu().reply, prepare_session_update(state))
+        elif "welcome_no" in intents:
             state = {"status": "start", "service": None, "date": None, "time": None, "name": None}
             return (
                 "Entendi! Se quiser agendar algo depois, é só me chamar! 😊",
@@ -959,7 +861,7 @@ def generate_ai_response(
     # ========================================================================
     
     if state["status"] == "awaiting_service_selection":
-        detected_service = detect_service_by_number_or_name(text)
+        detected_service = detect_service_by_number_or_name(text, fuzzy=True)
         
         if detected_service:
             state["service"] = detected_service
@@ -988,6 +890,11 @@ def generate_ai_response(
             
             return (date_msg, prepare_session_update(state))
         else:
+            candidates = get_catalog().match(text)
+            
+            if len(candidates) > 1:
+                return (format_service_options(candidates), prepare_session_update(state))
+            
             return (
                 "Não entendi qual serviço você quer 😕 Tente digitar o *número* ou o *nome*, como *1* ou *Sobrancelha*.",
                 prepare_session_update(state)
@@ -1013,10 +920,12 @@ def generate_ai_response(
         if not is_open:
             next_day = get_next_working_day(date)
             next_day_str = next_day.strftime('%d/%m') if next_day else "próximo dia útil"
+            suggestions = suggest_available_slots(state)
             return (
                 f"⚠️ {day_name} ({date.strftime('%d/%m')}) o studio está fechado.\n\n"
                 "🕒 Funcionamos de *Terça a Sábado* das *9h às 19h*\n\n"
-                f"👉 Que tal agendar para *{next_day_str}* ou outra data da sua preferência?",
+                + (f"{suggestions}\n\n" if suggestions else "")
+                + f"👉 Que tal agendar para *{next_day_str}* ou outra data da sua preferência?",
                 prepare_session_update(state)
             )
 
@@ -1028,9 +937,11 @@ def generate_ai_response(
         print(f"📊 [VALIDAÇÃO] Data usuário: {user_date_str} | Datas disponíveis: {clean_available_dates}")
 
         if user_date_str not in clean_available_dates:
+            suggestions = suggest_available_slots(state)
             return (
                 f"Essa data (*{date.strftime('%d/%m')}*) não está disponível ou não temos agenda aberta 😕\n\n"
-                "👉 Pode escolher outra data, por favor?",
+                + (f"{suggestions}\n\n" if suggestions else "")
+                + "👉 Pode escolher outra data, por favor?",
                 prepare_session_update(state)
             )
         
@@ -1040,7 +951,9 @@ def generate_ai_response(
             print(f"✅ [FLUXO] Cliente informou data E horário juntos!")
             
             try:
-                available_times = get_available_times_for_date(date.strftime("%d/%m/%Y"))
+                available_times = get_available_times_for_date(
+                    date.strftime("%d/%m/%Y"), service_duration(state)
+                )
             except Exception as e:
                 print(f"❌ [ERROR] Falha ao buscar horários: {e}")
                 return (
@@ -1049,6 +962,14 @@ def generate_ai_response(
                     prepare_session_update(state)
                 )
             
+            if not available_times:
+                return (
+                    f"Não há mais horários livres em *{date.strftime('%d/%m')}* para esse serviço 😕\n\n"
+                    f"{suggest_available_slots_or_notice(state)}\n\n"
+                    "👉 Qual data e horário você prefere?",
+                    prepare_session_update(state)
+                )
+            
             if time not in available_times:
                  return (
                     f"Consegui a data *{date.strftime('%d/%m')}*, mas o horário *{time}* já está ocupado 😕\n\n"
@@ -1094,7 +1015,9 @@ def generate_ai_response(
             )
         
         try:
-            available_times = get_available_times_for_date(state["date"].strftime("%d/%m/%Y"))
+            available_times = get_available_times_for_date(
+                state["date"].strftime("%d/%m/%Y"), service_duration(state)
+            )
         except Exception as e:
             print(f"❌ [ERROR] Falha ao buscar horários: {e}")
             return (
@@ -1103,6 +1026,16 @@ def generate_ai_response(
                 prepare_session_update(state)
             )
         
+        if not available_times:
+            # Dia lotado: volta para a escolha de data, já com sugestões
+            state["status"] = "awaiting_date"
+            return (
+                f"Não há mais horários livres em *{state['date'].strftime('%d/%m')}* para esse serviço 😕\n\n"
+                f"{suggest_available_slots_or_notice(state)}\n\n"
+                "👉 Qual data e horário você prefere?",
+                prepare_session_update(state)
+            )
+        
         if time not in available_times:
              return (
                 f"Esse horário (*{time}*) não está disponível 😕\n\n"
@@ -1181,15 +1114,49 @@ def generate_ai_response(
                 prepare_session_update(state)
             )
         
-        if any(x in text for x in ["sim", "confirmar", "ok", "pode"]):
-            book_appointment(
+        if "confirm_yes" in intents:
+            result = book_appointment(
                 phone=phone,
                 name=state["name"],
                 service=state["service"]["name"],
                 date=state["date"].strftime("%d/%m/%Y"),
-                time=state["time"]
+                hora=state["time"]
             )
             
+            if result == BOOKING_ERROR:
+                # Falha na planilha: o horário não foi perdido, só não deu para
+                # gravar agora. Mantém a confirmação pendente para a cliente repetir.
+                return (
+                    "Desculpe, tive um problema ao registrar seu agendamento na agenda 😕\n\n"
+                    f"Seu pedido para *{state['date'].strftime('%d/%m')}* às *{state['time']}* "
+                    "ainda não foi confirmado.\n\n"
+                    "👉 Responda *sim* em instantes para tentar de novo.",
+                    prepare_session_update(state)
+                )
+            
+            if result == BOOKING_CONFLICT:
+                # Outro cliente pegou o horário (ou a agenda mudou): oferece o que sobrou
+                lost_time = state["time"]
+                state["time"] = None
+                available_times = get_available_times_for_date(
+                    state["date"].strftime("%d/%m/%Y"), service_duration(state)
+                )
+                
+                if available_times:
+                    state["status"] = "awaiting_time"
+                    options = f"📋 Horários disponíveis em *{state['date'].strftime('%d/%m')}*: {', '.join(available_times)}"
+                else:
+                    state["status"] = "awaiting_date"
+                    options = suggest_available_slots_or_notice(state)
+                
+                return (
+                    f"Poxa, o horário *{lost_time}* de *{state['date'].strftime('%d/%m')}* "
+                    "acabou de ficar indisponível 😕\n\n"
+                    f"{options}\n\n"
+                    "👉 Qual horário você prefere?",
+                    prepare_session_update(state)
+                )
+            
             state["status"] = "completed"
             state["last_booking"] = {
                 "name": state["name"],
@@ -1208,7 +1175,7 @@ def generate_ai_response(
                 prepare_session_update(state)
             )
             
-        if any(x in text for x in ["nao", "não", "cancelar"]):
+        if "confirm_no" in intents:
             state = {"status": "start", "service": None, "date": None, "time": None, "name": None}
             return (
                 "Tudo bem! 😊\n\n"
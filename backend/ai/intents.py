@@ -0,0 +1,86 @@
+import re
+
+from backend.ai.text import normalize
+
+# --------------------------------------------------
+# TABELA DE INTENÇÕES
+# --------------------------------------------------
+# (intenção, prioridade, palavras-chave)
+#
+# As palavras-chave são comparadas por substring com o texto JÁ normalizado
+# (minúsculo e sem acentos, ver ai/text.normalize), igual ao antigo
+# `any(palavra in text for palavra in [...])`. Menor prioridade = mais importante.
+# Intenções com o mesmo vocabulário mas contextos diferentes (ex.: "sim" na
+# boas-vindas x na confirmação) ficam separadas para preservar cada regra.
+
+INTENT_TABLE = [
+    ("human_handoff", 10, [
+        "#solicitar_humano#", "responsavel", "dono", "dona", "atendente",
+        "humano", "pessoa", "alguem", "proprietario", "proprietaria", "gerente",
+    ]),
+    ("decline_more", 20, ["nao quero", "nao preciso"]),
+    ("services", 30, [
+        "servico", "lista", "quais servico", "que servico", "tem quais", "oferece",
+    ]),
+    ("cancel", 40, ["cancelar", "desmarcar"]),
+    ("goodbye", 50, ["tchau", "ate logo"]),
+    ("address", 60, ["endereco", "local", "onde", "localizacao"]),
+    ("contact_phone", 61, ["telefone", "contato", "whatsapp", "ligar"]),
+    ("instagram", 62, [
+        "instagram", "insta", "rede social", "redes sociais", "facebook",
+        "social", "fotos", "portfolio",
+    ]),
+    ("engagement_yes", 70, ["sim", "claro", "quero", "pode", "gostaria", "ok"]),
+    ("engagement_no", 71, ["nao", "agora nao", "depois"]),
+    ("welcome_yes", 80, [
+        "sim", "claro", "quero", "pode", "gostaria", "lista", "sim por favor",
+        "com certeza", "aceito",
+    ]),
+    ("welcome_no", 81, ["nao", "agora nao", "depois", "talvez depois"]),
+    ("confirm_yes", 90, ["sim", "confirmar", "ok", "pode"]),
+    ("confirm_no", 91, ["nao", "cancelar"]),
+]
+
+# --------------------------------------------------
+# MATCHER COMPILADO
+# --------------------------------------------------
+# Uma única regex com todas as palavras-chave (mais longas primeiro), montada
+# uma vez no import. O lookahead de largura zero testa todas as posições do
+# texto em uma só passada no motor em C, capturando a palavra mais longa que
+# começa em cada posição.
+#
+# Cada palavra-chave é mapeada para as intenções de TODAS as palavras contidas
+# nela (ex.: "nao quero" → decline_more + intenções de "nao" e de "quero"),
+# então a palavra mais longa já cobre as mais curtas que começam no mesmo lugar.
+
+_PRIORITY = {intent: priority for intent, priority, _ in INTENT_TABLE}
+
+def _build_matcher():
+    keyword_intents = {}
+    for intent, _, keywords in INTENT_TABLE:
+        for keyword in keywords:
+            keyword_intents.setdefault(normalize(keyword), set()).add(intent)
+
+    closure = {
+        keyword: frozenset().union(
+            *(intents for other, intents in keyword_intents.items() if other in keyword)
+        )
+        for keyword in keyword_intents
+    }
+
+    alternatives = "|".join(
+        re.escape(keyword) for keyword in sorted(keyword_intents, key=len, reverse=True)
+    )
+    return re.compile(f"(?=({alternatives}))"), closure
+
+_MATCHER, _KEYWORD_INTENTS = _build_matcher()
+
+def match_intents(normalized_text: str) -> tuple:
+    """
+    Retorna todas as intenções presentes no texto normalizado,
+    ordenadas por prioridade (mais importante primeiro).
+    """
+    found = set()
+    for keyword in _MATCHER.findall(normalized_text):
+        found |= _KEYWORD_INTENTS[keyword]
+    return tuple(sorted(found, key=_PRIORITY.__getitem__))
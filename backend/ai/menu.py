@@ -0,0 +1,75 @@
+import threading
+
+from backend.ai.catalog import catalog_provider
+
+# --------------------------------------------------
+# MENU DE SERVIÇOS (RENDERIZADO POR VERSÃO DO CATÁLOGO)
+# --------------------------------------------------
+# O menu só muda quando o catálogo muda, então é montado uma vez por versão:
+# seções por categoria, texto completo e resposta pronta. A recarga do
+# catálogo limpa o cache (listener no CatalogProvider); no caminho quente,
+# pedir o menu é uma leitura de dict.
+
+CATEGORY_EMOJIS = {
+    "Depilação": "✨",
+    "Estética Facial": "💆‍♀️",
+    "Cílios & Sobrancelhas": "👁️",
+    "Design na Linha": "✂️",
+    "Tratamentos Corporais": "💎",
+    "Nail Designer": "💅",
+    "Manicure & Pedicure": "🌸"
+}
+
+MENU_REPLY_HEADER = "Confira nossos serviços:\n\n"
+MENU_REPLY_FOOTER = (
+    "\n\n👉 Digite o número ou nome do serviço que deseja agendar!\n\n"
+    "💡 Exemplo: *1* ou *sobrancelha*"
+)
+
+def format_service_line(number: int, service: dict) -> str:
+    price = service['price']
+    price_str = f"R$ {price:.2f}" if isinstance(price, (int, float)) else price
+    return f"{number}. {service['name']} — {price_str}"
+
+class ServiceMenu:
+    """Menu renderizado de uma versão do catálogo (somente leitura)."""
+
+    def __init__(self, catalog):
+        self.version = catalog.version
+
+        # Sub-menu por categoria, com a numeração global do catálogo
+        self.sections = {}
+        service_number = 1
+        for category, services in catalog.categories.items():
+            emoji = CATEGORY_EMOJIS.get(category, "✨")
+            lines = [f"\n{emoji} *{category.upper()}*"]
+            for service in services:
+                lines.append(format_service_line(service_number, service))
+                service_number += 1
+            self.sections[category] = "\n".join(lines)
+
+        self.text = "\n".join(self.sections.values())
+        self.reply = MENU_REPLY_HEADER + self.text + MENU_REPLY_FOOTER
+
+_menus = {}
+_menu_lock = threading.Lock()
+
+def get_services_menu() -> ServiceMenu:
+    catalog = catalog_provider.get()
+
+    menu = _menus.get(catalog.version)
+    if menu is not None:
+        return menu
+
+    with _menu_lock:
+        menu = _menus.get(catalog.version)
+        if menu is None:
+            menu = ServiceMenu(catalog)
+            _menus[catalog.version] = menu
+        return menu
+
+def invalidate_services_menu(catalog=None):
+    with _menu_lock:
+        _menus.clear()
+
+catalog_provider.add_reload_listener(invalidate_services_menu)
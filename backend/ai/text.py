@@ -0,0 +1,46 @@
+import os
+import unicodedata
+from functools import lru_cache
+
+# --------------------------------------------------
+# NORMALIZAÇÃO DE TEXTO
+# --------------------------------------------------
+# minúsculo + strip + remoção de acentos (NFD sem marcas combinantes).
+#
+# O mesmo texto é normalizado várias vezes por mensagem (engine, saudações,
+# respostas negativas, extrator de data), então mensagens curtas passam por
+# um cache LRU. Textos longos não são cacheados para não segurar memória com
+# entradas que dificilmente se repetem.
+
+NORMALIZE_CACHE_SIZE = int(os.getenv("NORMALIZE_CACHE_SIZE", "4096"))
+NORMALIZE_CACHE_MAX_LENGTH = 256
+
+def _normalize(text: str) -> str:
+    text = text.lower().strip()
+
+    # Caminho rápido: ASCII puro não tem acento para remover
+    if text.isascii():
+        return text
+
+    text = unicodedata.normalize("NFD", text)
+    return "".join(c for c in text if unicodedata.category(c) != "Mn")
+
+_normalize_cached = lru_cache(maxsize=NORMALIZE_CACHE_SIZE)(_normalize)
+
+def normalize(text: str) -> str:
+    if len(text) > NORMALIZE_CACHE_MAX_LENGTH:
+        return _normalize(text)
+    return _normalize_cached(text)
+
+def normalize_all(values) -> frozenset:
+    """Normaliza uma coleção de termos uma única vez (tabelas fixas)."""
+    return frozenset(normalize(value) for value in values)
+
+def get_normalize_stats() -> dict:
+    info = _normalize_cached.cache_info()
+    return {
+        "hits": info.hits,
+        "misses": info.misses,
+        "size": info.currsize,
+        "capacity": info.maxsize,
+    }
@@ -3,8 +3,19 @@ from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
 from backend.routes.chat import router as chat_router
-from backend.routes.webhook import router as webhook_router
+from backend.routes.webhook import router as webhook_router, process_webhook_job
 from backend.db.init_db import init_db
+from backend.db.session import get_db_stats, dispose_async_engine
+from backend.integrations.sheets import get_mute_registry_stats, get_agenda_stats
+from backend.core.concurrency import run_blocking, shutdown_blocking_pool
+from backend.core.jobs import start_job_workers, stop_job_workers, get_job_queue_stats
+from backend.core.dedupe import message_dedupe
+from backend.core.session_cache import session_cache
+from backend.core.utils import close_http_clients, get_http_stats
+from backend.core.outbox import start_outbox_senders, stop_outbox_senders, get_outbox_stats
+from backend.core.message_log import start_message_log_writer, stop_message_log_writer, get_message_log_stats
+from backend.ai.text import get_normalize_stats
+from backend.ai.catalog import get_catalog_stats
 
 # --------------------------------------------------
 # APP
@@ -23,8 +34,21 @@ app = FastAPI(
 async def on_startup():
     print("🚀 Iniciando aplicação...")
     init_db()
+    await start_message_log_writer()
+    await start_job_workers(process_webhook_job)
+    await start_outbox_senders()
     print("✅ Application startup complete.")
 
+@app.on_event("shutdown")
+async def on_shutdown():
+    await stop_job_workers()
+    await stop_outbox_senders()
+    await stop_message_log_writer()
+    await close_http_clients()
+    await dispose_async_engine()
+    shutdown_blocking_pool()
+    print("👋 Application shutdown complete.")
+
 # --------------------------------------------------
 # MIDDLEWARE
 # --------------------------------------------------
@@ -52,6 +76,22 @@ async def root():
 async def health():
     return {"status": "ok"}
 
+@app.get("/metrics", tags=["system"])
+async def metrics():
+    return {
+        "mute_cache": get_mute_registry_stats(),
+        "agenda": get_agenda_stats(),
+        "db": get_db_stats(),
+        "job_queue": await run_blocking("db", get_job_queue_stats),
+        "dedupe": message_dedupe.stats(),
+        "session_cache": session_cache.stats(),
+        "zapi_http": get_http_stats(),
+        "outbox": await run_blocking("db", get_outbox_stats),
+        "message_log": get_message_log_stats(),
+        "normalize_cache": get_normalize_stats(),
+        "catalog": get_catalog_stats(),
+    }
+
 # --------------------
 # CHAT (Swagger / Testes)
 # --------------------
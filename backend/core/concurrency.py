@@ -0,0 +1,77 @@
+import asyncio
+import functools
+from contextlib import asynccontextmanager
+from concurrent.futures import ThreadPoolExecutor
+
+from backend.core.config import settings
+
+# --------------------------------------------------
+# POOL DE THREADS PARA TRABALHO BLOQUEANTE
+# --------------------------------------------------
+# As rotas são async, mas SQLAlchemy (sync), gspread e requests bloqueiam.
+# Tudo que bloqueia roda neste pool, e cada etapa tem seu próprio limite de
+# concorrência para que uma integração lenta não ocupe todas as threads.
+
+_executor = ThreadPoolExecutor(
+    max_workers=settings.BLOCKING_POOL_SIZE,
+    thread_name_prefix="blocking"
+)
+
+STAGE_LIMITS = {
+    "db": settings.STAGE_LIMIT_DB,
+    "sheets": settings.STAGE_LIMIT_SHEETS,
+    "engine": settings.STAGE_LIMIT_ENGINE,
+    "zapi": settings.STAGE_LIMIT_ZAPI,
+}
+
+_semaphores = {
+    stage: asyncio.Semaphore(limit)
+    for stage, limit in STAGE_LIMITS.items()
+}
+
+async def run_blocking(stage: str, func, *args, **kwargs):
+    """
+    Executa func(*args, **kwargs) no pool de threads, respeitando o limite
+    de concorrência da etapa (db, sheets, engine, zapi).
+    """
+    semaphore = _semaphores[stage]
+    loop = asyncio.get_running_loop()
+
+    async with semaphore:
+        return await loop.run_in_executor(
+            _executor,
+            functools.partial(func, *args, **kwargs)
+        )
+
+# --------------------------------------------------
+# TRAVA POR CHAVE (EX.: TELEFONE)
+# --------------------------------------------------
+
+class KeyedLock:
+    """
+    Mapa de asyncio.Lock por chave: serializa o trabalho de uma mesma chave
+    e deixa chaves diferentes rodarem em paralelo.
+    Locks sem ninguém aguardando são removidos para o mapa não crescer.
+    """
+
+    def __init__(self):
+        self._locks = {}  # chave -> [lock, usuários]
+
+    @asynccontextmanager
+    async def hold(self, key: str):
+        entry = self._locks.setdefault(key, [asyncio.Lock(), 0])
+        entry[1] += 1
+        try:
+            async with entry[0]:
+                yield
+        finally:
+            entry[1] -= 1
+            if entry[1] == 0:
+                del self._locks[key]
+
+    def __len__(self):
+        return len(self._locks)
+
+def shutdown_blocking_pool():
+    """Aguarda as tarefas em andamento e encerra o pool (shutdown da app)."""
+    _executor.shutdown(wait=True)
@@ -10,9 +10,23 @@ class Settings:
 
     DATABASE_URL: str = os.getenv("DATABASE_URL", "sqlite:///./olhar_sob_medida.db")
 
-    # --- Configurações de IA (Gemini) ---
-    GEMINI_API_KEY: str = os.getenv("GEMINI_API_KEY", "")
-    AI_MODEL: str = os.getenv("AI_MODEL", "models/gemini-2.0-flash")
+    # --- Perfil do banco (ver backend/db/session.py) ---
+    # SQLite: PRAGMAs aplicados em cada conexão nova
+    SQLITE_JOURNAL_MODE: str = os.getenv("SQLITE_JOURNAL_MODE", "WAL")
+    SQLITE_SYNCHRONOUS: str = os.getenv("SQLITE_SYNCHRONOUS", "NORMAL")
+    SQLITE_BUSY_TIMEOUT_MS: int = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+    SQLITE_CACHE_SIZE_KB: int = int(os.getenv("SQLITE_CACHE_SIZE_KB", "20000"))
+    SQLITE_MMAP_SIZE: int = int(os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024)))
+    SQLITE_TEMP_STORE: str = os.getenv("SQLITE_TEMP_STORE", "MEMORY")
+    # Pool de conexões (SQLite em arquivo e Postgres)
+    DB_POOL_SIZE: int = int(os.getenv("DB_POOL_SIZE", "8"))
+    DB_MAX_OVERFLOW: int = int(os.getenv("DB_MAX_OVERFLOW", "8"))
+    DB_POOL_TIMEOUT: float = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+    DB_POOL_RECYCLE: int = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+    # Postgres: limite por comando (ms, 0 desliga)
+    PG_STATEMENT_TIMEOUT_MS: int = int(os.getenv("PG_STATEMENT_TIMEOUT_MS", "15000"))
+    # Engine assíncrono (aiosqlite/asyncpg) no caminho do webhook, se instalado
+    DB_ASYNC: bool = os.getenv("DB_ASYNC", "True").lower() == "true"
 
     # --- Integração Z-API (WhatsApp) ---
     # IDs extraídos do painel Z-API e configurados no Render
@@ -20,11 +34,59 @@ class Settings:
     Z_API_TOKEN: str = os.getenv("Z_API_TOKEN", "")
     # O Client-Token é essencial para a segurança da sua conta e para evitar o erro 400
     ZAPI_CLIENT_TOKEN: str = os.getenv("ZAPI_CLIENT_TOKEN", "")
+    # Pool de conexões keep-alive com a Z-API
+    ZAPI_POOL_SIZE: int = int(os.getenv("ZAPI_POOL_SIZE", "10"))
+    ZAPI_CONNECT_TIMEOUT: float = float(os.getenv("ZAPI_CONNECT_TIMEOUT", "5"))
+    ZAPI_READ_TIMEOUT: float = float(os.getenv("ZAPI_READ_TIMEOUT", "10"))
 
     # --- Integração Google Sheets ---
     # Variáveis identificadas no seu dashboard do Render
     GOOGLE_SHEETS_CREDENTIALS: str = os.getenv("GOOGLE_SHEETS_CREDENTIALS", "")
     PLANILHA_NOME: str = os.getenv("PLANILHA_NOME", "")
+    # Chave da planilha (opcional): abre direto por ID, sem busca no Drive
+    PLANILHA_ID: str = os.getenv("PLANILHA_ID", "")
+
+    # --- Concorrência do webhook ---
+    # Pool de threads para trabalho bloqueante (SQLAlchemy, gspread, requests)
+    BLOCKING_POOL_SIZE: int = int(os.getenv("BLOCKING_POOL_SIZE", "32"))
+    # Limite de chamadas simultâneas por etapa do pipeline
+    STAGE_LIMIT_DB: int = int(os.getenv("STAGE_LIMIT_DB", "4"))
+    STAGE_LIMIT_SHEETS: int = int(os.getenv("STAGE_LIMIT_SHEETS", "8"))
+    STAGE_LIMIT_ENGINE: int = int(os.getenv("STAGE_LIMIT_ENGINE", "16"))
+    STAGE_LIMIT_ZAPI: int = int(os.getenv("STAGE_LIMIT_ZAPI", "16"))
+
+    # --- Fila de jobs do webhook ---
+    JOB_WORKERS: int = int(os.getenv("JOB_WORKERS", "4"))
+    JOB_MAX_ATTEMPTS: int = int(os.getenv("JOB_MAX_ATTEMPTS", "5"))
+    JOB_RETRY_BASE_SECONDS: float = float(os.getenv("JOB_RETRY_BASE_SECONDS", "2"))
+    JOB_POLL_INTERVAL: float = float(os.getenv("JOB_POLL_INTERVAL", "0.5"))
+    JOB_RETENTION_HOURS: int = int(os.getenv("JOB_RETENTION_HOURS", "48"))
+
+    # --- Outbox (envio de respostas em background) ---
+    OUTBOX_SENDERS: int = int(os.getenv("OUTBOX_SENDERS", "2"))
+    OUTBOX_RATE_PER_SECOND: float = float(os.getenv("OUTBOX_RATE_PER_SECOND", "5"))
+    OUTBOX_BURST: int = int(os.getenv("OUTBOX_BURST", "10"))
+    OUTBOX_PHONE_RATE_PER_SECOND: float = float(os.getenv("OUTBOX_PHONE_RATE_PER_SECOND", "1"))
+    OUTBOX_PHONE_BURST: int = int(os.getenv("OUTBOX_PHONE_BURST", "3"))
+    OUTBOX_MAX_ATTEMPTS: int = int(os.getenv("OUTBOX_MAX_ATTEMPTS", "6"))
+    OUTBOX_RETRY_BASE_SECONDS: float = float(os.getenv("OUTBOX_RETRY_BASE_SECONDS", "2"))
+    # Mensagens pendentes do mesmo telefone são juntas até este tamanho
+    OUTBOX_MAX_MESSAGE_CHARS: int = int(os.getenv("OUTBOX_MAX_MESSAGE_CHARS", "4000"))
+
+    # --- Log de mensagens (gravação em lote, em background) ---
+    MESSAGE_LOG_BATCH_SIZE: int = int(os.getenv("MESSAGE_LOG_BATCH_SIZE", "200"))
+    MESSAGE_LOG_FLUSH_INTERVAL: float = float(os.getenv("MESSAGE_LOG_FLUSH_INTERVAL", "1"))
+    MESSAGE_LOG_BUFFER_MAX: int = int(os.getenv("MESSAGE_LOG_BUFFER_MAX", "10000"))
+    # Tentativas de uma linha que o banco recusa antes de ser descartada
+    MESSAGE_LOG_MAX_ATTEMPTS: int = int(os.getenv("MESSAGE_LOG_MAX_ATTEMPTS", "5"))
+
+    # --- Cache de sessões de conversa (por processo) ---
+    SESSION_CACHE_CAPACITY: int = int(os.getenv("SESSION_CACHE_CAPACITY", "5000"))
+    SESSION_CACHE_TTL_SECONDS: float = float(os.getenv("SESSION_CACHE_TTL_SECONDS", "1800"))
+
+    # --- Deduplicação de mensagens (reentregas da Z-API) ---
+    DEDUPE_CAPACITY: int = int(os.getenv("DEDUPE_CAPACITY", "5000"))
+    DEDUPE_TTL_SECONDS: float = float(os.getenv("DEDUPE_TTL_SECONDS", "3600"))
 
     # --- Configurações de Sistema ---
     DEBUG: bool = os.getenv("DEBUG", "True").lower() == "true"
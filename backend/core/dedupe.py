@@ -0,0 +1,91 @@
+import time
+import threading
+from collections import OrderedDict
+
+from backend.core.config import settings
+
+# --------------------------------------------------
+# DEDUPLICAÇÃO DE MENSAGENS (ANTI-REENTREGA)
+# --------------------------------------------------
+# Camada em memória na frente da fila: reentregas recentes da Z-API são
+# descartadas sem tocar no banco. O registro compartilhado entre workers
+# (gunicorn) continua sendo a constraint UNIQUE de webhook_jobs.message_id.
+
+class DedupeStore:
+    """
+    Conjunto limitado de IDs já vistos, com janela de tempo.
+
+    - Remove sempre o ID mais antigo quando passa da capacidade (ordem de inserção)
+    - IDs mais velhos que ttl_seconds são considerados esquecidos
+    - Contadores de hit (duplicata) / miss (mensagem nova)
+    """
+
+    def __init__(self, capacity: int, ttl_seconds: float):
+        self.capacity = capacity
+        self.ttl_seconds = ttl_seconds
+        self._seen = OrderedDict()  # message_id -> instante em que foi visto
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.shared_hits = 0
+        self.evictions = 0
+
+    def _expire(self, now: float):
+        while self._seen:
+            _, seen_at = next(iter(self._seen.items()))
+            if now - seen_at <= self.ttl_seconds:
+                break
+            self._seen.popitem(last=False)
+
+    def seen_or_add(self, message_id: str) -> bool:
+        """
+        Retorna True se o ID já foi visto dentro da janela (duplicata).
+        Caso contrário registra o ID e retorna False.
+        """
+        now = time.monotonic()
+
+        with self._lock:
+            self._expire(now)
+
+            if message_id in self._seen:
+                self.hits += 1
+                return True
+
+            self.misses += 1
+            self._seen[message_id] = now
+
+            while len(self._seen) > self.capacity:
+                self._seen.popitem(last=False)
+                self.evictions += 1
+
+            return False
+
+    def discard(self, message_id: str):
+        """Esquece um ID (ex.: falha ao enfileirar, a reentrega deve ser aceita)."""
+        with self._lock:
+            self._seen.pop(message_id, None)
+
+    def record_shared_hit(self):
+        """Duplicata detectada pelo registro compartilhado (outro worker)."""
+        with self._lock:
+            self.shared_hits += 1
+
+    def __len__(self):
+        return len(self._seen)
+
+    def stats(self) -> dict:
+        return {
+            "size": len(self._seen),
+            "capacity": self.capacity,
+            "ttl_seconds": self.ttl_seconds,
+            "hits": self.hits,
+            "misses": self.misses,
+            "shared_hits": self.shared_hits,
+            "evictions": self.evictions,
+        }
+
+message_dedupe = DedupeStore(
+    capacity=settings.DEDUPE_CAPACITY,
+    ttl_seconds=settings.DEDUPE_TTL_SECONDS
+)
@@ -0,0 +1,417 @@
+import asyncio
+import json
+import os
+import socket
+import uuid
+from datetime import datetime, timedelta
+
+from sqlalchemy import select, update, delete, func, exists
+from sqlalchemy.orm import aliased
+from sqlalchemy.exc import IntegrityError
+
+from backend.core.config import settings
+from backend.core.concurrency import run_blocking, KeyedLock
+from backend.db.session import SessionLocal
+from backend.db.models import WebhookJob
+
+# --------------------------------------------------
+# FILA DURÁVEL DE JOBS (SQLite)
+# --------------------------------------------------
+# O webhook só valida e grava o payload em webhook_jobs; workers em
+# background drenam a fila com retentativa e backoff exponencial.
+# A constraint UNIQUE em message_id é o registro de idempotência.
+#
+# Ordem por telefone: mensagens do mesmo número são processadas uma de
+# cada vez, na ordem de chegada; números diferentes rodam em paralelo.
+
+# Lease de processamento: o worker renova updated_at a cada
+# JOB_HEARTBEAT_SECONDS enquanto o handler roda; job em "processing" sem
+# heartbeat há mais que JOB_LEASE_SECONDS é considerado abandonado (crash).
+JOB_LEASE_SECONDS = 30
+JOB_HEARTBEAT_SECONDS = 10
+MAINTENANCE_INTERVAL_SECONDS = 15
+# A limpeza de jobs concluídos não precisa rodar a cada ciclo
+PURGE_INTERVAL_SECONDS = 3600
+
+# Identidade deste processo nos jobs que ele reserva ("host:pid:token").
+# No startup, jobs em "processing" de um processo anterior no mesmo host
+# (pid morto ou o próprio pid reaproveitado) voltam para a fila na hora,
+# sem esperar o lease.
+HOSTNAME = socket.gethostname()
+PROCESS_ID = f"{HOSTNAME}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+_wakeup = None
+_stopping = None
+_tasks = []
+
+# Trava por telefone dentro do processo (complementa a regra do claim)
+phone_locks = KeyedLock()
+
+def enqueue_job(message_id: str, phone: str, payload: dict) -> bool:
+    """
+    Grava o payload na fila.
+    Retorna False se o message_id já foi recebido (reentrega da Z-API).
+    """
+    db = SessionLocal()
+    try:
+        db.add(
+            WebhookJob(
+                message_id=message_id,
+                phone=phone,
+                payload=json.dumps(payload, ensure_ascii=False)
+            )
+        )
+        db.commit()
+        return True
+    except IntegrityError:
+        db.rollback()
+        return False
+    finally:
+        db.close()
+
+def claim_next_job():
+    """
+    Reserva o job pendente mais antigo (pending → processing).
+
+    Só é elegível o job mais antigo de cada telefone, e apenas se não houver
+    outro job do mesmo telefone em processamento — assim "dia 20" e "15h"
+    enviados em sequência nunca rodam ao mesmo tempo nem fora de ordem.
+    O UPDATE condicionado ao status garante que dois workers não peguem o mesmo job.
+    """
+    db = SessionLocal()
+    try:
+        now = datetime.now()
+        other = aliased(WebhookJob)
+        blocked = exists().where(
+            other.phone == WebhookJob.phone,
+            (other.status == "processing")
+            | ((other.status == "pending") & (other.id < WebhookJob.id))
+        )
+        job_id = db.execute(
+            select(WebhookJob.id)
+            .where(
+                WebhookJob.status == "pending",
+                WebhookJob.next_attempt_at <= now,
+                ~blocked
+            )
+            .order_by(WebhookJob.id)
+            .limit(1)
+        ).scalar()
+
+        if job_id is None:
+            return None
+
+        result = db.execute(
+            update(WebhookJob)
+            .where(WebhookJob.id == job_id, WebhookJob.status == "pending")
+            .values(
+                status="processing",
+                attempts=WebhookJob.attempts + 1,
+                claimed_by=PROCESS_ID,
+                updated_at=now
+            )
+        )
+        db.commit()
+
+        if result.rowcount != 1:
+            return None
+
+        job = db.get(WebhookJob, job_id)
+        return {
+            "id": job.id,
+            "message_id": job.message_id,
+            "phone": job.phone,
+            "payload": json.loads(job.payload),
+            "attempts": job.attempts,
+        }
+    finally:
+        db.close()
+
+def _owned_by_me(job_id: int):
+    """Condição: o job ainda está em "processing" e reservado por este processo."""
+    return (
+        (WebhookJob.id == job_id)
+        & (WebhookJob.status == "processing")
+        & (WebhookJob.claimed_by == PROCESS_ID)
+    )
+
+def complete_job_statement(job_id: int):
+    """
+    UPDATE que marca o job como concluído. O handler o executa na mesma
+    transação da resposta (sessão + outbox): um crash entre os dois não
+    reprocessa a mensagem nem enfileira resposta duplicada.
+    """
+    return (
+        update(WebhookJob)
+        .where(_owned_by_me(job_id))
+        .values(status="done", last_error=None, updated_at=datetime.now())
+    )
+
+def complete_job(job_id: int):
+    """Conclui o job, se o handler ainda não o concluiu na própria transação."""
+    db = SessionLocal()
+    try:
+        db.execute(complete_job_statement(job_id))
+        db.commit()
+    finally:
+        db.close()
+
+def heartbeat_job(job_id: int) -> bool:
+    """Renova o lease do job. Retorna False se o job não é mais deste processo."""
+    db = SessionLocal()
+    try:
+        result = db.execute(
+            update(WebhookJob)
+            .where(_owned_by_me(job_id))
+            .values(updated_at=datetime.now())
+        )
+        db.commit()
+        return result.rowcount == 1
+    finally:
+        db.close()
+
+def fail_job(job_id: int, attempts: int, error: str):
+    """
+    Agenda nova tentativa com backoff exponencial, ou marca como "failed"
+    quando JOB_MAX_ATTEMPTS é atingido.
+    """
+    now = datetime.now()
+
+    if attempts >= settings.JOB_MAX_ATTEMPTS:
+        values = {"status": "failed"}
+        print(f"💀 [JOBS] Job {job_id} falhou definitivamente após {attempts} tentativas: {error}")
+    else:
+        delay = settings.JOB_RETRY_BASE_SECONDS * (2 ** (attempts - 1))
+        values = {"status": "pending", "next_attempt_at": now + timedelta(seconds=delay)}
+        print(f"🔁 [JOBS] Job {job_id} será reprocessado em {delay:.1f}s (tentativa {attempts}): {error}")
+
+    db = SessionLocal()
+    try:
+        db.execute(
+            update(WebhookJob)
+            .where(_owned_by_me(job_id))
+            .values(last_error=error, updated_at=now, **values)
+        )
+        db.commit()
+    finally:
+        db.close()
+
+def requeue_abandoned_jobs() -> int:
+    """Devolve para a fila jobs em "processing" sem heartbeat dentro do lease."""
+    db = SessionLocal()
+    try:
+        limit = datetime.now() - timedelta(seconds=JOB_LEASE_SECONDS)
+        result = db.execute(
+            update(WebhookJob)
+            .where(WebhookJob.status == "processing", WebhookJob.updated_at < limit)
+            .values(status="pending", claimed_by=None, next_attempt_at=datetime.now())
+        )
+        db.commit()
+        return result.rowcount
+    finally:
+        db.close()
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+def _is_orphan_owner(owner: str) -> bool:
+    """Dono de job que com certeza não existe mais (processo anterior neste host)."""
+    if not owner:
+        # Reservado antes da coluna claimed_by existir
+        return True
+
+    try:
+        host, pid, _token = owner.rsplit(":", 2)
+        pid = int(pid)
+    except ValueError:
+        return True
+
+    if owner == PROCESS_ID or host != HOSTNAME:
+        # Outro host: só o lease resolve
+        return False
+
+    return pid == os.getpid() or not _pid_alive(pid)
+
+def requeue_orphaned_jobs() -> int:
+    """
+    Startup: devolve para a fila, na hora, os jobs em "processing" deixados
+    por um processo anterior deste host (crash/redeploy), em vez de
+    bloquear o telefone até o lease expirar.
+    """
+    db = SessionLocal()
+    try:
+        owners = db.execute(
+            select(WebhookJob.claimed_by)
+            .where(WebhookJob.status == "processing")
+            .distinct()
+        ).scalars().all()
+
+        orphans = [owner for owner in owners if _is_orphan_owner(owner)]
+        if not orphans:
+            return 0
+
+        owner_filter = WebhookJob.claimed_by.in_([o for o in orphans if o])
+        if None in orphans or "" in orphans:
+            owner_filter = owner_filter | WebhookJob.claimed_by.is_(None) | (WebhookJob.claimed_by == "")
+
+        result = db.execute(
+            update(WebhookJob)
+            .where(WebhookJob.status == "processing", owner_filter)
+            .values(status="pending", claimed_by=None, next_attempt_at=datetime.now())
+        )
+        db.commit()
+        return result.rowcount
+    finally:
+        db.close()
+
+def purge_finished_jobs() -> int:
+    """Remove jobs concluídos mais antigos que JOB_RETENTION_HOURS."""
+    db = SessionLocal()
+    try:
+        limit = datetime.now() - timedelta(hours=settings.JOB_RETENTION_HOURS)
+        result = db.execute(
+            delete(WebhookJob)
+            .where(WebhookJob.status == "done", WebhookJob.updated_at < limit)
+        )
+        db.commit()
+        return result.rowcount
+    finally:
+        db.close()
+
+def get_job_queue_stats() -> dict:
+    """Quantidade de jobs por status (para monitoramento)."""
+    db = SessionLocal()
+    try:
+        rows = db.execute(
+            select(WebhookJob.status, func.count()).group_by(WebhookJob.status)
+        ).all()
+        return {status: count for status, count in rows}
+    finally:
+        db.close()
+
+# --------------------------------------------------
+# WORKERS
+# --------------------------------------------------
+
+def notify_workers():
+    """Acorda os workers logo após um enqueue (evita esperar o polling)."""
+    if _wakeup is not None:
+        _wakeup.set()
+
+async def _wait_for_work():
+    try:
+        await asyncio.wait_for(_wakeup.wait(), timeout=settings.JOB_POLL_INTERVAL)
+    except asyncio.TimeoutError:
+        pass
+    _wakeup.clear()
+
+async def _record_result(worker_id: int, func, job_id: int, *args):
+    """
+    complete_job/fail_job protegidos: se o banco falhar aqui, o worker
+    continua vivo e o job é recuperado quando o lease vence
+    (requeue_abandoned_jobs) ou no próximo startup (requeue_orphaned_jobs).
+    """
+    try:
+        await run_blocking("db", func, job_id, *args)
+    except Exception as e:
+        print(f"❌ [JOBS] Worker {worker_id} falhou ao registrar o job {job_id} ({func.__name__}): {e}")
+
+async def _worker_loop(worker_id: int, handler):
+    while not _stopping.is_set():
+        try:
+            job = await run_blocking("db", claim_next_job)
+        except Exception as e:
+            print(f"❌ [JOBS] Worker {worker_id} falhou ao buscar job: {e}")
+            job = None
+
+        if job is None:
+            await _wait_for_work()
+            continue
+
+        heartbeat = asyncio.create_task(_heartbeat_loop(job["id"]))
+        try:
+            async with phone_locks.hold(job["phone"]):
+                await handler(job)
+        except Exception as e:
+            await _record_result(worker_id, fail_job, job["id"], job["attempts"], str(e))
+        else:
+            await _record_result(worker_id, complete_job, job["id"])
+        finally:
+            heartbeat.cancel()
+
+        # Libera a próxima mensagem deste telefone para outro worker
+        notify_workers()
+
+async def _heartbeat_loop(job_id: int):
+    while True:
+        await asyncio.sleep(JOB_HEARTBEAT_SECONDS)
+        try:
+            if not await run_blocking("db", heartbeat_job, job_id):
+                print(f"⚠️ [JOBS] Job {job_id} não pertence mais a este processo (lease perdido)")
+                return
+        except Exception as e:
+            print(f"⚠️ [JOBS] Erro no heartbeat do job {job_id}: {e}")
+
+async def _maintenance_loop():
+    last_purge = 0.0
+
+    while not _stopping.is_set():
+        try:
+            requeued = await run_blocking("db", requeue_abandoned_jobs)
+            purged = 0
+            if asyncio.get_running_loop().time() - last_purge > PURGE_INTERVAL_SECONDS:
+                last_purge = asyncio.get_running_loop().time()
+                purged = await run_blocking("db", purge_finished_jobs)
+            if requeued or purged:
+                print(f"🧹 [JOBS] Reenfileirados: {requeued} | Removidos: {purged}")
+        except Exception as e:
+            print(f"⚠️ [JOBS] Erro na manutenção da fila: {e}")
+
+        try:
+            await asyncio.wait_for(_stopping.wait(), timeout=MAINTENANCE_INTERVAL_SECONDS)
+        except asyncio.TimeoutError:
+            pass
+
+async def start_job_workers(handler):
+    """
+    Inicia JOB_WORKERS workers que chamam `await handler(job)` para cada job.
+    Se o handler levantar exceção, o job volta para a fila com backoff.
+    """
+    global _wakeup, _stopping
+
+    _wakeup = asyncio.Event()
+    _stopping = asyncio.Event()
+
+    try:
+        orphaned = await run_blocking("db", requeue_orphaned_jobs)
+        if orphaned:
+            print(f"♻️ [JOBS] {orphaned} job(s) do processo anterior devolvidos para a fila")
+    except Exception as e:
+        print(f"⚠️ [JOBS] Erro ao recuperar jobs do processo anterior: {e}")
+
+    _tasks.append(asyncio.create_task(_maintenance_loop()))
+    for worker_id in range(settings.JOB_WORKERS):
+        _tasks.append(asyncio.create_task(_worker_loop(worker_id, handler)))
+
+    print(f"👷 [JOBS] {settings.JOB_WORKERS} workers iniciados")
+
+async def stop_job_workers(timeout: float = 10):
+    """Para de pegar novos jobs e aguarda os que estão em andamento."""
+    if _stopping is None:
+        return
+
+    _stopping.set()
+    _wakeup.set()
+
+    done, pending = await asyncio.wait(_tasks, timeout=timeout)
+    for task in pending:
+        task.cancel()
+
+    _tasks.clear()
+    print("👷 [JOBS] Workers finalizados")
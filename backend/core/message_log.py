@@ -0,0 +1,224 @@
+import asyncio
+import threading
+from collections import deque
+from datetime import datetime
+
+from sqlalchemy import insert, text
+
+from backend.core.config import settings
+from backend.core.concurrency import run_blocking
+from backend.db.session import engine, async_engine, ASYNC_DB_ENABLED
+from backend.db.models import MessageLog
+
+# --------------------------------------------------
+# LOG DE MENSAGENS EM BACKGROUND (WRITE-BEHIND)
+# --------------------------------------------------
+# O log não é necessário para responder à cliente, então o pipeline só
+# coloca a linha em um buffer em memória; uma task em background grava os
+# lotes com um único INSERT multi-linha, quando o buffer chega a
+# MESSAGE_LOG_BATCH_SIZE ou a cada MESSAGE_LOG_FLUSH_INTERVAL segundos.
+# O que sobrar no buffer é gravado no shutdown.
+#
+# Memória limitada: o buffer guarda no máximo MESSAGE_LOG_BUFFER_MAX
+# linhas. Se o banco ficar indisponível por muito tempo e o buffer
+# encher, as linhas mais antigas são descartadas (contadas em "dropped")
+# — o log nunca segura a resposta.
+#
+# Linha envenenada: se um lote falha, as linhas são regravadas uma a uma,
+# para que uma linha que o banco recusa (ex.: valor inválido) não trave as
+# demais. Cada falha individual com o banco no ar conta uma tentativa; após
+# MESSAGE_LOG_MAX_ATTEMPTS a linha é descartada (contada em "failed_dropped").
+# Com o banco fora do ar nenhuma tentativa é contada: as linhas só voltam
+# para o buffer.
+
+_buffer = deque()
+_buffer_lock = threading.Lock()
+
+_wakeup = None
+_stopping = None
+_task = None
+
+message_log_stats = {
+    "recorded": 0,
+    "written": 0,
+    "flushes": 0,
+    "flush_errors": 0,
+    "dropped": 0,
+    "row_retries": 0,
+    "failed_dropped": 0,
+}
+
+def _append(rows: list, front: bool = False):
+    with _buffer_lock:
+        if front:
+            _buffer.extendleft(reversed(rows))
+        else:
+            _buffer.extend(rows)
+
+        overflow = len(_buffer) - settings.MESSAGE_LOG_BUFFER_MAX
+        for _ in range(max(0, overflow)):
+            _buffer.popleft()
+        if overflow > 0:
+            message_log_stats["dropped"] += overflow
+
+        return len(_buffer)
+
+def record_message(phone: str, message: str, direction: str):
+    """Enfileira uma linha do MessageLog (entrada "in" ou saída "out") sem tocar no banco."""
+    size = _append([{
+        "phone": phone,
+        "message": message,
+        "direction": direction,
+        "timestamp": datetime.now(),
+        "attempts": 0,
+    }])
+    message_log_stats["recorded"] += 1
+
+    if size >= settings.MESSAGE_LOG_BATCH_SIZE and _wakeup is not None:
+        _wakeup.set()
+
+def _take_batch() -> list:
+    with _buffer_lock:
+        count = min(len(_buffer), settings.MESSAGE_LOG_BATCH_SIZE)
+        return [_buffer.popleft() for _ in range(count)]
+
+def _columns(rows: list) -> list:
+    # "attempts" é controle do buffer, não coluna do MessageLog
+    return [{key: value for key, value in row.items() if key != "attempts"} for row in rows]
+
+def _insert_rows(rows: list):
+    with engine.begin() as conn:
+        conn.execute(insert(MessageLog), _columns(rows))
+
+async def _write(rows: list):
+    if ASYNC_DB_ENABLED:
+        async with async_engine.begin() as conn:
+            await conn.execute(insert(MessageLog), _columns(rows))
+    else:
+        await run_blocking("db", _insert_rows, rows)
+
+def _ping():
+    with engine.connect() as conn:
+        conn.execute(text("SELECT 1"))
+
+async def _db_available() -> bool:
+    try:
+        if ASYNC_DB_ENABLED:
+            async with async_engine.connect() as conn:
+                await conn.execute(text("SELECT 1"))
+        else:
+            await run_blocking("db", _ping)
+        return True
+    except Exception:
+        return False
+
+async def _write_one_by_one(rows: list) -> int:
+    """
+    Regrava linha a linha um lote que falhou. Linhas recusadas voltam para o
+    buffer com uma tentativa a mais (ou são descartadas após
+    MESSAGE_LOG_MAX_ATTEMPTS). Retorna o número de linhas gravadas.
+    """
+    written = 0
+    failed = []
+
+    for row in rows:
+        message_log_stats["row_retries"] += 1
+        try:
+            await _write([row])
+        except Exception as e:
+            failed.append((row, e))
+            continue
+        written += 1
+
+    if failed and not written and not await _db_available():
+        # Banco fora do ar: não é culpa das linhas, nenhuma tentativa conta
+        _append([row for row, _ in failed], front=True)
+        return written
+
+    retry = []
+    for row, error in failed:
+        row["attempts"] += 1
+        if row["attempts"] >= settings.MESSAGE_LOG_MAX_ATTEMPTS:
+            message_log_stats["failed_dropped"] += 1
+            print(
+                f"🗑️ [MESSAGE LOG] Linha descartada após {row['attempts']} tentativas "
+                f"({row['phone']}, {row['direction']}): {error}"
+            )
+        else:
+            retry.append(row)
+
+    if retry:
+        _append(retry, front=True)
+    return written
+
+async def flush_message_logs() -> int:
+    """Grava tudo que está no buffer (em lotes). Retorna o número de linhas gravadas."""
+    written = 0
+
+    while True:
+        rows = _take_batch()
+        if not rows:
+            return written
+
+        try:
+            await _write(rows)
+        except Exception as e:
+            message_log_stats["flush_errors"] += 1
+            print(f"⚠️ [MESSAGE LOG] Erro ao gravar {len(rows)} linhas, regravando uma a uma: {e}")
+
+            # O que não entrar volta para a frente do buffer; tenta de novo no próximo ciclo
+            saved = await _write_one_by_one(rows)
+            written += saved
+            message_log_stats["written"] += saved
+            return written
+
+        written += len(rows)
+        message_log_stats["written"] += len(rows)
+        message_log_stats["flushes"] += 1
+
+def get_message_log_stats() -> dict:
+    return {
+        "buffered": len(_buffer),
+        **message_log_stats,
+    }
+
+# --------------------------------------------------
+# WRITER
+# --------------------------------------------------
+
+async def _writer_loop():
+    while not _stopping.is_set():
+        try:
+            await asyncio.wait_for(_wakeup.wait(), timeout=settings.MESSAGE_LOG_FLUSH_INTERVAL)
+        except asyncio.TimeoutError:
+            pass
+        _wakeup.clear()
+
+        await flush_message_logs()
+
+async def start_message_log_writer():
+    global _wakeup, _stopping, _task
+
+    _wakeup = asyncio.Event()
+    _stopping = asyncio.Event()
+    _task = asyncio.create_task(_writer_loop())
+
+    print("🧾 [MESSAGE LOG] Writer iniciado")
+
+async def stop_message_log_writer(timeout: float = 10):
+    global _task
+
+    if _stopping is None:
+        return
+
+    _stopping.set()
+    _wakeup.set()
+
+    done, pending = await asyncio.wait([_task], timeout=timeout)
+    for task in pending:
+        task.cancel()
+    _task = None
+
+    # Grava o que ainda estiver no buffer antes de fechar o banco
+    written = await flush_message_logs()
+    print(f"🧾 [MESSAGE LOG] Writer finalizado ({written} linhas gravadas no shutdown)")
@@ -0,0 +1,407 @@
+import asyncio
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import select, update, func, exists
+from sqlalchemy.orm import aliased
+
+from backend.core.config import settings
+from backend.core.concurrency import run_blocking
+from backend.core.utils import post_whatsapp_text_async, split_message
+from backend.db.session import SessionLocal
+from backend.db.models import OutboundMessage
+
+# --------------------------------------------------
+# OUTBOX DE RESPOSTAS (Z-API)
+# --------------------------------------------------
+# O pipeline só grava a resposta em outbound_messages; senders em background
+# fazem o envio com rate limit (por instância Z-API e por telefone),
+# retentativa com backoff exponencial e registro do status de entrega.
+# Mensagens pendentes do mesmo telefone são juntas em um único envio.
+
+# Mensagem em "sending" há mais que isso é considerada abandonada (crash)
+OUTBOX_LEASE_SECONDS = 120
+
+# Respostas HTTP que valem nova tentativa (timeout, rate limit, erro do
+# servidor). Os demais 4xx (telefone inválido, token errado...) são
+# permanentes: repetir só gastaria o rate limit da instância.
+RETRYABLE_STATUS = frozenset({408, 425, 429})
+
+def is_retryable_status(status_code: int) -> bool:
+    return status_code >= 500 or status_code in RETRYABLE_STATUS
+
+_wakeup = None
+_stopping = None
+_tasks = []
+
+outbox_stats = {
+    "sent": 0,
+    "coalesced": 0,
+    "retries": 0,
+    "failed": 0,
+    "failed_permanent": 0,
+    "rate_limited_waits": 0,
+    "sender_errors": 0,
+}
+
+# --------------------------------------------------
+# RATE LIMIT (TOKEN BUCKET)
+# --------------------------------------------------
+
+class TokenBucket:
+    """Token bucket clássico: `rate` tokens por segundo, até `capacity` acumulados."""
+
+    def __init__(self, rate: float, capacity: int):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self.updated_at = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    def wait_time(self) -> float:
+        """Segundos até haver um token disponível (0 = disponível agora)."""
+        self._refill()
+        if self.tokens >= 1:
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+    def consume(self):
+        self._refill()
+        self.tokens -= 1
+
+    def refund(self):
+        """Devolve um token consumido que acabou não sendo usado."""
+        self.tokens = min(self.capacity, self.tokens + 1)
+
+    def is_full(self) -> bool:
+        self._refill()
+        return self.tokens >= self.capacity
+
+instance_bucket = TokenBucket(settings.OUTBOX_RATE_PER_SECOND, settings.OUTBOX_BURST)
+phone_buckets = {}
+
+def _phone_bucket(phone: str) -> TokenBucket:
+    bucket = phone_buckets.get(phone)
+    if bucket is None:
+        # Remove buckets cheios (telefones inativos) para o mapa não crescer
+        for idle_phone in [p for p, b in phone_buckets.items() if b.is_full()]:
+            del phone_buckets[idle_phone]
+
+        bucket = TokenBucket(settings.OUTBOX_PHONE_RATE_PER_SECOND, settings.OUTBOX_PHONE_BURST)
+        phone_buckets[phone] = bucket
+    return bucket
+
+async def _acquire(bucket: TokenBucket):
+    while True:
+        delay = bucket.wait_time()
+        if delay <= 0:
+            bucket.consume()
+            return
+        outbox_stats["rate_limited_waits"] += 1
+        await asyncio.sleep(delay)
+
+# --------------------------------------------------
+# PERSISTÊNCIA
+# --------------------------------------------------
+
+def add_outbound_message(db, phone: str, message: str) -> list:
+    """
+    Adiciona a resposta ao outbox na sessão informada (sem commit),
+    para ser gravada na mesma transação do restante do pipeline.
+
+    Respostas maiores que OUTBOX_MAX_MESSAGE_CHARS viram várias mensagens
+    (ver split_message), enviadas em ordem.
+    """
+    outbound = [OutboundMessage(phone=phone, message=part) for part in split_message(message)]
+    db.add_all(outbound)
+    return outbound
+
+def enqueue_outbound_message(phone: str, message: str):
+    """Grava uma resposta no outbox em transação própria."""
+    db = SessionLocal()
+    try:
+        add_outbound_message(db, phone, message)
+        db.commit()
+    finally:
+        db.close()
+
+def claim_next_batch():
+    """
+    Reserva as mensagens pendentes do telefone mais antigo da fila
+    (pending → sending), juntando as consecutivas até OUTBOX_MAX_MESSAGE_CHARS.
+
+    Um telefone com envio em andamento não é elegível, preservando a ordem.
+    """
+    db = SessionLocal()
+    try:
+        now = datetime.now()
+        other = aliased(OutboundMessage)
+        blocked = exists().where(
+            other.phone == OutboundMessage.phone,
+            (other.status == "sending")
+            | ((other.status == "pending") & (other.id < OutboundMessage.id) & (other.next_attempt_at > now))
+        )
+        phone = db.execute(
+            select(OutboundMessage.phone)
+            .where(
+                OutboundMessage.status == "pending",
+                OutboundMessage.next_attempt_at <= now,
+                ~blocked
+            )
+            .order_by(OutboundMessage.id)
+            .limit(1)
+        ).scalar()
+
+        if phone is None:
+            return None
+
+        pending = db.execute(
+            select(OutboundMessage)
+            .where(OutboundMessage.phone == phone, OutboundMessage.status == "pending")
+            .order_by(OutboundMessage.id)
+        ).scalars().all()
+
+        batch = []
+        total_chars = 0
+        for outbound in pending:
+            if outbound.next_attempt_at > now:
+                break
+            extra = len(outbound.message) + (2 if batch else 0)
+            if batch and total_chars + extra > settings.OUTBOX_MAX_MESSAGE_CHARS:
+                break
+            batch.append(outbound)
+            total_chars += extra
+
+        if not batch:
+            return None
+
+        # 1) Reserva a primeira mensagem só se o telefone não tiver envio em andamento.
+        #    A partir daqui o "sending" bloqueia este telefone para os outros senders.
+        first, rest = batch[0], batch[1:]
+        attempts = max(outbound.attempts for outbound in batch) + 1
+        sending = aliased(OutboundMessage)
+        result = db.execute(
+            update(OutboundMessage)
+            .where(
+                OutboundMessage.id == first.id,
+                OutboundMessage.status == "pending",
+                ~exists().where(sending.phone == phone, sending.status == "sending")
+            )
+            .values(status="sending", attempts=OutboundMessage.attempts + 1, updated_at=now)
+        )
+        if result.rowcount != 1:
+            db.rollback()
+            return None
+
+        # 2) Demais mensagens do lote (já protegidas pela reserva acima)
+        if rest:
+            db.execute(
+                update(OutboundMessage)
+                .where(
+                    OutboundMessage.id.in_([outbound.id for outbound in rest]),
+                    OutboundMessage.status == "pending"
+                )
+                .values(status="sending", attempts=OutboundMessage.attempts + 1, updated_at=now)
+            )
+        db.commit()
+
+        ids = [outbound.id for outbound in batch]
+        return {
+            "ids": ids,
+            "phone": phone,
+            "message": "\n\n".join(outbound.message for outbound in batch),
+            "attempts": attempts,
+        }
+    finally:
+        db.close()
+
+def mark_sent(ids: list, zapi_message_id: str = None):
+    db = SessionLocal()
+    try:
+        now = datetime.now()
+        db.execute(
+            update(OutboundMessage)
+            .where(OutboundMessage.id.in_(ids))
+            .values(
+                status="sent",
+                zapi_message_id=zapi_message_id,
+                last_error=None,
+                sent_at=now,
+                updated_at=now
+            )
+        )
+        db.commit()
+    finally:
+        db.close()
+
+def mark_failed(ids: list, attempts: int, error: str, permanent: bool = False):
+    """
+    Backoff exponencial até OUTBOX_MAX_ATTEMPTS; depois marca como "failed".
+    permanent=True marca como "failed" na hora (erro que não se resolve repetindo).
+    """
+    now = datetime.now()
+
+    if permanent:
+        values = {"status": "failed"}
+        outbox_stats["failed"] += len(ids)
+        outbox_stats["failed_permanent"] += len(ids)
+        print(f"💀 [OUTBOX] Envio {ids} recusado (erro permanente, sem nova tentativa): {error}")
+    elif attempts >= settings.OUTBOX_MAX_ATTEMPTS:
+        values = {"status": "failed"}
+        outbox_stats["failed"] += len(ids)
+        print(f"💀 [OUTBOX] Envio {ids} falhou definitivamente após {attempts} tentativas: {error}")
+    else:
+        delay = settings.OUTBOX_RETRY_BASE_SECONDS * (2 ** (attempts - 1))
+        values = {"status": "pending", "next_attempt_at": now + timedelta(seconds=delay)}
+        outbox_stats["retries"] += 1
+        print(f"🔁 [OUTBOX] Envio {ids} será repetido em {delay:.1f}s (tentativa {attempts}): {error}")
+
+    db = SessionLocal()
+    try:
+        db.execute(
+            update(OutboundMessage)
+            .where(OutboundMessage.id.in_(ids))
+            .values(last_error=error, updated_at=now, **values)
+        )
+        db.commit()
+    finally:
+        db.close()
+
+def requeue_abandoned_messages() -> int:
+    """Devolve para a fila mensagens presas em "sending" (sender caiu no meio)."""
+    db = SessionLocal()
+    try:
+        limit = datetime.now() - timedelta(seconds=OUTBOX_LEASE_SECONDS)
+        result = db.execute(
+            update(OutboundMessage)
+            .where(OutboundMessage.status == "sending", OutboundMessage.updated_at < limit)
+            .values(status="pending", next_attempt_at=datetime.now())
+        )
+        db.commit()
+        return result.rowcount
+    finally:
+        db.close()
+
+def get_outbox_stats() -> dict:
+    db = SessionLocal()
+    try:
+        rows = db.execute(
+            select(OutboundMessage.status, func.count()).group_by(OutboundMessage.status)
+        ).all()
+    finally:
+        db.close()
+
+    return {
+        "by_status": {status: count for status, count in rows},
+        **outbox_stats,
+    }
+
+# --------------------------------------------------
+# SENDERS
+# --------------------------------------------------
+
+def notify_outbox():
+    """Acorda os senders logo após gravar uma resposta."""
+    if _wakeup is not None:
+        _wakeup.set()
+
+async def _deliver(batch: dict):
+    await _acquire(_phone_bucket(batch["phone"]))
+
+    try:
+        response = await post_whatsapp_text_async(batch["phone"], batch["message"])
+    except Exception as e:
+        await run_blocking("db", mark_failed, batch["ids"], batch["attempts"], f"rede: {e}")
+        return
+
+    if response.status_code >= 400:
+        await run_blocking(
+            "db", mark_failed, batch["ids"], batch["attempts"],
+            f"HTTP {response.status_code}: {response.text[:200]}",
+            permanent=not is_retryable_status(response.status_code)
+        )
+        return
+
+    try:
+        body = response.json()
+    except ValueError:
+        body = {}
+    if not isinstance(body, dict):
+        body = {}
+
+    zapi_message_id = body.get("messageId") or body.get("zaapId") or body.get("id")
+    await run_blocking("db", mark_sent, batch["ids"], zapi_message_id)
+
+    outbox_stats["sent"] += 1
+    outbox_stats["coalesced"] += len(batch["ids"]) - 1
+    print(f"📤 [OUTBOX] {batch['phone']} | {len(batch['ids'])} mensagem(ns) | id={zapi_message_id}")
+
+async def _sender_loop(sender_id: int):
+    last_maintenance = 0.0
+
+    while not _stopping.is_set():
+        if time.monotonic() - last_maintenance > OUTBOX_LEASE_SECONDS / 2:
+            last_maintenance = time.monotonic()
+            try:
+                await run_blocking("db", requeue_abandoned_messages)
+            except Exception as e:
+                print(f"⚠️ [OUTBOX] Erro na manutenção: {e}")
+
+        await _acquire(instance_bucket)
+
+        try:
+            batch = await run_blocking("db", claim_next_batch)
+        except Exception as e:
+            print(f"❌ [OUTBOX] Sender {sender_id} falhou ao buscar mensagens: {e}")
+            batch = None
+
+        if batch is None:
+            instance_bucket.refund()
+            try:
+                await asyncio.wait_for(_wakeup.wait(), timeout=settings.JOB_POLL_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+            _wakeup.clear()
+            continue
+
+        try:
+            await _deliver(batch)
+        except Exception as e:
+            # Ex.: banco travado ao marcar o envio. O lote fica em "sending"
+            # e volta para a fila quando o lease vence
+            # (requeue_abandoned_messages); o sender segue vivo.
+            outbox_stats["sender_errors"] += 1
+            print(f"❌ [OUTBOX] Sender {sender_id} falhou ao entregar para {batch['phone']}: {e}")
+            await asyncio.sleep(settings.JOB_POLL_INTERVAL)
+            continue
+
+        notify_outbox()
+
+async def start_outbox_senders():
+    global _wakeup, _stopping
+
+    _wakeup = asyncio.Event()
+    _stopping = asyncio.Event()
+
+    for sender_id in range(settings.OUTBOX_SENDERS):
+        _tasks.append(asyncio.create_task(_sender_loop(sender_id)))
+
+    print(f"📮 [OUTBOX] {settings.OUTBOX_SENDERS} senders iniciados")
+
+async def stop_outbox_senders(timeout: float = 10):
+    if _stopping is None:
+        return
+
+    _stopping.set()
+    _wakeup.set()
+
+    done, pending = await asyncio.wait(_tasks, timeout=timeout)
+    for task in pending:
+        task.cancel()
+
+    _tasks.clear()
+    print("📮 [OUTBOX] Senders finalizados")
@@ -0,0 +1,138 @@
+import time
+import threading
+from collections import OrderedDict
+
+from backend.core.config import settings
+
+# --------------------------------------------------
+# CACHE DE SESSÕES DE CONVERSA (POR PROCESSO)
+# --------------------------------------------------
+# Conversas ativas mandam mensagens a cada poucos segundos; guardar a
+# sessão em memória evita o SELECT em conversation_sessions e o json.loads
+# de conversation_data a cada mensagem.
+#
+# - Só entram no cache sessões iguais às do banco (lidas ou recém-gravadas)
+# - Alterações ficam marcadas em `dirty` e só esses campos são gravados,
+#   no mesmo commit da mensagem (ver backend/routes/webhook.py)
+# - `version` é o last_interaction gravado: o UPDATE só vale se o banco
+#   ainda estiver nessa versão, então outro processo que tenha atendido o
+#   mesmo telefone invalida a cópia local (o job é refeito lendo do banco)
+# - Entradas sem uso há SESSION_CACHE_TTL_SECONDS saem do cache; o padrão
+#   (30 min) é a mesma janela de is_session_expired no engine
+
+class CachedSession:
+    """Cópia em memória de uma ConversationSession, com os campos alterados."""
+
+    FIELDS = ("current_step", "data", "status", "is_muted")
+
+    def __init__(self, phone: str, current_step: str, data: dict, status: str,
+                 is_muted: bool, version=None, is_new: bool = False):
+        self.phone = phone
+        self.current_step = current_step
+        self.data = data
+        self.status = status
+        self.is_muted = is_muted
+        self.version = version
+        self.is_new = is_new
+        self.dirty = set()
+
+    def set(self, field: str, value):
+        if getattr(self, field) != value:
+            setattr(self, field, value)
+            self.dirty.add(field)
+
+    def mark_saved(self, version):
+        self.version = version
+        self.is_new = False
+        self.dirty.clear()
+
+class SessionCache:
+    """
+    Sessões por telefone, com TTL de inatividade e capacidade máxima.
+
+    - get/put renovam a entrada (vai para o fim da ordem)
+    - Entradas inativas há mais que ttl_seconds são descartadas
+    - Passando da capacidade, sai a menos usada recentemente
+    """
+
+    def __init__(self, capacity: int, ttl_seconds: float):
+        self.capacity = capacity
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict()  # phone -> (sessão, instante do último uso)
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+        self.evictions = 0
+        self.conflicts = 0
+
+    def _expire(self, now: float):
+        while self._entries:
+            _, (_, used_at) = next(iter(self._entries.items()))
+            if now - used_at <= self.ttl_seconds:
+                break
+            self._entries.popitem(last=False)
+            self.expired += 1
+
+    def get(self, phone: str):
+        now = time.monotonic()
+
+        with self._lock:
+            self._expire(now)
+
+            entry = self._entries.get(phone)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            self.hits += 1
+            self._entries[phone] = (entry[0], now)
+            self._entries.move_to_end(phone)
+            return entry[0]
+
+    def put(self, session: CachedSession):
+        if session.is_new or session.dirty:
+            return
+
+        now = time.monotonic()
+
+        with self._lock:
+            self._expire(now)
+            self._entries[session.phone] = (session, now)
+            self._entries.move_to_end(session.phone)
+
+            while len(self._entries) > self.capacity:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def discard(self, phone: str):
+        with self._lock:
+            self._entries.pop(phone, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def record_conflict(self, phone: str):
+        self.conflicts += 1
+        self.discard(phone)
+
+    def stats(self) -> dict:
+        with self._lock:
+            size = len(self._entries)
+
+        return {
+            "size": size,
+            "capacity": self.capacity,
+            "hits": self.hits,
+            "misses": self.misses,
+            "expired": self.expired,
+            "evictions": self.evictions,
+            "conflicts": self.conflicts,
+        }
+
+session_cache = SessionCache(
+    capacity=settings.SESSION_CACHE_CAPACITY,
+    ttl_seconds=settings.SESSION_CACHE_TTL_SECONDS,
+)
@@ -0,0 +1,66 @@
+from datetime import datetime, timedelta
+
+from sqlalchemy import delete, tuple_
+from sqlalchemy.exc import IntegrityError
+
+from backend.db.session import SessionLocal
+from backend.db.models import SlotLease
+
+# --------------------------------------------------
+# RESERVA ATÔMICA DE SLOTS (LEASE)
+# --------------------------------------------------
+# Antes de escrever na aba Agenda, o agendamento reserva todos os slots do
+# serviço em slot_leases. A constraint UNIQUE (data, horário) garante que só
+# um atendimento por vez (em qualquer worker/processo que use o mesmo banco)
+# passe da checagem para a escrita. A reserva expira sozinha se o processo
+# cair antes de liberá-la.
+
+SLOT_LEASE_SECONDS = 60
+
+def acquire_slot_lease(date_str: str, times: list, owner: str) -> bool:
+    """
+    Reserva os slots (date_str, hora) para `owner`, todos ou nenhum.
+    Retorna False se algum já estiver reservado por outro atendimento.
+    """
+    keys = [(date_str, hora) for hora in times]
+    now = datetime.now()
+
+    db = SessionLocal()
+    try:
+        # Reservas vencidas destes slots não bloqueiam mais ninguém
+        db.execute(
+            delete(SlotLease).where(
+                tuple_(SlotLease.slot_date, SlotLease.slot_time).in_(keys),
+                SlotLease.expires_at < now
+            )
+        )
+        db.add_all([
+            SlotLease(
+                slot_date=date_str,
+                slot_time=hora,
+                owner=owner,
+                expires_at=now + timedelta(seconds=SLOT_LEASE_SECONDS)
+            )
+            for hora in times
+        ])
+        db.commit()
+        return True
+    except IntegrityError:
+        db.rollback()
+        return False
+    finally:
+        db.close()
+
+def release_slot_lease(date_str: str, times: list, owner: str):
+    db = SessionLocal()
+    try:
+        db.execute(
+            delete(SlotLease).where(
+                SlotLease.slot_date == date_str,
+                SlotLease.slot_time.in_(times),
+                SlotLease.owner == owner
+            )
+        )
+        db.commit()
+    finally:
+        db.close()
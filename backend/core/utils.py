@@ -1,51 +1,215 @@
+import threading
+import importlib.util
+from functools import lru_cache
+
 import requests
+from requests.adapters import HTTPAdapter
 from backend.core.config import settings
+from backend.core.concurrency import run_blocking
+
+try:
+    import httpx
+except ImportError:  # cliente assíncrono é opcional
+    httpx = None
 
 # --------------------------------------------------
-# WHATSAPP (Z-API)
+# WHATSAPP (Z-API) — CLIENTES HTTP REUTILIZÁVEIS
 # --------------------------------------------------
+# Uma única sessão (sync) e um único cliente (async) por processo, com
+# keep-alive: o handshake TCP+TLS com api.z-api.io acontece uma vez e a
+# conexão é reaproveitada nos envios seguintes.
 
-def send_whatsapp_message(phone: str, message: str):
-    """
-    Envia mensagem via Z-API usando credenciais centralizadas.
-    Função utilitária pura (sem lógica de negócio).
-    """
+ZAPI_BASE_URL = "https://api.z-api.io"
 
-    if not phone or not message:
-        print("⚠️ send_whatsapp_message chamado com parâmetros inválidos")
-        return None
+# HTTP/2 só é usado se o pacote h2 estiver instalado (httpx[http2])
+HTTP2_AVAILABLE = httpx is not None and importlib.util.find_spec("h2") is not None
+
+_session = None
+_async_client = None
+_client_lock = threading.Lock()
 
-    url = (
-        f"https://api.z-api.io/instances/"
+zapi_http_stats = {
+    "requests": 0,
+    "async_requests": 0,
+    "async_new_connections": 0,
+    "errors": 0,
+}
+
+def _zapi_url() -> str:
+    return (
+        f"{ZAPI_BASE_URL}/instances/"
         f"{settings.Z_API_INSTANCE_ID}/token/"
         f"{settings.Z_API_TOKEN}/send-text"
     )
 
-    headers = {
+def _zapi_headers() -> dict:
+    return {
         "Content-Type": "application/json",
         "Client-Token": settings.ZAPI_CLIENT_TOKEN
     }
 
-    payload = {
-        "phone": phone,
-        "message": message
-    }
+def _zapi_timeout():
+    return (settings.ZAPI_CONNECT_TIMEOUT, settings.ZAPI_READ_TIMEOUT)
 
-    try:
-        response = requests.post(url, json=payload, headers=headers, timeout=10)
+def get_http_session() -> requests.Session:
+    """Sessão requests compartilhada, com pool de conexões keep-alive."""
+    global _session
 
-        print(
-            f"📤 Z-API | phone={phone} "
-            f"status={response.status_code} "
-            f"response={response.text}"
-        )
+    with _client_lock:
+        if _session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(
+                pool_connections=1,
+                pool_maxsize=settings.ZAPI_POOL_SIZE,
+                pool_block=False
+            )
+            session.mount("https://", adapter)
+            session.headers.update(_zapi_headers())
+            _session = session
+
+        return _session
 
-        return response.json()
+def get_async_http_client():
+    """Cliente httpx.AsyncClient compartilhado (HTTP/2 quando disponível)."""
+    global _async_client
 
-    except requests.exceptions.RequestException as e:
-        print(f"❌ Erro de rede ao enviar mensagem WhatsApp: {e}")
+    if httpx is None:
         return None
 
-    except Exception as e:
-        print(f"❌ Erro inesperado no envio WhatsApp: {e}")
-        return None
\ No newline at end of file
+    if _async_client is None:
+        connect_timeout, read_timeout = _zapi_timeout()
+        _async_client = httpx.AsyncClient(
+            http2=HTTP2_AVAILABLE,
+            headers=_zapi_headers(),
+            timeout=httpx.Timeout(read_timeout, connect=connect_timeout),
+            limits=httpx.Limits(
+                max_connections=settings.ZAPI_POOL_SIZE,
+                max_keepalive_connections=settings.ZAPI_POOL_SIZE
+            )
+        )
+
+    return _async_client
+
+async def _trace_connections(event_name: str, info: dict):
+    # Disparado pelo httpcore apenas quando uma conexão NOVA é aberta
+    if event_name == "connection.connect_tcp.started":
+        zapi_http_stats["async_new_connections"] += 1
+
+async def close_http_clients():
+    """Fecha sessão e cliente compartilhados (shutdown da app)."""
+    global _session, _async_client
+
+    if _async_client is not None:
+        await _async_client.aclose()
+        _async_client = None
+
+    with _client_lock:
+        if _session is not None:
+            _session.close()
+            _session = None
+
+def get_http_stats() -> dict:
+    """Métricas de reaproveitamento de conexão com a Z-API."""
+    stats = dict(zapi_http_stats)
+
+    # Conexões abertas pelo pool do urllib3 (sessão sync)
+    new_connections = 0
+    if _session is not None:
+        pools = _session.get_adapter(ZAPI_BASE_URL).poolmanager.pools
+        for key in pools.keys():
+            new_connections += pools[key].num_connections
+    stats["new_connections"] = new_connections
+    stats["reused_connections"] = max(stats["requests"] - new_connections, 0)
+    stats["async_reused_connections"] = max(
+        stats["async_requests"] - stats["async_new_connections"], 0
+    )
+    stats["http2"] = HTTP2_AVAILABLE
+
+    return stats
+
+# --------------------------------------------------
+# WHATSAPP — DIVISÃO DE MENSAGENS LONGAS
+# --------------------------------------------------
+
+@lru_cache(maxsize=128)
+def split_message(text: str, limit: int = None) -> tuple:
+    """
+    Divide um texto em partes de até `limit` caracteres (padrão:
+    OUTBOX_MAX_MESSAGE_CHARS), preferindo quebrar entre parágrafos ("\n\n"),
+    depois entre linhas e só em último caso no meio da linha.
+
+    Cacheada: textos fixos (ex.: menu de serviços) são divididos uma vez.
+    """
+    limit = limit or settings.OUTBOX_MAX_MESSAGE_CHARS
+
+    if len(text) <= limit:
+        return (text,)
+
+    parts = []
+    current = ""
+
+    def flush():
+        nonlocal current
+        if current:
+            parts.append(current)
+            current = ""
+
+    for paragraph in text.split("\n\n"):
+        if current and len(current) + 2 + len(paragraph) <= limit:
+            current += "\n\n" + paragraph
+            continue
+
+        flush()
+        if len(paragraph) <= limit:
+            current = paragraph
+            continue
+
+        # Parágrafo maior que o limite: quebra por linha
+        for line in paragraph.split("\n"):
+            if current and len(current) + 1 + len(line) <= limit:
+                current += "\n" + line
+                continue
+
+            flush()
+            while len(line) > limit:
+                parts.append(line[:limit])
+                line = line[limit:]
+            current = line
+
+    flush()
+    return tuple(parts)
+
+# --------------------------------------------------
+# WHATSAPP (Z-API) — ENVIO
+# --------------------------------------------------
+
+def _post_text(phone: str, message: str):
+    zapi_http_stats["requests"] += 1
+    return get_http_session().post(
+        _zapi_url(),
+        json={"phone": phone, "message": message},
+        timeout=_zapi_timeout()
+    )
+
+async def post_whatsapp_text_async(phone: str, message: str):
+    """
+    POST cru para a Z-API, sem tratamento de erro.
+    Retorna a resposta HTTP (httpx ou requests) e levanta exceção em falha de rede
+    (contada em zapi_http_stats["errors"]).
+    Usado pelo outbox, que decide sobre retentativas.
+    """
+    client = get_async_http_client()
+
+    try:
+        if client is None:
+            return await run_blocking("zapi", _post_text, phone, message)
+
+        zapi_http_stats["async_requests"] += 1
+        return await client.post(
+            _zapi_url(),
+            json={"phone": phone, "message": message},
+            extensions={"trace": _trace_connections}
+        )
+    except Exception:
+        zapi_http_stats["errors"] += 1
+        raise
@@ -1,8 +1,32 @@
+from sqlalchemy import inspect, text
+
 from backend.db.session import Base, engine
 import backend.db.models
 
+def _add_missing_columns():
+    """
+    create_all não altera tabelas existentes: colunas novas (sempre
+    nullable) são adicionadas aqui com ALTER TABLE ... ADD COLUMN.
+    """
+    inspector = inspect(engine)
+
+    with engine.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            if not inspector.has_table(table.name):
+                continue
+
+            existing = {column["name"] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing or not column.nullable:
+                    continue
+
+                column_type = column.type.compile(dialect=engine.dialect)
+                conn.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}"))
+                print(f"🧩 Coluna adicionada: {table.name}.{column.name}")
+
 def init_db():
     """Cria as tabelas automaticamente se ainda não existirem."""
     print("📦 Criando tabelas do banco...")
     Base.metadata.create_all(bind=engine)
-    print("✅ Tabelas criadas com sucesso!")
\ No newline at end of file
+    _add_missing_columns()
+    print("✅ Tabelas criadas com sucesso!")
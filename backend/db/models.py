@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, Text, Boolean
+from sqlalchemy import Column, Integer, String, DateTime, Text, Boolean, UniqueConstraint
 from datetime import datetime
 
 from backend.db.session import Base
@@ -66,6 +66,44 @@ class MessageLog(Base):
             f"timestamp={self.timestamp})>"
         )
 
+# --------------------------------------------------
+# OUTBOX DE MENSAGENS (ENVIO ASSÍNCRONO VIA Z-API)
+# --------------------------------------------------
+
+class OutboundMessage(Base):
+    __tablename__ = "outbound_messages"
+
+    id = Column(Integer, primary_key=True, index=True)
+
+    # Número do cliente (WhatsApp)
+    phone = Column(String(20), nullable=False, index=True)
+
+    # Texto a ser enviado
+    message = Column(Text, nullable=False)
+
+    # Status: "pending" | "sending" | "sent" | "failed"
+    status = Column(String(20), default="pending", nullable=False, index=True)
+
+    # Controle de retentativas
+    attempts = Column(Integer, default=0, nullable=False)
+    next_attempt_at = Column(DateTime, default=datetime.now, index=True)
+    last_error = Column(Text, nullable=True)
+
+    # ID retornado pela Z-API após o envio (confirmação de entrega)
+    zapi_message_id = Column(String(100), nullable=True)
+
+    # Timestamps
+    created_at = Column(DateTime, default=datetime.now)
+    updated_at = Column(DateTime, default=datetime.now, onupdate=datetime.now)
+    sent_at = Column(DateTime, nullable=True)
+
+    def __repr__(self):
+        return (
+            f"<OutboundMessage(phone={self.phone}, "
+            f"status={self.status}, "
+            f"attempts={self.attempts})>"
+        )
+
 # --------------------------------------------------
 # SESSÕES DE CONVERSA (CONTEXTO)
 # --------------------------------------------------
@@ -105,4 +143,70 @@ class ConversationSession(Base):
             f"step={self.current_step}, "
             f"status={self.status}, "
             f"muted={self.is_muted})>"
-        )
\ No newline at end of file
+        )
+
+# --------------------------------------------------
+# FILA DE PROCESSAMENTO DO WEBHOOK (JOBS)
+# --------------------------------------------------
+
+class WebhookJob(Base):
+    __tablename__ = "webhook_jobs"
+
+    id = Column(Integer, primary_key=True, index=True)
+
+    # ID da mensagem na Z-API (registro de idempotência contra reentregas)
+    message_id = Column(String(100), nullable=False, unique=True, index=True)
+
+    # Número do cliente (WhatsApp)
+    phone = Column(String(20), nullable=False, index=True)
+
+    # Payload original do webhook (JSON string)
+    payload = Column(Text, nullable=False)
+
+    # Status: "pending" | "processing" | "done" | "failed"
+    status = Column(String(20), default="pending", nullable=False, index=True)
+
+    # Controle de retentativas
+    attempts = Column(Integer, default=0, nullable=False)
+    next_attempt_at = Column(DateTime, default=datetime.now, index=True)
+    last_error = Column(Text, nullable=True)
+
+    # Processo dono do job em "processing" ("host:pid:token", ver core/jobs.py)
+    claimed_by = Column(String(100), nullable=True)
+
+    # Timestamps (updated_at também é o heartbeat do job em "processing")
+    created_at = Column(DateTime, default=datetime.now)
+    updated_at = Column(DateTime, default=datetime.now, onupdate=datetime.now)
+
+    def __repr__(self):
+        return (
+            f"<WebhookJob(message_id={self.message_id}, "
+            f"phone={self.phone}, "
+            f"status={self.status}, "
+            f"attempts={self.attempts})>"
+        )
+
+# --------------------------------------------------
+# RESERVA TEMPORÁRIA DE HORÁRIOS (AGENDAMENTO)
+# --------------------------------------------------
+
+class SlotLease(Base):
+    __tablename__ = "slot_leases"
+    __table_args__ = (
+        # Um único dono por slot: o INSERT concorrente falha na constraint
+        UniqueConstraint("slot_date", "slot_time", name="uq_slot_lease"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+
+    # Slot da aba Agenda (DD/MM/YYYY e HH:MM)
+    slot_date = Column(String(10), nullable=False)
+    slot_time = Column(String(5), nullable=False)
+
+    # Telefone do cliente que está reservando
+    owner = Column(String(20), nullable=False)
+
+    # Após expirar, a reserva pode ser tomada (processo que caiu no meio)
+    expires_at = Column(DateTime, nullable=False, index=True)
+
+    created_at = Column(DateTime, default=datetime.now)
@@ -1,18 +1,192 @@
-from sqlalchemy import create_engine
+import importlib.util
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker, declarative_base
+from sqlalchemy.pool import QueuePool, StaticPool
 from backend.core.config import settings
+from backend.core.concurrency import run_blocking
 
 # URL do banco (pega do config)
+# O Render entrega "postgres://...", que o SQLAlchemy 2 não aceita mais
 DATABASE_URL = settings.DATABASE_URL
+if DATABASE_URL.startswith("postgres://"):
+    DATABASE_URL = "postgresql://" + DATABASE_URL[len("postgres://"):]
+
+# --------------------------------------------------
+# PERFIS DO ENGINE (SQLITE / POSTGRES)
+# --------------------------------------------------
+# SQLite em arquivo: WAL deixa leitores e o escritor trabalharem ao mesmo
+# tempo, synchronous=NORMAL faz um fsync por checkpoint em vez de um por
+# commit (seguro com WAL), e busy_timeout faz o escritor esperar a trava
+# em vez de falhar com "database is locked". Cada thread do pool
+# bloqueante usa a própria conexão (QueuePool).
+#
+# SQLite em memória: uma única conexão compartilhada (StaticPool), senão
+# cada conexão veria um banco vazio diferente.
+#
+# Postgres: QueuePool com pre_ping/recycle (conexões derrubadas pelo
+# provedor) e statement_timeout por conexão.
+
+def sqlite_pragmas() -> dict:
+    """PRAGMAs aplicados em cada conexão SQLite nova."""
+    return {
+        "journal_mode": settings.SQLITE_JOURNAL_MODE,
+        "synchronous": settings.SQLITE_SYNCHRONOUS,
+        "busy_timeout": settings.SQLITE_BUSY_TIMEOUT_MS,
+        # Valor negativo = tamanho em KiB (não em páginas)
+        "cache_size": -settings.SQLITE_CACHE_SIZE_KB,
+        "mmap_size": settings.SQLITE_MMAP_SIZE,
+        "temp_store": settings.SQLITE_TEMP_STORE,
+    }
+
+def _apply_sqlite_pragmas(engine, pragmas: dict):
+    @event.listens_for(engine, "connect")
+    def _on_connect(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for name, value in pragmas.items():
+                cursor.execute(f"PRAGMA {name}={value}")
+        finally:
+            cursor.close()
+
+def create_db_engine(url: str = DATABASE_URL, tuned: bool = True):
+    """
+    Cria o engine com o perfil adequado à URL.
+    tuned=False reproduz o engine antigo (usado pelo benchmark de escrita).
+    """
+    parsed = make_url(url)
+    backend = parsed.get_backend_name()
+
+    if backend == "sqlite":
+        database = parsed.database
+        in_memory = not database or database == ":memory:" or "mode=memory" in url
+
+        if not tuned:
+            return create_engine(url, connect_args={"check_same_thread": False})
+
+        if in_memory:
+            engine = create_engine(
+                url,
+                connect_args={"check_same_thread": False},
+                poolclass=StaticPool,
+            )
+        else:
+            engine = create_engine(
+                url,
+                connect_args={"check_same_thread": False},
+                poolclass=QueuePool,
+                pool_size=settings.DB_POOL_SIZE,
+                max_overflow=settings.DB_MAX_OVERFLOW,
+                pool_timeout=settings.DB_POOL_TIMEOUT,
+            )
+
+        pragmas = sqlite_pragmas()
+        if in_memory:
+            # WAL/mmap não se aplicam a banco em memória
+            pragmas.pop("journal_mode")
+            pragmas.pop("mmap_size")
+        _apply_sqlite_pragmas(engine, pragmas)
+        return engine
+
+    if backend == "postgresql" and tuned:
+        connect_args = {"application_name": "olhar_sob_medida"}
+        if settings.PG_STATEMENT_TIMEOUT_MS:
+            connect_args["options"] = f"-c statement_timeout={settings.PG_STATEMENT_TIMEOUT_MS}"
+
+        return create_engine(
+            url,
+            connect_args=connect_args,
+            pool_size=settings.DB_POOL_SIZE,
+            max_overflow=settings.DB_MAX_OVERFLOW,
+            pool_timeout=settings.DB_POOL_TIMEOUT,
+            pool_recycle=settings.DB_POOL_RECYCLE,
+            pool_pre_ping=True,
+        )
+
+    return create_engine(url)
 
 # Criar engine do SQLAlchemy
-engine = create_engine(
-    DATABASE_URL,
-    connect_args={"check_same_thread": False}  # Necessário para SQLite
+engine = create_db_engine()
+
+# --------------------------------------------------
+# ENGINE ASSÍNCRONO (OPCIONAL)
+# --------------------------------------------------
+# Mesmo banco e mesmo perfil, via driver asyncio (aiosqlite/asyncpg): a
+# I/O do banco vira await no event loop, em vez de ocupar uma thread do
+# pool bloqueante, e pode correr junto com Sheets/Z-API no mesmo worker.
+# Sem o driver instalado (ou com DB_ASYNC=false), tudo segue no engine
+# síncrono.
+
+ASYNC_DRIVERS = {"sqlite": "aiosqlite", "postgresql": "asyncpg"}
+
+def async_database_url(url: str = DATABASE_URL):
+    """URL com o driver asyncio correspondente, ou None se não houver driver instalado."""
+    parsed = make_url(url)
+    backend = parsed.get_backend_name()
+    driver = ASYNC_DRIVERS.get(backend)
+
+    if driver is None or importlib.util.find_spec(driver) is None:
+        return None
+    # O adaptador async do SQLAlchemy depende do greenlet
+    if importlib.util.find_spec("greenlet") is None:
+        return None
+
+    return parsed.set(drivername=f"{backend}+{driver}").render_as_string(hide_password=False)
+
+def create_async_db_engine(url: str):
+    parsed = make_url(url)
+    backend = parsed.get_backend_name()
+
+    if backend == "sqlite":
+        database = parsed.database
+        in_memory = not database or database == ":memory:" or "mode=memory" in url
+
+        if in_memory:
+            async_engine = create_async_engine(url, poolclass=StaticPool)
+        else:
+            async_engine = create_async_engine(
+                url,
+                pool_size=settings.DB_POOL_SIZE,
+                max_overflow=settings.DB_MAX_OVERFLOW,
+                pool_timeout=settings.DB_POOL_TIMEOUT,
+            )
+
+        pragmas = sqlite_pragmas()
+        if in_memory:
+            pragmas.pop("journal_mode")
+            pragmas.pop("mmap_size")
+        _apply_sqlite_pragmas(async_engine.sync_engine, pragmas)
+        return async_engine
+
+    server_settings = {"application_name": "olhar_sob_medida"}
+    if settings.PG_STATEMENT_TIMEOUT_MS:
+        server_settings["statement_timeout"] = str(settings.PG_STATEMENT_TIMEOUT_MS)
+
+    return create_async_engine(
+        url,
+        connect_args={"server_settings": server_settings},
+        pool_size=settings.DB_POOL_SIZE,
+        max_overflow=settings.DB_MAX_OVERFLOW,
+        pool_timeout=settings.DB_POOL_TIMEOUT,
+        pool_recycle=settings.DB_POOL_RECYCLE,
+        pool_pre_ping=True,
+    )
+
+ASYNC_DATABASE_URL = async_database_url() if settings.DB_ASYNC else None
+ASYNC_DB_ENABLED = ASYNC_DATABASE_URL is not None
+
+async_engine = create_async_db_engine(ASYNC_DATABASE_URL) if ASYNC_DB_ENABLED else None
+AsyncSessionLocal = (
+    async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+    if ASYNC_DB_ENABLED else None
 )
 
 # Sessão padrão
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+# expire_on_commit=False: objetos continuam legíveis após o commit sem
+# disparar um SELECT implícito (que bloquearia o event loop nas rotas async)
+SessionLocal = sessionmaker(autocommit=False, autoflush=False, expire_on_commit=False, bind=engine)
 
 # Base para os modelos
 Base = declarative_base()
@@ -23,4 +197,53 @@ def get_db():
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+def open_db_session():
+    """Sessão para o pipeline do webhook: AsyncSession se disponível, senão a síncrona."""
+    return AsyncSessionLocal() if ASYNC_DB_ENABLED else SessionLocal()
+
+async def get_async_db():
+    """
+    Dependência das rotas async. Entrega uma AsyncSession quando o engine
+    assíncrono está ativo e a Session síncrona caso contrário; use
+    commit_db/close_db para funcionar com as duas.
+    """
+    db = open_db_session()
+    try:
+        yield db
+    finally:
+        await close_db(db)
+
+async def commit_db(db):
+    if isinstance(db, AsyncSession):
+        await db.commit()
+    else:
+        await run_blocking("db", db.commit)
+
+async def rollback_db(db):
+    if isinstance(db, AsyncSession):
+        await db.rollback()
+    else:
+        await run_blocking("db", db.rollback)
+
+async def close_db(db):
+    if isinstance(db, AsyncSession):
+        await db.close()
+    else:
+        await run_blocking("db", db.close)
+
+async def dispose_async_engine():
+    if async_engine is not None:
+        await async_engine.dispose()
+
+def get_db_stats() -> dict:
+    stats = {
+        "dialect": engine.dialect.name,
+        "pool": type(engine.pool).__name__,
+        "pool_status": engine.pool.status(),
+        "async": ASYNC_DB_ENABLED,
+    }
+    if ASYNC_DB_ENABLED:
+        stats["async_pool_status"] = async_engine.pool.status()
+    return stats
@@ -0,0 +1,138 @@
+import math
+
+# --------------------------------------------------
+# DISPONIBILIDADE POR DIA (BITMAP DE SLOTS DE 30 MIN)
+# --------------------------------------------------
+# Cada dia da aba Agenda vira uma grade de slots de 30 minutos a partir do
+# primeiro horário do dia. Dois inteiros funcionam como bitmaps:
+#
+#   exists: bit i ligado → existe linha para o slot i
+#   free:   bit i ligado → a linha do slot i está livre (sem Cliente)
+#
+# "Quais horários comportam um serviço de N minutos?" vira um AND de
+# deslocamentos: fits = free & (free >> 1) & ... & (free >> (n-1)); o bit i de
+# `fits` indica que os slots i..i+n-1 estão todos livres. A mesma estrutura
+# responde a oferta de horários e a reserva (linhas a preencher).
+
+SLOT_MINUTES = 30
+
+def slots_needed(duration_minutes: int) -> int:
+    """Quantidade de slots de 30 min ocupados por um serviço (mínimo 1)."""
+    return max(1, math.ceil((duration_minutes or SLOT_MINUTES) / SLOT_MINUTES))
+
+def _to_minutes(hora: str):
+    try:
+        hours, minutes = hora.split(":")
+        return int(hours) * 60 + int(minutes)
+    except ValueError:
+        return None
+
+def _to_hora(minutes: int) -> str:
+    return f"{minutes // 60:02d}:{minutes % 60:02d}"
+
+class DayAvailability:
+    """Grade de slots de um dia: horário ↔ posição ↔ linha da planilha."""
+
+    def __init__(self, slots: dict, is_free):
+        """
+        Args:
+            slots: { "HH:MM": numero_da_linha }
+            is_free: função numero_da_linha → bool
+        """
+        valid = {}
+        for hora, row_idx in slots.items():
+            minutes = _to_minutes(hora)
+            if minutes is not None:
+                valid[minutes] = row_idx
+
+        self.base = min(valid) if valid else 0
+        self.rows = {}          # posição → número da linha
+        self.positions = {}     # número da linha → posição
+        self.exists = 0
+        self.free = 0
+
+        for minutes, row_idx in valid.items():
+            offset = minutes - self.base
+            if offset % SLOT_MINUTES:
+                # Fora da grade de 30 min: não entra no bitmap
+                continue
+
+            position = offset // SLOT_MINUTES
+            self.rows[position] = row_idx
+            self.positions[row_idx] = position
+            self.exists |= 1 << position
+            if is_free(row_idx):
+                self.free |= 1 << position
+
+    def position_of(self, hora: str):
+        minutes = _to_minutes(hora)
+        if minutes is None:
+            return None
+
+        offset = minutes - self.base
+        if offset < 0 or offset % SLOT_MINUTES:
+            return None
+
+        position = offset // SLOT_MINUTES
+        return position if position in self.rows else None
+
+    def hora_of(self, position: int) -> str:
+        return _to_hora(self.base + position * SLOT_MINUTES)
+
+    def fits_mask(self, duration_minutes: int) -> int:
+        """Bitmap dos slots em que um serviço de `duration_minutes` pode começar."""
+        mask = self.free
+        for shift in range(1, slots_needed(duration_minutes)):
+            mask &= self.free >> shift
+        return mask
+
+    def start_times(self, duration_minutes: int = SLOT_MINUTES) -> list:
+        """Horários (HH:MM, em ordem) em que o serviço cabe inteiro."""
+        mask = self.fits_mask(duration_minutes)
+
+        times = []
+        while mask:
+            low_bit = mask & -mask
+            times.append(self.hora_of(low_bit.bit_length() - 1))
+            mask ^= low_bit
+        return times
+
+    def slot_rows(self, hora: str, duration_minutes: int):
+        """
+        Linhas (em ordem) do serviço começando em `hora`, livres ou não,
+        ou None se algum slot necessário não existir.
+        """
+        position = self.position_of(hora)
+        if position is None:
+            return None
+
+        needed = slots_needed(duration_minutes)
+        span = ((1 << needed) - 1) << position
+        if self.exists & span != span:
+            return None
+
+        return [self.rows[position + i] for i in range(needed)]
+
+    def rows_for(self, hora: str, duration_minutes: int):
+        """
+        Linhas (em ordem) a preencher para o serviço começando em `hora`,
+        ou None se algum slot necessário não existir ou estiver ocupado.
+        """
+        position = self.position_of(hora)
+        if position is None:
+            return None
+
+        if not (self.fits_mask(duration_minutes) >> position) & 1:
+            return None
+
+        return [self.rows[position + i] for i in range(slots_needed(duration_minutes))]
+
+    def set_free(self, row_idx: int, free: bool):
+        position = self.positions.get(row_idx)
+        if position is None:
+            return
+
+        if free:
+            self.free |= 1 << position
+        else:
+            self.free &= ~(1 << position)
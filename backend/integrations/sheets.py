@@ -1,16 +1,16 @@
 import os
 import json
+import time
+import bisect
+import threading
 from datetime import datetime, timedelta
 import gspread
+import requests
+from google.auth.exceptions import RefreshError, TransportError
 from google.oauth2.service_account import Credentials
-from functools import lru_cache
 
-# --------------------------------------------------
-# PATHS
-# --------------------------------------------------
-
-BASE_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-PRICE_LIST_PATH = os.path.join(BASE_DIR, "data", "price_list.json")
+from backend.ai.catalog import get_catalog
+from backend.integrations.availability import DayAvailability, SLOT_MINUTES
 
 # --------------------------------------------------
 # GOOGLE SHEETS CONFIG
@@ -18,6 +18,10 @@ PRICE_LIST_PATH = os.path.join(BASE_DIR, "data", "price_list.json")
 
 SPREADSHEET_NAME = os.getenv("PLANILHA_NOME", "Agenda Olhar Sob Medida")
 
+# Chave da planilha (trecho da URL entre /d/ e /edit).
+# Quando definida, abre por chave e evita a busca por nome no Drive.
+SPREADSHEET_KEY = os.getenv("PLANILHA_ID", "")
+
 WORKSHEET_AGENDA_NAME = "Agenda"
 WORKSHEET_CONTROLE_NAME = "Controle_Robo"
 
@@ -35,6 +39,15 @@ COL_MUTE_ROBO = 2         # Coluna B: MUTE_ROBO (TRUE/FALSE dropdown)
 COL_NOME_CLIENTE = 3      # Coluna C: Nome_Cliente
 COL_STATUS_HUMANO = 4     # Coluna D: Status_Humano
 
+# Tempo de vida da ocupação (colunas C:F) de cada dia da aba Agenda (segundos)
+AGENDA_CACHE_TTL = int(os.getenv("AGENDA_CACHE_TTL", "60"))
+
+# Tempo de vida do índice data → linhas (colunas A:B) da aba Agenda (segundos)
+AGENDA_INDEX_TTL = int(os.getenv("AGENDA_INDEX_TTL", "600"))
+
+# Intervalo de atualização do mapa de MUTE da aba Controle_Robo (segundos)
+MUTE_CACHE_TTL = int(os.getenv("MUTE_CACHE_TTL", "15"))
+
 SCOPES = [
     "https://www.googleapis.com/auth/spreadsheets",
     "https://www.googleapis.com/auth/drive"
@@ -44,155 +57,511 @@ SCOPES = [
 # AUTH
 # --------------------------------------------------
 
+# Registro único por processo: cliente autorizado, planilha e abas abertas.
+# O token OAuth é renovado automaticamente pela sessão do google-auth.
+_client = None
+_spreadsheet = None
+_worksheets = {}
+_client_lock = threading.RLock()
+
+# Falhas que indicam conexão/credencial quebrada (vale reconectar)
+_RECONNECT_ERRORS = (
+    RefreshError,
+    TransportError,
+    requests.exceptions.ConnectionError,
+)
+
 def _get_client():
-    raw = os.getenv("GOOGLE_SHEETS_CREDENTIALS")
-    if not raw:
-        raise RuntimeError("GOOGLE_SHEETS_CREDENTIALS não configurada")
+    global _client
+
+    with _client_lock:
+        if _client is None:
+            raw = os.getenv("GOOGLE_SHEETS_CREDENTIALS")
+            if not raw:
+                raise RuntimeError("GOOGLE_SHEETS_CREDENTIALS não configurada")
+
+            info = json.loads(raw)
+            creds = Credentials.from_service_account_info(info, scopes=SCOPES)
+            _client = gspread.authorize(creds)
+            print("🔑 [SHEETS] Cliente gspread autorizado")
+
+        return _client
 
-    info = json.loads(raw)
-    creds = Credentials.from_service_account_info(info, scopes=SCOPES)
-    return gspread.authorize(creds)
+def _get_spreadsheet():
+    global _spreadsheet
+
+    with _client_lock:
+        if _spreadsheet is None:
+            client = _get_client()
+            if SPREADSHEET_KEY:
+                _spreadsheet = client.open_by_key(SPREADSHEET_KEY)
+            else:
+                _spreadsheet = client.open(SPREADSHEET_NAME)
+            print(f"📗 [SHEETS] Planilha aberta: {_spreadsheet.title}")
+
+        return _spreadsheet
 
 def _open_sheet(sheet_name: str):
-    client = _get_client()
-    return client.open(SPREADSHEET_NAME).worksheet(sheet_name)
+    with _client_lock:
+        if sheet_name not in _worksheets:
+            _worksheets[sheet_name] = _get_spreadsheet().worksheet(sheet_name)
+
+        return _worksheets[sheet_name]
+
+def reset_sheets_connection():
+    """Descarta cliente, planilha e abas; a próxima chamada reconecta."""
+    global _client, _spreadsheet
+
+    with _client_lock:
+        _client = None
+        _spreadsheet = None
+        _worksheets.clear()
+
+def _should_reconnect(error: Exception) -> bool:
+    if isinstance(error, _RECONNECT_ERRORS):
+        return True
+    # 401 = token inválido/revogado, 404 = aba/planilha recriada
+    return isinstance(error, gspread.exceptions.APIError) and error.code in (401, 404)
+
+def _sheet_call(sheet_name: str, operation):
+    """
+    Executa operation(worksheet) com o handle em cache.
+    Se a falha indicar conexão/credencial quebrada, reconecta e tenta uma vez mais.
+    """
+    try:
+        return operation(_open_sheet(sheet_name))
+    except Exception as e:
+        if not _should_reconnect(e):
+            raise
+
+        print(f"🔄 [SHEETS] Reconectando após falha em '{sheet_name}': {e}")
+        reset_sheets_connection()
+        return operation(_open_sheet(sheet_name))
 
 # --------------------------------------------------
-# SERVICES (DURAÇÃO)
+# SERVICES (CATÁLOGO)
 # --------------------------------------------------
+# As durações vêm do catálogo compartilhado (ai/catalog.get_catalog), que já
+# está em memória — sem reler o price_list.json a cada agendamento.
+
+def _to_number(value, default):
+    if isinstance(value, (int, float)):
+        return value
+    try:
+        return float(str(value).replace("R$", "").replace(",", ".").strip())
+    except ValueError:
+        return default
 
-def load_services_duration():
+def load_services_from_sheet(tab_name: str) -> list:
     """
-    Retorna dict: { "Nome do Serviço": duração_em_minutos }
+    Lê o catálogo de uma aba com cabeçalho
+    name | category | price | description | duration_minutes
+    (mesmos campos do price_list.json). Usado quando CATALOG_SHEET_TAB está definido.
     """
-    if not os.path.exists(PRICE_LIST_PATH):
-        return {}
+    records = _sheet_call(tab_name, lambda ws: ws.get_all_records())
 
-    with open(PRICE_LIST_PATH, "r", encoding="utf-8") as f:
-        data = json.load(f)
+    services = []
+    for record in records:
+        name = str(record.get("name", "")).strip()
+        if not name:
+            continue
 
-    return {
-        s["name"]: s.get("duration_minutes", 30)
-        for s in data.get("services", [])
-    }
+        services.append({
+            "name": name,
+            "category": str(record.get("category", "")).strip() or "Outros",
+            "price": _to_number(record.get("price"), record.get("price")),
+            "description": str(record.get("description", "")).strip(),
+            "duration_minutes": int(_to_number(record.get("duration_minutes"), 30)),
+        })
 
-def calcular_proximo_horario(hora_str: str, minutos: int) -> str:
-    base = datetime.strptime(hora_str, "%H:%M")
-    return (base + timedelta(minutes=minutos)).strftime("%H:%M")
+    return services
 
 # --------------------------------------------------
 # AGENDA — FONTE DA VERDADE
 # --------------------------------------------------
 
-@lru_cache(maxsize=32)
-def get_available_dates_cached(cache_key: str = None):
+class AgendaSnapshot:
     """
-    Versão com cache de get_available_dates.
-    cache_key é usado apenas para invalidar cache quando necessário.
+    Índice da aba Agenda + blocos de cada dia lidos sob demanda.
+
+    - slots: { "DD/MM/YYYY": { "HH:MM": numero_da_linha } } (lido só de A:B)
+    - ranges: { "DD/MM/YYYY": (primeira_linha, ultima_linha) }
+    - dates: [(date, "DD/MM/YYYY")] em ordem cronológica (busca por janela)
+    - day(data): DayAvailability do dia; lê o bloco C:F do dia se preciso
+    - load_days(datas): lê em um único batch_get os blocos que faltam
+
+    O índice (estrutura da planilha) vale por AGENDA_INDEX_TTL; cada bloco
+    de dia (ocupação) vale por AGENDA_CACHE_TTL. O volume lido depende das
+    datas consultadas, não do tamanho do histórico da aba.
+
+    O número da linha é 1-indexed (igual ao gspread).
     """
-    sheet = _open_sheet(WORKSHEET_AGENDA_NAME)
-    rows = sheet.get_all_values()[1:]  # ignora cabeçalho
 
-    dates = set()
+    def __init__(self, index_rows: list):
+        self.slots = {}
+        self.ranges = {}
+        self.row_dates = {}
+        self.cells = {}          # numero_da_linha → [Cliente, Serviço, Telefone, Status]
+        self.days = {}
+        self.day_loaded_at = {}
+        self.loaded_at = time.monotonic()
+        self.lock = threading.RLock()
+
+        for idx, row in enumerate(index_rows[1:], start=2):
+            if len(row) < 2:
+                continue
 
-    for row in rows:
-        if len(row) < 2:
-            continue
+            date_str = row[COL_DATA - 1].strip()
+            hora = row[COL_HORA - 1].strip()
+            if not date_str or not hora:
+                continue
 
-        date_str = row[0].strip()
-        if not date_str:
-            continue
+            self.slots.setdefault(date_str, {})[hora] = idx
+            self.row_dates[idx] = date_str
 
-        try:
-            datetime.strptime(date_str, "%d/%m/%Y")
-            dates.add(date_str)
-        except ValueError:
-            continue
+            first, last = self.ranges.get(date_str, (idx, idx))
+            self.ranges[date_str] = (min(first, idx), max(last, idx))
 
-    return list(dates)
+        self.dates = []
+        for date_str in self.slots:
+            try:
+                self.dates.append((datetime.strptime(date_str, "%d/%m/%Y").date(), date_str))
+            except ValueError:
+                continue
+        self.dates.sort()
+
+    def is_expired(self) -> bool:
+        return time.monotonic() - self.loaded_at > AGENDA_INDEX_TTL
+
+    def _day_is_fresh(self, date_str: str) -> bool:
+        loaded_at = self.day_loaded_at.get(date_str)
+        return loaded_at is not None and time.monotonic() - loaded_at <= AGENDA_CACHE_TTL
+
+    def load_days(self, date_strs):
+        """Lê (um batch_get só) os blocos C:F das datas ainda não carregadas ou expiradas."""
+        with self.lock:
+            missing = [
+                date_str for date_str in dict.fromkeys(date_strs)
+                if date_str in self.ranges and not self._day_is_fresh(date_str)
+            ]
+            if not missing:
+                return
+
+            ranges = [
+                f"C{self.ranges[date_str][0]}:F{self.ranges[date_str][1]}"
+                for date_str in missing
+            ]
+            blocks = _sheet_call(WORKSHEET_AGENDA_NAME, lambda ws: ws.batch_get(ranges))
+
+            loaded_at = time.monotonic()
+            for date_str, block in zip(missing, blocks):
+                first, last = self.ranges[date_str]
+                for offset in range(last - first + 1):
+                    row = list(block[offset]) if offset < len(block) else []
+                    row = [cell.strip() for cell in row[:4]]
+                    self.cells[first + offset] = row + [""] * (4 - len(row))
+
+                self.days[date_str] = DayAvailability(self.slots[date_str], self.is_free)
+                self.day_loaded_at[date_str] = loaded_at
+                agenda_read_stats["rows_read"] += last - first + 1
+
+            agenda_read_stats["day_block_reads"] += 1
+            agenda_read_stats["days_loaded"] += len(missing)
+
+    def is_free(self, row_idx: int) -> bool:
+        return not self.cells.get(row_idx, ("",))[0]
+
+    def day(self, date_str: str) -> DayAvailability:
+        self.load_days([date_str])
+        availability = self.days.get(date_str)
+        if availability is None:
+            # Data sem linhas na agenda
+            availability = DayAvailability({}, self.is_free)
+        return availability
+
+    def write(self, row_idx: int, values: list):
+        """
+        Aplica no snapshot a mesma escrita feita na planilha (colunas C:F),
+        evitando uma nova leitura após agendar/cancelar.
+        """
+        with self.lock:
+            self.cells[row_idx] = list(values)
+
+            availability = self.days.get(self.row_dates.get(row_idx))
+            if availability is not None:
+                availability.set_free(row_idx, not values[0])
+
+_agenda_snapshot = None
+_agenda_lock = threading.Lock()
+
+agenda_read_stats = {
+    "index_reads": 0,
+    "day_block_reads": 0,
+    "days_loaded": 0,
+    "rows_read": 0,
+}
+
+def get_agenda_snapshot(force_refresh: bool = False) -> AgendaSnapshot:
+    """
+    Retorna o snapshot compartilhado da aba Agenda.
+    O índice (colunas A:B) só é relido quando AGENDA_INDEX_TTL expira
+    (ou force_refresh=True); a ocupação de cada dia é lida sob demanda.
+    """
+    global _agenda_snapshot
+
+    with _agenda_lock:
+        if force_refresh or _agenda_snapshot is None or _agenda_snapshot.is_expired():
+            rows = _sheet_call(WORKSHEET_AGENDA_NAME, lambda ws: ws.get("A:B"))
+            _agenda_snapshot = AgendaSnapshot(rows)
+            agenda_read_stats["index_reads"] += 1
+            print(f"📥 [AGENDA CACHE] Índice recarregado: {len(rows)} linhas, {len(_agenda_snapshot.dates)} datas")
+
+        return _agenda_snapshot
+
+def get_agenda_stats() -> dict:
+    return dict(agenda_read_stats)
+
+def invalidate_agenda_cache():
+    """Descarta o snapshot da Agenda; a próxima leitura busca a planilha."""
+    global _agenda_snapshot
+
+    with _agenda_lock:
+        _agenda_snapshot = None
 
 def get_available_dates():
     """
     Lê a aba Agenda e retorna uma lista de datas em formato DD/MM/YYYY (strings)
     que possuem pelo menos um horário disponível.
     """
-    # Cache por 5 minutos (use timestamp arredondado)
-    cache_key = str(int(datetime.now().timestamp() // 300))
-    return get_available_dates_cached(cache_key)
+    return [date_str for _, date_str in get_agenda_snapshot().dates]
 
-def get_available_times_for_date(date_str: str):
+def get_available_times_for_date(date_str: str, duration_minutes: int = SLOT_MINUTES):
     """
     Retorna lista de horários disponíveis (HH:MM) para uma data.
     date_str deve estar no formato DD/MM/YYYY
-    
-    OTIMIZADO: Busca apenas linhas da data específica
+
+    Só entram horários em que um serviço de `duration_minutes` cabe inteiro
+    (todos os slots de 30 min seguidos livres) — ver integrations/availability.py
     """
     try:
-        sheet = _open_sheet(WORKSHEET_AGENDA_NAME)
-        
-        # 🚀 OTIMIZAÇÃO: Usa batch_get ao invés de get_all_values
-        # Isso é mais rápido para planilhas grandes
-        all_data = sheet.get_all_values()[1:]  # Skip header
-        
-        times = []
-        
-        # 🚀 OTIMIZAÇÃO: Para assim que encontrar todos os horários da data
-        for row in all_data:
-            if len(row) < 3:
-                continue
-            
-            # Se achou a data e célula de cliente está vazia
-            if row[0] == date_str and not row[2].strip():
-                times.append(row[1])
-        
+        times = get_agenda_snapshot().day(date_str).start_times(duration_minutes)
+
         print(f"📅 [HORÁRIOS] {date_str}: {len(times)} slots disponíveis")
         return times
-        
+
     except Exception as e:
         print(f"❌ [ERROR get_available_times_for_date] {date_str}: {e}")
         # Retorna lista vazia em caso de erro ao invés de travar
         return []
 
+def get_next_available_slots(duration_minutes: int = SLOT_MINUTES, start: datetime = None,
+                             days: int = 14, limit: int = 6, per_day: int = 2,
+                             weekdays=None):
+    """
+    Próximos horários em que um serviço de `duration_minutes` cabe inteiro,
+    a partir de `start` (data/hora local; horários já passados no dia são
+    ignorados) e dentro de `days` dias. Uma única consulta ao snapshot.
+
+    Args:
+        per_day: máximo de horários por dia (espalha as sugestões entre datas)
+        weekdays: dias da semana aceitos (date.weekday()); None = todos
+
+    Returns:
+        lista de ("DD/MM/YYYY", "HH:MM") em ordem cronológica
+    """
+    try:
+        snapshot = get_agenda_snapshot()
+
+        start = start or datetime.now()
+        first_day = start.date()
+        last_day = first_day + timedelta(days=days)
+        now_hora = start.strftime("%H:%M")
+
+        position = bisect.bisect_left(snapshot.dates, (first_day, ""))
+        window = []
+        for day, date_str in snapshot.dates[position:]:
+            if day > last_day:
+                break
+            if weekdays is None or day.weekday() in weekdays:
+                window.append((day, date_str))
+
+        # Ocupação de toda a janela em um único batch_get
+        snapshot.load_days([date_str for _, date_str in window])
+
+        suggestions = []
+        for day, date_str in window:
+            if len(suggestions) >= limit:
+                break
+
+            times = snapshot.day(date_str).start_times(duration_minutes)
+            if day == first_day:
+                times = [hora for hora in times if hora > now_hora]
+
+            for hora in times[:min(per_day, limit - len(suggestions))]:
+                suggestions.append((date_str, hora))
+
+        print(f"🔎 [SUGESTÕES] {len(suggestions)} horários a partir de {first_day:%d/%m} ({duration_minutes} min)")
+        return suggestions
+
+    except Exception as e:
+        print(f"❌ [ERROR get_next_available_slots] {e}")
+        return []
+
 # --------------------------------------------------
 # AGENDA CORE (CHAMADA APENAS APÓS CONFIRMAÇÃO)
 # --------------------------------------------------
 
-def book_appointment(phone, name, service, date, time):
+def _read_agenda_rows(row_indexes: list) -> dict:
+    """
+    Relê da planilha apenas o intervalo A:F que cobre as linhas informadas.
+    Retorna { numero_da_linha: [A, B, C, D, E, F] } (células vazias como "").
+    """
+    first, last = min(row_indexes), max(row_indexes)
+    values = _sheet_call(
+        WORKSHEET_AGENDA_NAME,
+        lambda ws: ws.get(f"A{first}:F{last}")
+    )
+
+    rows = {}
+    for row_idx in row_indexes:
+        offset = row_idx - first
+        row = list(values[offset]) if offset < len(values) else []
+        rows[row_idx] = [cell.strip() for cell in row] + [""] * (COL_STATUS - len(row))
+    return rows
+
+# Resultado de book_appointment
+BOOKING_BOOKED = "booked"      # gravado e conferido
+BOOKING_CONFLICT = "conflict"  # horário ocupado/reservado por outro atendimento
+BOOKING_ERROR = "error"        # falha de leitura/escrita na planilha
+
+def _rollback_booking(rows: list, updates: list, previous: dict):
+    """
+    Desfaz uma escrita de agendamento que não pôde ser confirmada.
+
+    Só restaura (para os valores C:F lidos antes da escrita) as linhas que
+    ainda têm exatamente os valores que este agendamento gravou: linhas que
+    não chegaram a ser escritas ou que outra pessoa já alterou ficam como
+    estão.
+    """
+    try:
+        current = _read_agenda_rows(rows)
+        restore = [
+            {"range": update["range"], "values": [previous[row_idx]]}
+            for update, row_idx in zip(updates, rows)
+            if current[row_idx][COL_CLIENTE - 1:COL_STATUS] == update["values"][0]
+        ]
+        if restore:
+            _sheet_call(WORKSHEET_AGENDA_NAME, lambda ws: ws.batch_update(restore))
+        print(f"↩️ [AGENDA ROLLBACK] {len(restore)} de {len(rows)} linhas restauradas")
+    except Exception as e:
+        print(f"❌ [AGENDA ROLLBACK] Falha ao desfazer a escrita nas linhas {rows}: {e}")
+    finally:
+        # Estado da planilha incerto: força nova leitura na próxima consulta
+        invalidate_agenda_cache()
+
+def _is_own_booking(current: dict, rows: list, slot_times: list, date: str, phone: str, service: str) -> bool:
+    """True se todas as linhas do horário já têm este agendamento (mesmo telefone e serviço)."""
+    return all(
+        current[row_idx][COL_DATA - 1] == date
+        and current[row_idx][COL_HORA - 1] == slot_hora
+        and current[row_idx][COL_CLIENTE - 1]
+        and current[row_idx][COL_SERVICO - 1] == service
+        and current[row_idx][COL_TELEFONE - 1] == phone
+        for row_idx, slot_hora in zip(rows, slot_times)
+    )
+
+def book_appointment(phone, name, service, date, hora):
     """
     Marca o agendamento preenchendo as linhas correspondentes
     ao tempo total do serviço.
     
+    Concorrência otimista sobre o snapshot em cache:
+    1. escolhe as linhas pelo snapshot (bitmap do dia)
+    2. reserva os slots em slot_leases (atômico; perde quem chegar depois)
+    3. relê só o intervalo das linhas e confere data/hora/vazio
+    4. grava e relê de novo para confirmar que a escrita é a nossa
+    
+    Se a escrita falhar ou não puder ser conferida, as linhas que ainda
+    têm os nossos valores voltam ao que eram (ver _rollback_booking).
+    
+    Idempotente: se as linhas já têm este agendamento (mesmo telefone e
+    serviço), retorna BOOKING_BOOKED sem gravar de novo. Isso cobre a
+    retentativa do job quando a planilha foi gravada mas o commit no banco
+    falhou.
+    
     Args:
         phone: telefone do cliente
         name: nome do cliente
         service: nome do serviço
         date: data no formato DD/MM/YYYY (string)
-        time: horário no formato HH:MM (string)
+        hora: horário no formato HH:MM (string)
+    
+    Returns:
+        BOOKING_BOOKED, BOOKING_CONFLICT (horário tomado por outro
+        atendimento) ou BOOKING_ERROR (falha na planilha; nada ficou gravado,
+        salvo se o rollback também falhar)
     """
-    try:
-        sheet = _open_sheet(WORKSHEET_AGENDA_NAME)
+    # Import local: slot_leases traz o SQLAlchemy e cria os engines do
+    # banco, o que pesaria no import do engine (cold start)
+    from backend.core.slot_leases import acquire_slot_lease, release_slot_lease
 
-        durations = load_services_duration()
-        total_minutes = durations.get(service, 30)
-        slots = total_minutes // 30
+    leased = None
+    rows_to_update = updates = previous = None
 
-        rows = sheet.get_all_values()
-
-        rows_to_update = []
+    try:
+        total_minutes = get_catalog().duration_of(service)
 
-        for i in range(slots):
-            hora = calcular_proximo_horario(time, i * 30)
+        snapshot = get_agenda_snapshot()
+        day = snapshot.day(date)
 
-            for idx, row in enumerate(rows):
-                if len(row) >= 2 and row[0] == date and row[1] == hora:
-                    if row[2].strip():
-                        print(f"[AGENDA CONFLICT] {date} {hora}")
-                        return False
-                    rows_to_update.append(idx + 1)
+        rows_to_update = day.slot_rows(hora, total_minutes)
 
         if not rows_to_update:
-            print(f"❌ [AGENDA] Nenhuma linha encontrada para {date} {time}")
-            return False
+            print(f"[AGENDA CONFLICT] {date} {hora} ({total_minutes} min) não cabe na agenda")
+            return BOOKING_CONFLICT
+
+        slot_times = [day.hora_of(day.positions[row_idx]) for row_idx in rows_to_update]
+
+        # Mesmo bitmap usado na oferta de horários: todos os slots do serviço
+        # precisam estar livres. Ocupado pode ser o próprio agendamento, numa
+        # retentativa do job depois de a planilha já ter sido gravada.
+        if not day.rows_for(hora, total_minutes):
+            current = _read_agenda_rows(rows_to_update)
+            if _is_own_booking(current, rows_to_update, slot_times, date, phone, service):
+                print(f"♻️ [AGENDA] {date} {hora} já agendado para {phone} (retentativa)")
+                return BOOKING_BOOKED
+
+            print(f"[AGENDA CONFLICT] {date} {hora} ({total_minutes} min) ocupado")
+            return BOOKING_CONFLICT
+
+        if not acquire_slot_lease(date, slot_times, phone):
+            print(f"[AGENDA CONFLICT] {date} {hora} em reserva por outro atendimento")
+            return BOOKING_CONFLICT
+        leased = slot_times
+
+        # Snapshot pode estar velho: confere o intervalo direto na planilha
+        current = _read_agenda_rows(rows_to_update)
+        if _is_own_booking(current, rows_to_update, slot_times, date, phone, service):
+            for row_idx in rows_to_update:
+                snapshot.write(row_idx, current[row_idx][COL_CLIENTE - 1:COL_STATUS])
+            print(f"♻️ [AGENDA] {date} {hora} já agendado para {phone} (retentativa)")
+            return BOOKING_BOOKED
+
+        for row_idx, slot_hora in zip(rows_to_update, slot_times):
+            row = current[row_idx]
+
+            if row[COL_DATA - 1] != date or row[COL_HORA - 1] != slot_hora:
+                # Linhas mudaram de lugar: o snapshot inteiro é suspeito
+                print(f"[AGENDA CONFLICT] Linha {row_idx} não é mais {date} {slot_hora}")
+                invalidate_agenda_cache()
+                return BOOKING_CONFLICT
+
+            if row[COL_CLIENTE - 1]:
+                print(f"[AGENDA CONFLICT] {date} {slot_hora} já ocupado na planilha")
+                snapshot.write(row_idx, row[COL_CLIENTE - 1:COL_STATUS])
+                return BOOKING_CONFLICT
+
+        previous = {row_idx: current[row_idx][COL_CLIENTE - 1:COL_STATUS] for row_idx in rows_to_update}
 
         updates = []
         for i, row_idx in enumerate(rows_to_update):
@@ -202,27 +571,143 @@ def book_appointment(phone, name, service, date, time):
                 "values": [[cliente, service, phone, "Agendado"]]
             })
 
-        sheet.batch_update(updates)
-        print(f"✅ [AGENDA OK] {name} ({phone}) - {service} em {date} {time}")
-        
-        # Invalida cache de datas disponíveis
-        get_available_dates_cached.cache_clear()
-        
-        return True
+        _sheet_call(WORKSHEET_AGENDA_NAME, lambda ws: ws.batch_update(updates))
+
+        # Confirma que a escrita que ficou é a nossa (ex.: edição manual simultânea)
+        written = _read_agenda_rows(rows_to_update)
+        for update, row_idx in zip(updates, rows_to_update):
+            expected = update["values"][0]
+            actual = written[row_idx][COL_CLIENTE - 1:COL_STATUS]
+
+            if actual != expected:
+                print(f"[AGENDA CONFLICT] Linha {row_idx} sobrescrita durante o agendamento: {actual}")
+                _rollback_booking(rows_to_update, updates, previous)
+                return BOOKING_CONFLICT
+
+        for update, row_idx in zip(updates, rows_to_update):
+            snapshot.write(row_idx, update["values"][0])
+
+        print(f"✅ [AGENDA OK] {name} ({phone}) - {service} em {date} {hora}")
+        return BOOKING_BOOKED
         
     except Exception as e:
-        print(f"❌ [AGENDA ERROR] {phone} - {service} em {date} {time}: {e}")
-        return False
+        print(f"❌ [AGENDA ERROR] {phone} - {service} em {date} {hora}: {e}")
+        if updates is not None:
+            # A escrita pode ter sido aplicada (toda ou em parte) antes da falha
+            _rollback_booking(rows_to_update, updates, previous)
+        else:
+            invalidate_agenda_cache()
+        return BOOKING_ERROR
+
+    finally:
+        if leased:
+            try:
+                release_slot_lease(date, leased, phone)
+            except Exception as e:
+                # A reserva expira sozinha em SLOT_LEASE_SECONDS
+                print(f"⚠️ [AGENDA] Falha ao liberar reserva {date} {leased}: {e}")
 
 # --------------------------------------------------
 # CONTROLE DO ROBÔ
 # --------------------------------------------------
 
+class MuteRegistry:
+    """
+    Mapa em memória { telefone: (mute, numero_da_linha) } da aba Controle_Robo.
+
+    É recarregado a cada MUTE_CACHE_TTL segundos lendo apenas as colunas A:B.
+    Escritas via set_robot_mute são aplicadas imediatamente no mapa.
+    """
+
+    def __init__(self):
+        self.entries = {}
+        self.loaded_at = None
+        self.lock = threading.Lock()
+
+        # Métricas
+        self.hits = 0
+        self.refreshes = 0
+        self.refresh_errors = 0
+        self.last_error = None
+
+    def _load(self):
+        # Apenas ID_Cliente (A) e MUTE_ROBO (B)
+        values = _sheet_call(WORKSHEET_CONTROLE_NAME, lambda ws: ws.get("A:B"))
+
+        entries = {}
+        for idx, row in enumerate(values[1:], start=2):  # Pula cabeçalho
+            if not row:
+                continue
+
+            id_cliente = row[COL_ID_CLIENTE - 1].strip()
+            if not id_cliente:
+                continue
+
+            mute_robo = row[COL_MUTE_ROBO - 1].strip() if len(row) >= COL_MUTE_ROBO else ""
+            entries[id_cliente] = (mute_robo.upper() == "TRUE", idx)
+
+        self.entries = entries
+        self.loaded_at = time.monotonic()
+        self.refreshes += 1
+
+    def age(self):
+        if self.loaded_at is None:
+            return None
+        return time.monotonic() - self.loaded_at
+
+    def ensure_fresh(self, force: bool = False):
+        """
+        Recarrega o mapa se expirado. Em caso de falha mantém o último mapa
+        conhecido (servindo dados antigos) e registra o erro.
+        """
+        with self.lock:
+            age = self.age()
+            if not force and age is not None and age <= MUTE_CACHE_TTL:
+                return
+
+            try:
+                self._load()
+            except Exception as e:
+                self.refresh_errors += 1
+                self.last_error = str(e)
+                print(f"❌ [MUTE CACHE ERROR] Falha ao recarregar Controle_Robo: {e}")
+                if force:
+                    raise
+
+    def get(self, phone: str):
+        self.ensure_fresh()
+        self.hits += 1
+        return self.entries.get(phone)
+
+    def set(self, phone: str, muted: bool, row_idx: int):
+        with self.lock:
+            self.entries[phone] = (muted, row_idx)
+
+    def stats(self) -> dict:
+        age = self.age()
+        return {
+            "entries": len(self.entries),
+            "age_seconds": round(age, 3) if age is not None else None,
+            "ttl_seconds": MUTE_CACHE_TTL,
+            "is_stale": age is None or age > MUTE_CACHE_TTL,
+            "hits": self.hits,
+            "refreshes": self.refreshes,
+            "refresh_errors": self.refresh_errors,
+            "last_error": self.last_error,
+        }
+
+mute_registry = MuteRegistry()
+
+def get_mute_registry_stats() -> dict:
+    """Métricas de idade/atualização do cache de MUTE (para monitoramento)."""
+    return mute_registry.stats()
+
 def is_robot_muted(phone: str) -> bool:
     """
     Verifica se o robô está silenciado para um telefone.
     
-    Lê a coluna A (ID_Cliente) e coluna B (MUTE_ROBO) da aba Controle_Robo.
+    Consulta o mapa em memória da aba Controle_Robo (colunas A:B),
+    recarregado a cada MUTE_CACHE_TTL segundos.
     
     Args:
         phone: telefone do cliente (ID_Cliente)
@@ -231,25 +716,22 @@ def is_robot_muted(phone: str) -> bool:
         True se MUTE_ROBO = TRUE, False caso contrário
     """
     try:
-        sheet = _open_sheet(WORKSHEET_CONTROLE_NAME)
-        rows = sheet.get_all_values()[1:]  # Pula cabeçalho
-
-        for row in rows:
-            # Verifica se tem pelo menos 2 colunas (ID_Cliente e MUTE_ROBO)
-            if len(row) >= COL_MUTE_ROBO:
-                id_cliente = row[COL_ID_CLIENTE - 1].strip()  # -1 porque lista é 0-indexed
-                mute_robo = row[COL_MUTE_ROBO - 1].strip()
-                
-                if id_cliente == phone:
-                    return mute_robo.upper() == "TRUE"
-
-        return False
+        entry = mute_registry.get(phone)
+        return bool(entry and entry[0])
         
     except Exception as e:
         print(f"❌ [MUTE CHECK ERROR] {phone}: {e}")
         # Em caso de erro, assume que NÃO está mutado (robô funciona)
         return False
 
+def _appended_row_index(response):
+    """Extrai o número da linha criada da resposta do append_row (ex.: 'Controle_Robo!A7:D7')."""
+    try:
+        updated_range = response["updates"]["updatedRange"]
+        return int("".join(c for c in updated_range.split("!")[-1].split(":")[0] if c.isdigit()))
+    except Exception:
+        return None
+
 def set_robot_mute(phone: str, mute_status: bool, name: str = None, status: str = None) -> bool:
     """
     🆕 VERSÃO ATUALIZADA: Atendimento Inteligente com Contexto Enriquecido
@@ -277,9 +759,6 @@ def set_robot_mute(phone: str, mute_status: bool, name: str = None, status: str
         Coluna D (amarelo):  Status_Humano   - Motivo/status do atendimento
     """
     try:
-        sheet = _open_sheet(WORKSHEET_CONTROLE_NAME)
-        rows = sheet.get_all_values()
-        
         # ====================================================================
         # 🆕 Define valores conforme nomenclatura da planilha
         # ====================================================================
@@ -290,28 +769,28 @@ def set_robot_mute(phone: str, mute_status: bool, name: str = None, status: str
         mute_robo = "TRUE" if mute_status else "FALSE"
         
         # Procura se o ID_Cliente já existe na planilha
-        row_index = None
-        for idx, row in enumerate(rows):
-            if len(row) >= COL_ID_CLIENTE:
-                id_cliente = row[COL_ID_CLIENTE - 1].strip()
-                if id_cliente == phone:
-                    row_index = idx + 1  # +1 porque gspread é 1-indexed
-                    break
+        # (leitura fresca de A:B para não duplicar linhas criadas por outro processo)
+        mute_registry.ensure_fresh(force=True)
+        entry = mute_registry.entries.get(phone)
+        row_index = entry[1] if entry else None
         
         if row_index:
             # ====================================================================
             # 🔄 ATUALIZAÇÃO: Cliente já existe - atualiza 3 colunas (B, C, D)
             # ====================================================================
-            sheet.update(
+            _sheet_call(WORKSHEET_CONTROLE_NAME, lambda ws: ws.update(
                 f"B{row_index}:D{row_index}",  # Range: MUTE_ROBO até Status_Humano
                 [[mute_robo, nome_cliente, status_humano]]
-            )
+            ))
+            mute_registry.set(phone, mute_status, row_index)
             print(f"✅ [MUTE UPDATE] ID: {phone} | MUTE_ROBO: {mute_robo} | Nome_Cliente: {nome_cliente} | Status_Humano: {status_humano}")
         else:
             # ====================================================================
             # 🆕 NOVO REGISTRO: Adiciona nova linha com 4 campos (A, B, C, D)
             # ====================================================================
-            sheet.append_row([phone, mute_robo, nome_cliente, status_humano])
+            # append_row não é idempotente: sem retry automático
+            response = _open_sheet(WORKSHEET_CONTROLE_NAME).append_row([phone, mute_robo, nome_cliente, status_humano])
+            mute_registry.set(phone, mute_status, _appended_row_index(response))
             print(f"✅ [MUTE NEW] ID: {phone} | MUTE_ROBO: {mute_robo} | Nome_Cliente: {nome_cliente} | Status_Humano: {status_humano}")
         
         return True
@@ -335,15 +814,18 @@ def cancel_appointment(phone: str) -> bool:
         True se cancelou com sucesso, False se não encontrou
     """
     try:
-        sheet = _open_sheet(WORKSHEET_AGENDA_NAME)
-        rows = sheet.get_all_values()
+        snapshot = get_agenda_snapshot()
+        
+        # Só Telefone e Status (E:F) são necessários para achar as linhas
+        contact_rows = _sheet_call(WORKSHEET_AGENDA_NAME, lambda ws: ws.get("E:F"))
+        agenda_read_stats["rows_read"] += len(contact_rows)
         
         rows_to_clear = []
         
         # Procura todas as linhas com esse telefone
-        for idx, row in enumerate(rows):
-            if len(row) >= 5 and row[4] == phone and row[5] == "Agendado":
-                rows_to_clear.append(idx + 1)
+        for idx, row in enumerate(contact_rows, start=1):
+            if len(row) >= 2 and row[0].strip() == phone and row[1].strip() == "Agendado":
+                rows_to_clear.append(idx)
         
         if not rows_to_clear:
             print(f"[CANCELAMENTO] Nenhum agendamento encontrado para {phone}")
@@ -357,14 +839,16 @@ def cancel_appointment(phone: str) -> bool:
                 "values": [["", "", "", ""]]
             })
         
-        sheet.batch_update(updates)
+        _sheet_call(WORKSHEET_AGENDA_NAME, lambda ws: ws.batch_update(updates))
         print(f"✅ [CANCELAMENTO OK] {phone} - {len(rows_to_clear)} slots liberados")
         
-        # Invalida cache de datas disponíveis
-        get_available_dates_cached.cache_clear()
+        # Libera os slots também no snapshot
+        for row_idx in rows_to_clear:
+            snapshot.write(row_idx, ["", "", "", ""])
         
         return True
         
     except Exception as e:
+        invalidate_agenda_cache()
         print(f"❌ [CANCELAMENTO ERROR] {phone}: {e}")
         return False
\ No newline at end of file
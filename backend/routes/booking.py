@@ -1,6 +1,6 @@
 from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel
-from backend.integrations.sheets import book_appointment # Importa a lógica que alteramos
+from backend.integrations.sheets import book_appointment, BOOKING_BOOKED, BOOKING_CONFLICT
 
 router = APIRouter()
 
@@ -18,20 +18,23 @@ def create_booking(appointment: Appointment):
     Rota que recebe o pedido de agendamento e trata se foi possível ou não gravar.
     """
     # Tenta realizar o agendamento no Sheets
-    success = book_appointment(
-        appointment.date, 
-        appointment.time, 
-        appointment.client_name, 
-        appointment.service_name, 
-        appointment.phone
+    result = book_appointment(
+        phone=appointment.phone,
+        name=appointment.client_name,
+        service=appointment.service_name,
+        date=appointment.date,
+        hora=appointment.time
     )
 
-    if success:
+    if result == BOOKING_BOOKED:
         return {"status": "success", "message": "Agendamento realizado com sucesso!"}
-    else:
-        # Se retornar False (horário ocupado ou erro), retornamos um erro 400
-        # A IA verá esse erro e usará o Prompt para explicar à cliente
-        raise HTTPException(status_code=400, detail="Horário indisponível ou erro na planilha")
+
+    if result == BOOKING_CONFLICT:
+        # Horário ocupado ou reservado por outro atendimento
+        raise HTTPException(status_code=409, detail="Horário indisponível")
+
+    # Falha ao ler/gravar a planilha: nada ficou gravado, pode tentar de novo
+    raise HTTPException(status_code=503, detail="Erro ao gravar na planilha")
 
 @router.get("/test")
 def test_booking():
@@ -1,12 +1,12 @@
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter
 from pydantic import BaseModel
-from sqlalchemy.orm import Session
 
-from backend.db.session import get_db
-from backend.db.models import MessageLog
 from backend.ai.engine import generate_ai_response
 from backend.integrations.sheets import is_robot_muted
-from backend.core.utils import send_whatsapp_message
+from backend.core.outbox import enqueue_outbound_message, notify_outbox
+from backend.core.concurrency import run_blocking
+from backend.core.jobs import phone_locks
+from backend.routes.webhook import log_message
 
 router = APIRouter()
 
@@ -24,8 +24,7 @@ class ChatTestMessage(BaseModel):
 
 @router.post("/message", tags=["chat"])
 async def chat_test_message(
-    payload: ChatTestMessage,
-    db: Session = Depends(get_db)
+    payload: ChatTestMessage
 ):
     """
     Endpoint de chat para o Studio Olhar Sob Medida.
@@ -43,39 +42,34 @@ async def chat_test_message(
         return {"status": "empty_message"}
 
     # 🔇 Verifica se o robô está silenciado
-    if is_robot_muted(phone):
+    if await run_blocking("sheets", is_robot_muted, phone):
         return {
             "status": "muted",
             "reason": "Número silenciado na planilha Controle_Robo."
         }
 
-    # 🤖 Chama o motor de conversação
-    ai_response = generate_ai_response(
-        phone=phone,
-        message=message
-    )
+    # 🤖 Chama o motor de conversação (uma mensagem por telefone por vez)
+    async with phone_locks.hold(phone):
+        # O engine devolve (mensagem, novo_estado); a rota de teste não guarda estado
+        ai_response, _ = await run_blocking(
+            "engine",
+            generate_ai_response,
+            phone=phone,
+            message=message
+        )
 
     print(f"🤖 IA respondeu: {ai_response}")
 
-    # 📤 Envia resposta via WhatsApp
+    # 📤 Envia resposta via WhatsApp (outbox)
     try:
-        send_whatsapp_message(phone, ai_response)
+        await run_blocking("db", enqueue_outbound_message, phone, ai_response)
+        notify_outbox()
     except Exception as e:
-        print(f"⚠️ Erro ao enviar mensagem WhatsApp: {e}")
+        print(f"⚠️ Erro ao enfileirar mensagem WhatsApp: {e}")
 
-    # 🧾 Log no banco SQLite
-    try:
-        db.add(
-            MessageLog(
-                sender=phone,
-                message=message,
-                response=ai_response
-            )
-        )
-        db.commit()
-    except Exception as e:
-        print(f"⚠️ Erro ao salvar log no banco SQLite: {e}")
-        db.rollback()
+    # 🧾 Log no banco SQLite (gravado em lote pelo writer em background)
+    log_message(phone, message, "in")
+    log_message(phone, ai_response, "out")
 
     return {
         "status": "ok",
@@ -1,34 +1,24 @@
-from fastapi import APIRouter, Request, Depends
+from fastapi import APIRouter, Request
+from sqlalchemy import select, insert, update
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
+import asyncio
 import json
 from datetime import datetime
 
-from backend.db.session import get_db
-from backend.db.models import MessageLog, ConversationSession
+from backend.db.session import open_db_session, rollback_db, close_db
+from backend.db.models import ConversationSession
 from backend.ai.engine import generate_ai_response
 from backend.integrations.sheets import is_robot_muted
-from backend.core.utils import send_whatsapp_message
+from backend.core.outbox import add_outbound_message, notify_outbox
+from backend.core.message_log import record_message
+from backend.core.session_cache import CachedSession, session_cache
+from backend.core.concurrency import run_blocking
+from backend.core.jobs import enqueue_job, notify_workers, complete_job_statement
+from backend.core.dedupe import message_dedupe
 
 router = APIRouter()
 
-# --------------------------------------------------
-# CONTROLE DE DUPLICIDADE (ANTI-REENTREGA)
-# --------------------------------------------------
-
-MAX_PROCESSED_IDS = 500
-processed_ids = set()
-
-def register_message_id(message_id: str) -> bool:
-    if not message_id or message_id in processed_ids:
-        return False
-
-    processed_ids.add(message_id)
-
-    if len(processed_ids) > MAX_PROCESSED_IDS:
-        processed_ids.pop()
-
-    return True
-
 # --------------------------------------------------
 # EXTRAÇÃO SEGURA DE TEXTO (Z-API)
 # --------------------------------------------------
@@ -87,8 +77,51 @@ def extract_sender_name(data: dict) -> str:
 # --------------------------------------------------
 # 🆕 GERENCIAMENTO DE SESSÃO DE CONVERSA
 # --------------------------------------------------
+# A Session do SQLAlchemy é a unidade de trabalho da mensagem: as funções
+# abaixo só leem ou registram alterações (sessão, outbox) e
+# process_message grava tudo em um único commit no fim (um fsync por
+# mensagem no SQLite, em vez de até quatro). Com autoflush desligado,
+# nada é escrito antes disso, e o banco não fica travado durante as
+# chamadas ao Sheets/engine. O MessageLog fica fora da transação: vai
+# para o writer em background (backend.core.message_log).
+#
+# A sessão de conversa circula como CachedSession (backend.core.session_cache):
+# conversas ativas são lidas da memória, sem SELECT nem json.loads, e só
+# os campos alterados são gravados (UPDATE condicionado à versão).
+#
+# db pode ser uma Session síncrona ou uma AsyncSession (engine assíncrono,
+# ver backend.db.session): só a leitura da sessão e o commit fazem I/O, e
+# ambos têm caminho async; o resto apenas registra objetos.
+
+class StaleSessionError(Exception):
+    """A sessão mudou no banco desde que foi lida (outro processo atendeu o telefone)."""
+
+class JobLeaseLostError(Exception):
+    """O job deixou de pertencer a este processo (lease expirou e outro worker o pegou)."""
+
+def _new_session(phone: str) -> CachedSession:
+    print(f"🆕 Criando nova sessão para {phone}")
+    return CachedSession(
+        phone=phone,
+        current_step="initial",
+        data={},
+        status="active",
+        is_muted=False,
+        is_new=True
+    )
 
-def get_or_create_session(db: Session, phone: str) -> ConversationSession:
+def _from_row(row: ConversationSession) -> CachedSession:
+    print(f"📂 Sessão encontrada: step={row.current_step}, status={row.status}")
+    return CachedSession(
+        phone=row.phone,
+        current_step=row.current_step,
+        data=parse_session_data(row),
+        status=row.status,
+        is_muted=bool(row.is_muted),
+        version=row.last_interaction
+    )
+
+def get_or_create_session(db: Session, phone: str) -> CachedSession:
     """
     Busca ou cria uma sessão de conversa para o cliente.
     
@@ -97,45 +130,54 @@ def get_or_create_session(db: Session, phone: str) -> ConversationSession:
         phone: Número de telefone do cliente
     
     Returns:
-        ConversationSession: Sessão ativa ou nova sessão criada
+        CachedSession: Sessão ativa ou nova sessão criada
+        (a nova só é gravada no commit de process_message)
     """
     # Busca sessão existente
-    session = db.query(ConversationSession).filter(
+    row = db.query(ConversationSession).filter(
         ConversationSession.phone == phone
     ).first()
     
-    if session:
-        print(f"📂 Sessão encontrada: step={session.current_step}, status={session.status}")
-        return session
+    if row:
+        return _from_row(row)
     
     # Cria nova sessão
-    print(f"🆕 Criando nova sessão para {phone}")
-    new_session = ConversationSession(
-        phone=phone,
-        current_step="initial",
-        conversation_data="{}",
-        status="active",
-        is_muted=False
-    )
-    db.add(new_session)
-    db.commit()
-    db.refresh(new_session)
-    
-    return new_session
+    return _new_session(phone)
+
+async def get_or_create_session_async(db, phone: str) -> CachedSession:
+    """
+    Igual a get_or_create_session, consultando antes o cache de sessões e
+    aceitando AsyncSession (await direto no event loop) ou Session
+    síncrona (via pool bloqueante).
+    """
+    session = session_cache.get(phone)
+    if session is not None:
+        print(f"⚡ Sessão em cache: step={session.current_step}, status={session.status}")
+        return session
+
+    if not isinstance(db, AsyncSession):
+        session = await run_blocking("db", get_or_create_session, db, phone)
+    else:
+        row = (
+            await db.execute(select(ConversationSession).where(ConversationSession.phone == phone))
+        ).scalars().first()
+        session = _from_row(row) if row else _new_session(phone)
+
+    session_cache.put(session)
+    return session
 
 def update_session(
-    db: Session,
-    session: ConversationSession,
+    session: CachedSession,
     current_step: str = None,
     conversation_data: dict = None,
     status: str = None,
     is_muted: bool = None
 ):
     """
-    Atualiza uma sessão de conversa existente.
+    Atualiza uma sessão de conversa (em memória; gravada por persist_session).
+    Só os campos cujo valor mudou ficam marcados para gravação.
     
     Args:
-        db: Sessão do banco de dados
         session: Sessão a ser atualizada
         current_step: Nova etapa da conversa (opcional)
         conversation_data: Novos dados da conversa (opcional)
@@ -143,24 +185,83 @@ def update_session(
         is_muted: Novo estado de mute (opcional)
     """
     if current_step is not None:
-        session.current_step = current_step
+        session.set("current_step", current_step)
         print(f"📝 Sessão atualizada: step → {current_step}")
     
     if conversation_data is not None:
-        session.conversation_data = json.dumps(conversation_data, ensure_ascii=False)
+        session.set("data", conversation_data)
         print(f"💾 Dados da conversa atualizados: {conversation_data}")
     
     if status is not None:
-        session.status = status
+        session.set("status", status)
         print(f"📊 Status atualizado: {status}")
     
     if is_muted is not None:
-        session.is_muted = is_muted
+        session.set("is_muted", is_muted)
         print(f"🔇 Mute atualizado: {is_muted}")
-    
-    session.last_interaction = datetime.now()
+
+def _session_statement(session: CachedSession, now: datetime):
+    """INSERT (sessão nova) ou UPDATE só dos campos alterados; None se nada mudou."""
+    if not session.is_new and not session.dirty:
+        return None
+
+    fields = CachedSession.FIELDS if session.is_new else session.dirty
+    values = {"last_interaction": now}
+    for field in fields:
+        if field == "data":
+            values["conversation_data"] = json.dumps(session.data, ensure_ascii=False)
+        else:
+            values[field] = getattr(session, field)
+
+    if session.is_new:
+        return insert(ConversationSession).values(phone=session.phone, created_at=now, **values)
+
+    return (
+        update(ConversationSession)
+        .where(
+            ConversationSession.phone == session.phone,
+            ConversationSession.last_interaction == session.version
+        )
+        .values(**values)
+    )
+
+def _check_written(session: CachedSession, statement, result):
+    if statement is not None and not session.is_new and result.rowcount != 1:
+        session_cache.record_conflict(session.phone)
+        raise StaleSessionError(f"Sessão de {session.phone} foi alterada por outro processo")
+
+def _check_job_completed(job_id: int, result):
+    if result.rowcount != 1:
+        raise JobLeaseLostError(f"Job {job_id} não está mais reservado por este processo")
+
+def _write_and_commit(db: Session, session: CachedSession, statement, job_id: int = None):
+    if statement is not None:
+        _check_written(session, statement, db.execute(statement))
+    if job_id is not None:
+        _check_job_completed(job_id, db.execute(complete_job_statement(job_id)))
     db.commit()
-    db.refresh(session)
+
+async def persist_session(db, session: CachedSession, job_id: int = None):
+    """
+    Grava as alterações da sessão e faz o commit da transação da mensagem
+    (junto com o que já estiver registrado em db, como o outbox).
+    Com job_id, o job da fila é marcado como concluído no mesmo commit.
+    """
+    now = datetime.now()
+    statement = _session_statement(session, now)
+
+    if isinstance(db, AsyncSession):
+        if statement is not None:
+            _check_written(session, statement, await db.execute(statement))
+        if job_id is not None:
+            _check_job_completed(job_id, await db.execute(complete_job_statement(job_id)))
+        await db.commit()
+    else:
+        await run_blocking("db", _write_and_commit, db, session, statement, job_id)
+
+    if statement is not None:
+        session.mark_saved(now)
+    session_cache.put(session)
 
 def parse_session_data(session: ConversationSession) -> dict:
     """
@@ -180,15 +281,159 @@ def parse_session_data(session: ConversationSession) -> dict:
         print("⚠️ Erro ao decodificar conversation_data, retornando dict vazio")
         return {}
 
+def log_message(phone: str, message: str, direction: str):
+    """
+    Registra uma mensagem (entrada "in" ou saída "out") no MessageLog.
+    A gravação é feita em lote pelo writer em background (sem I/O aqui).
+    """
+    record_message(phone, message, direction)
+
+def queue_reply(db: Session, phone: str, message: str):
+    """
+    Registra a resposta no outbox (sem commit).
+    O envio real é feito pelos senders do outbox (backend.core.outbox).
+    """
+    add_outbound_message(db, phone, message)
+
+# --------------------------------------------------
+# PROCESSAMENTO DA MENSAGEM (EXECUTADO PELOS WORKERS DA FILA)
+# --------------------------------------------------
+
+async def process_message(db, phone: str, message: str, sender_name: str = None, job_id: int = None) -> dict:
+    """
+    Pipeline completo de uma mensagem: sessão → mute → engine → envio → persistência.
+
+    Sessão e outbox são gravados juntos no commit final: se qualquer
+    etapa falhar (inclusive o commit), nada é gravado, nenhuma resposta
+    chega ao outbox e o job volta para a fila (retentativa) sem risco de
+    enviar a mesma mensagem duas vezes à cliente. Os logs só são
+    registrados depois do commit, para a retentativa não duplicá-los.
+
+    job_id (job da fila) é concluído no mesmo commit da resposta.
+    """
+    # ⚠️ Todo trabalho bloqueante (Sheets, engine, SQLite síncrono) roda
+    # via run_blocking para não travar o event loop do worker.
+
+    # ====================================================================
+    # 🆕 GERENCIAMENTO DE SESSÃO
+    # ====================================================================
+
+    # Busca ou cria sessão (única leitura no banco) e verifica o mute no
+    # Sheets ao mesmo tempo: as duas I/O são independentes
+    session, robot_muted = await asyncio.gather(
+        get_or_create_session_async(db, phone),
+        run_blocking("sheets", is_robot_muted, phone)
+    )
+    
+    # Dados da conversa (já decodificados na sessão)
+    session_data = session.data
+    
+    if robot_muted:
+        print(f"🔇 Robô mutado para: {phone} ({sender_name or 'sem nome'})")
+        
+        # Atualiza sessão para indicar que está em atendimento humano
+        if not session.is_muted:
+            update_session(session, is_muted=True, status="waiting_human")
+            await persist_session(db, session, job_id)
+        
+        return {"status": "muted"}
+    
+    # Se robô estava mutado e agora foi desmutado
+    if session.is_muted and not robot_muted:
+        print(f"🔊 Robô desmutado para: {phone} - Retomando conversa...")
+        update_session(session, is_muted=False, status="active")
+
+    # ====================================================================
+    # 🆕 CHAMADA DO ENGINE COM CONTEXTO COMPLETO E PROCESSAMENTO DO RETORNO
+    # ====================================================================
+    print(f"🤖 Chamando engine para {phone} ({sender_name or 'sem nome'})...")
+    print(f"📋 Contexto: step={session.current_step}, data={session_data}")
+    
+    # 🆕 Engine retorna TUPLA: (mensagem, novo_estado)
+    ai_response, new_state = await run_blocking(
+        "engine",
+        generate_ai_response,
+        phone=phone,
+        message=message,
+        sender_name=sender_name,
+        current_step=session.current_step,
+        session_data=session_data
+    )
+    
+    print(f"✅ Engine processado com sucesso")
+    print(f"📤 Resposta: {ai_response[:100] if ai_response else 'None'}...")
+    print(f"🔄 Novo estado: step={new_state.get('current_step')}, status={new_state.get('status')}")
+
+    # ====================================================================
+    # 🆕 ENFILEIRA RESPOSTA AO CLIENTE NO OUTBOX (SE HOUVER)
+    # ====================================================================
+    if ai_response:
+        queue_reply(db, phone, ai_response)
+    else:
+        print(f"⚠️ Engine não retornou mensagem (possível handoff para humano)")
+    
+    # ====================================================================
+    # 🆕 ATUALIZA SESSÃO NO BANCO COM NOVO ESTADO
+    # ====================================================================
+    if new_state:
+        update_session(
+            session,
+            current_step=new_state.get("current_step"),
+            conversation_data=new_state.get("conversation_data"),
+            status=new_state.get("status", "active")
+        )
+    else:
+        print(f"⚠️ Engine não retornou novo estado")
+
+    # ====================================================================
+    # 🆕 PERSISTÊNCIA: SESSÃO + OUTBOX EM UMA ÚNICA TRANSAÇÃO
+    # ====================================================================
+    await persist_session(db, session, job_id)
+
+    # Logs de entrada/saída (write-behind, fora do caminho crítico)
+    log_message(phone, message, "in")
+
+    if ai_response:
+        log_message(phone, ai_response, "out")
+        notify_outbox()
+        print(f"📨 Resposta enfileirada para {phone}")
+
+    if new_state:
+        print(f"💾 Sessão persistida no banco: step={new_state.get('current_step')}")
+    
+    return {"status": "ok"}
+
+async def process_webhook_job(job: dict):
+    """
+    Handler dos workers da fila (backend.core.jobs).
+    Cada job usa sua própria sessão de banco (async, se disponível).
+    """
+    data = job["payload"]
+    message = extract_message_text(data).strip()
+    sender_name = extract_sender_name(data)
+
+    db = open_db_session()
+    try:
+        result = await process_message(db, job["phone"], message, sender_name, job_id=job["id"])
+        print(f"✅ Job {job['message_id']} processado: {result['status']}")
+    except Exception:
+        # A cópia em cache pode ter alterações que não foram gravadas
+        session_cache.discard(job["phone"])
+        await rollback_db(db)
+        raise
+    finally:
+        await close_db(db)
+
 # --------------------------------------------------
 # WEBHOOK PRINCIPAL (Z-API)
 # --------------------------------------------------
 
 @router.post("/webhook", tags=["webhook"])
-async def receive_webhook(
-    request: Request,
-    db: Session = Depends(get_db)
-):
+async def receive_webhook(request: Request):
+    """
+    Valida o payload, grava na fila de jobs e responde imediatamente.
+    O processamento acontece nos workers (ver process_webhook_job).
+    """
     try:
         data = await request.json()
         print("📩 Webhook recebido:", data)
@@ -203,9 +448,8 @@ async def receive_webhook(
             print("🚫 Mensagem ignorada (grupo / fromMe / sem phone)")
             return {"status": "ignored"}
 
-        # Anti-duplicidade
-        if not register_message_id(message_id):
-            print("🔁 Mensagem duplicada ignorada:", message_id)
+        if not message_id:
+            print("🚫 Mensagem sem messageId ignorada")
             return {"status": "duplicate"}
 
         # Extrai texto de forma segura
@@ -216,128 +460,30 @@ async def receive_webhook(
             print("🚫 Mensagem vazia após extração")
             return {"status": "empty"}
 
-        # Extrai nome do remetente
-        sender_name = extract_sender_name(data)
-        print(f"👤 Nome do remetente: {sender_name or 'Não identificado'}")
+        message_id = str(message_id)
 
-        # ====================================================================
-        # 🆕 GERENCIAMENTO DE SESSÃO
-        # ====================================================================
-        
-        # Busca ou cria sessão para este cliente
-        session = get_or_create_session(db, phone)
-        
-        # Parse dos dados da conversa
-        session_data = parse_session_data(session)
-        
-        # Verifica se robô está mutado
-        robot_muted = is_robot_muted(phone)
-        
-        if robot_muted:
-            print(f"🔇 Robô mutado para: {phone} ({sender_name or 'sem nome'})")
-            
-            # Atualiza sessão para indicar que está em atendimento humano
-            if not session.is_muted:
-                update_session(
-                    db=db,
-                    session=session,
-                    is_muted=True,
-                    status="waiting_human"
-                )
-            
-            return {"status": "muted"}
-        
-        # Se robô estava mutado e agora foi desmutado
-        if session.is_muted and not robot_muted:
-            print(f"🔊 Robô desmutado para: {phone} - Retomando conversa...")
-            update_session(
-                db=db,
-                session=session,
-                is_muted=False,
-                status="active"
-            )
-
-        # Log de entrada
-        db.add(
-            MessageLog(
-                phone=phone,
-                message=message,
-                direction="in"
-            )
-        )
-        db.commit()
+        # Anti-duplicidade (1): reentregas recentes, sem tocar no banco
+        if message_dedupe.seen_or_add(message_id):
+            print("🔁 Mensagem duplicada ignorada:", message_id)
+            return {"status": "duplicate"}
 
-        # ====================================================================
-        # 🆕 CHAMADA DO ENGINE COM CONTEXTO COMPLETO E PROCESSAMENTO DO RETORNO
-        # ====================================================================
-        print(f"🤖 Chamando engine para {phone} ({sender_name or 'sem nome'})...")
-        print(f"📋 Contexto: step={session.current_step}, data={session_data}")
-        
+        # Anti-duplicidade (2): message_id é UNIQUE na fila (vale entre workers)
         try:
-            # 🆕 Engine agora retorna TUPLA: (mensagem, novo_estado)
-            ai_response, new_state = generate_ai_response(
-                phone=phone,
-                message=message,
-                sender_name=sender_name,
-                current_step=session.current_step,
-                session_data=session_data
-            )
-            
-            print(f"✅ Engine processado com sucesso")
-            print(f"📤 Resposta: {ai_response[:100] if ai_response else 'None'}...")
-            print(f"🔄 Novo estado: step={new_state.get('current_step')}, status={new_state.get('status')}")
-            
-        except ValueError as e:
-            # Tratamento de erro caso engine retorne formato incorreto
-            print(f"❌ Erro ao desempacotar resposta do engine: {e}")
-            return {"status": "error", "detail": "Engine retornou formato inválido"}
-        except Exception as e:
-            print(f"❌ Erro ao processar engine: {e}")
-            return {"status": "error", "detail": str(e)}
-
-        # ====================================================================
-        # 🆕 ENVIA RESPOSTA AO CLIENTE (SE HOUVER)
-        # ====================================================================
-        if ai_response:
-            send_whatsapp_message(phone, ai_response)
-
-            # Log de saída
-            db.add(
-                MessageLog(
-                    phone=phone,
-                    message=ai_response,
-                    direction="out"
-                )
-            )
-            db.commit()
-            print(f"📨 Mensagem enviada para {phone}")
-        else:
-            print(f"⚠️ Engine não retornou mensagem (possível handoff para humano)")
-        
-        # ====================================================================
-        # 🆕 ATUALIZA SESSÃO NO BANCO COM NOVO ESTADO
-        # ====================================================================
-        if new_state:
-            try:
-                update_session(
-                    db=db,
-                    session=session,
-                    current_step=new_state.get("current_step"),
-                    conversation_data=new_state.get("conversation_data"),
-                    status=new_state.get("status", "active")
-                )
-                print(f"💾 Sessão persistida no banco: step={new_state.get('current_step')}")
-            except Exception as e:
-                print(f"⚠️ Erro ao atualizar sessão: {e}")
-                # Não retorna erro para não bloquear o fluxo
-        else:
-            print(f"⚠️ Engine não retornou novo estado")
-        
-        print("✅ Webhook processado com sucesso")
-        return {"status": "ok"}
+            queued = await run_blocking("db", enqueue_job, message_id, phone, data)
+        except Exception:
+            message_dedupe.discard(message_id)
+            raise
+
+        if not queued:
+            message_dedupe.record_shared_hit()
+            print("🔁 Mensagem duplicada ignorada (fila):", message_id)
+            return {"status": "duplicate"}
+
+        notify_workers()
+        return {"status": "queued"}
 
     except Exception as e:
         print("❌ Erro no webhook:", str(e))
         import traceback
         traceback.print_exc()
-        return {"status": "error", "detail": str(e)}
\ No newline at end of file
+        return {"status": "error", "detail": str(e)}
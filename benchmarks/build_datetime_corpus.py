@@ -0,0 +1,224 @@
+"""
+Gera benchmarks/data/datetime_corpus.jsonl: frases no estilo das clientes
+com a data/horário esperados, calculados a partir da data de referência.
+
+Gera também benchmarks/data/datetime_heldout.jsonl: frases escritas à mão
+no jeito real das mensagens (erros de digitação, sem acento, abreviações,
+período sem hora). Elas não saem dos modelos abaixo, então medem o extrator
+fora do que o gerador sabe produzir; o benchmark reporta as duas acurácias
+separadas.
+
+Uso:
+    python benchmarks/build_datetime_corpus.py [--size 3000] [--seed 21]
+
+Os arquivos gerados são versionados; rode de novo só ao mudar os modelos de
+frase ou a lista HELD_OUT.
+"""
+import argparse
+import json
+import os
+import random
+from datetime import date, timedelta
+
+REFERENCE_DATE = date(2026, 10, 16)  # sexta-feira
+
+OUTPUT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "datetime_corpus.jsonl")
+HELD_OUT_OUTPUT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "datetime_heldout.jsonl")
+
+# (frase, data esperada, horário esperado) em relação a REFERENCE_DATE.
+# Esperados escritos à mão: é o que uma atendente entenderia, não o que o
+# extrator devolve hoje. "de tarde"/"de manhã" sem hora não definem horário.
+HELD_OUT = [
+    ("dia 5 às 14h30", "2026-11-05", "14:30"),
+    ("amanhã de tarde", "2026-10-17", None),
+    ("amanha a tarde", "2026-10-17", None),
+    ("amanha cedo", "2026-10-17", None),
+    ("amnhã às 15h", "2026-10-17", "15:00"),
+    ("amanha 2 da tarde", "2026-10-17", "14:00"),
+    ("as 3 da tarde de amanhã", "2026-10-17", "15:00"),
+    ("as 2 da tard amanha", "2026-10-17", "14:00"),
+    ("Amanhã 14h30 pode?", "2026-10-17", "14:30"),
+    ("depois d amanha 11h", "2026-10-18", "11:00"),
+    ("hj as 17h", "2026-10-16", "17:00"),
+    ("hoje no fim da tarde, tipo 17:30", "2026-10-16", "17:30"),
+    ("sexta as 10", "2026-10-16", "10:00"),
+    ("sexta-feira, 9:30", "2026-10-16", "09:30"),
+    ("sabado 9h", "2026-10-17", "09:00"),
+    ("as 10 e meia de sabado", "2026-10-17", "10:30"),
+    ("segunda dps das 14h", "2026-10-19", "14:00"),
+    ("14hrs de segunda", "2026-10-19", "14:00"),
+    ("terca feira que vem 16h", "2026-10-20", "16:00"),
+    ("prox semana na terça 15h", "2026-10-20", "15:00"),
+    ("quarta q vem 14h", "2026-10-21", "14:00"),
+    ("qurta 10h", "2026-10-21", "10:00"),
+    ("quinta feira 16 horas", "2026-10-22", "16:00"),
+    ("meio dia de quinta", "2026-10-22", "12:00"),
+    ("qnd tiver vaga sexta que vem de manhã", "2026-10-23", None),
+    ("pode ser 20/10 as 15:30?", "2026-10-20", "15:30"),
+    ("dia 22 umas 10h", "2026-10-22", "10:00"),
+    ("15 hs dia 21", "2026-10-21", "15:00"),
+    ("dia 30/10 as 9", "2026-10-30", "09:00"),
+    ("tem horário 23/10 de manhã?", "2026-10-23", None),
+    ("dia 5 de novembro às 10h", "2026-11-05", "10:00"),
+    ("5 de novembro 10h", "2026-11-05", "10:00"),
+    ("dia 3/11 16h30", "2026-11-03", "16:30"),
+    ("oi queria p sexta q vem as 4 da tarde", "2026-10-23", "16:00"),
+    ("tem as 11 ?", None, "11:00"),
+    ("consigo 1330?", None, "13:30"),
+    ("pode ser as 9 e meia", None, "09:30"),
+    ("16h ta otimo", None, "16:00"),
+]
+
+PREFIXES = [
+    "", "quero ", "pode ser ", "consigo ", "tem vaga ", "queria marcar ",
+    "seria possível ", "prefiro ", "Oi, ", "então ", "pra mim fica bom ",
+]
+
+SUFFIXES = ["", "", "", " por favor", " pode ser?", "!", " 😊", " obrigada"]
+
+WEEKDAYS = [
+    ("segunda", 0), ("terça", 1), ("quarta", 2), ("quinta", 3),
+    ("sexta", 4), ("sábado", 5), ("domingo", 6),
+]
+
+def next_day_of_month(today: date, day: int):
+    try:
+        candidate = date(today.year, today.month, day)
+    except ValueError:
+        candidate = None
+    if candidate is None or candidate < today:
+        first_next = (today.replace(day=1) + timedelta(days=32)).replace(day=1)
+        try:
+            return date(first_next.year, first_next.month, day)
+        except ValueError:
+            return None
+    return candidate
+
+def next_day_month(today: date, day: int, month: int):
+    candidate = date(today.year, month, day)
+    return candidate if candidate >= today else date(today.year + 1, month, day)
+
+def random_date(rng: random.Random, today: date):
+    """Retorna (texto, data_esperada)."""
+    kind = rng.choice(["hoje", "amanha", "depois", "dia", "dm", "dmy", "weekday", "weekday_next"])
+
+    if kind == "hoje":
+        return rng.choice(["hoje", "Hoje", "hoje mesmo"]), today
+    if kind == "amanha":
+        return rng.choice(["amanhã", "amanha", "Amanhã"]), today + timedelta(days=1)
+    if kind == "depois":
+        return rng.choice(["depois de amanhã", "depois de amanha"]), today + timedelta(days=2)
+
+    if kind == "dia":
+        day = rng.randint(1, 28)
+        return f"dia {day}", next_day_of_month(today, day)
+
+    if kind in ("dm", "dmy"):
+        day, month = rng.randint(1, 28), rng.randint(1, 12)
+        day_txt = rng.choice([str(day), f"{day:02d}"])
+        month_txt = rng.choice([str(month), f"{month:02d}"])
+        prefix = rng.choice(["", "dia "])
+        if kind == "dm":
+            return f"{prefix}{day_txt}/{month_txt}", next_day_month(today, day, month)
+        year = rng.choice([today.year, today.year + 1])
+        year_txt = rng.choice([str(year), str(year)[2:]])
+        return f"{prefix}{day_txt}/{month_txt}/{year_txt}", date(year, month, day)
+
+    name, weekday = rng.choice(WEEKDAYS)
+    ahead = (weekday - today.weekday()) % 7
+    if kind == "weekday_next":
+        if ahead == 0:
+            ahead = 7
+        form = rng.choice(["{d} que vem", "próxima {d}", "proxima {d}", "{d}-feira que vem"])
+        if name in ("sábado", "domingo"):
+            form = form.replace("próxima", "próximo").replace("proxima", "proximo").replace("-feira", "")
+    else:
+        form = rng.choice(["{d}", "{d}-feira", "na {d}"])
+        if name in ("sábado", "domingo"):
+            form = form.replace("-feira", "").replace("na ", "no ")
+    return form.format(d=name), today + timedelta(days=ahead)
+
+def random_time(rng: random.Random):
+    """Retorna (texto, "HH:MM" esperado)."""
+    kind = rng.choice(["h", "hmm", "colon", "as", "horas", "tarde", "manha", "meia", "noon"])
+    hour = rng.randint(9, 18)
+
+    if kind == "h":
+        return rng.choice([f"{hour}h", f"às {hour}h", f"as {hour}hs"]), f"{hour:02d}:00"
+    if kind == "hmm":
+        minutes = rng.choice([0, 15, 30, 45])
+        return f"{hour}h{minutes:02d}", f"{hour:02d}:{minutes:02d}"
+    if kind == "colon":
+        minutes = rng.choice([0, 30])
+        return rng.choice(["", "às "]) + f"{hour}:{minutes:02d}", f"{hour:02d}:{minutes:02d}"
+    if kind == "as":
+        return rng.choice([f"às {hour}", f"as {hour}"]), f"{hour:02d}:00"
+    if kind == "horas":
+        return f"{hour} horas", f"{hour:02d}:00"
+    if kind == "tarde":
+        hour = rng.randint(1, 6)
+        return rng.choice([f"{hour} da tarde", f"às {hour} da tarde", f"{hour}h da tarde"]), f"{hour + 12:02d}:00"
+    if kind == "manha":
+        hour = rng.randint(9, 11)
+        return rng.choice([f"{hour} da manhã", f"{hour} e meia da manhã"]), None
+    if kind == "meia":
+        return f"às {hour} e meia", f"{hour:02d}:30"
+    return rng.choice(["meio-dia", "meio dia", "ao meio-dia"]), "12:00"
+
+def build(size: int, seed: int):
+    rng = random.Random(seed)
+    today = REFERENCE_DATE
+    rows = []
+
+    while len(rows) < size:
+        shape = rng.choice(["date", "time", "date_time", "time_date"])
+        date_txt, expected_date = random_date(rng, today) if shape != "time" else ("", None)
+        time_txt, expected_time = random_time(rng) if shape != "date" else ("", None)
+
+        # "9 da manhã" / "9 e meia da manhã": esperado depende do texto
+        if time_txt.endswith("da manhã"):
+            hour = int(time_txt.split()[0])
+            expected_time = f"{hour:02d}:{30 if ' e meia' in time_txt else 0:02d}"
+
+        if shape == "date_time":
+            connector = rng.choice([" ", " às ", " as ", ", "])
+            connector = " " if time_txt.startswith(("às", "as", "ao")) else connector
+            body = f"{date_txt}{connector}{time_txt}"
+        elif shape == "time_date":
+            body = f"{time_txt} {date_txt}"
+        else:
+            body = date_txt or time_txt
+
+        phrase = f"{rng.choice(PREFIXES)}{body}{rng.choice(SUFFIXES)}"
+        rows.append({
+            "text": phrase,
+            "date": expected_date.isoformat() if expected_date else None,
+            "time": expected_time,
+        })
+
+    return rows
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--size", type=int, default=3000)
+    parser.add_argument("--seed", type=int, default=21)
+    args = parser.parse_args()
+
+    rows = build(args.size, args.seed)
+    os.makedirs(os.path.dirname(OUTPUT), exist_ok=True)
+    with open(OUTPUT, "w", encoding="utf-8") as f:
+        f.write(json.dumps({"reference_date": REFERENCE_DATE.isoformat()}) + "\n")
+        for row in rows:
+            f.write(json.dumps(row, ensure_ascii=False) + "\n")
+
+    print(f"{len(rows)} frases gravadas em {OUTPUT}")
+
+    with open(HELD_OUT_OUTPUT, "w", encoding="utf-8") as f:
+        f.write(json.dumps({"reference_date": REFERENCE_DATE.isoformat()}) + "\n")
+        for text, expected_date, expected_time in HELD_OUT:
+            f.write(json.dumps({"text": text, "date": expected_date, "time": expected_time}, ensure_ascii=False) + "\n")
+
+    print(f"{len(HELD_OUT)} frases (held-out) gravadas em {HELD_OUT_OUTPUT}")
+
+if __name__ == "__main__":
+    main()
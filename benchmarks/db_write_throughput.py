@@ -0,0 +1,137 @@
+"""
+Mede a vazão de escrita do SQLite com o engine antigo (journal padrão,
+sem PRAGMAs) e com o perfil de produção de backend/db/session.py
+(WAL, synchronous=NORMAL, busy_timeout, cache/mmap, QueuePool).
+
+Uso:
+    python benchmarks/db_write_throughput.py [--writers 8] [--readers 2] [--seconds 5]
+
+Cada escritor repete a transação de uma mensagem do webhook (upsert da
+sessão + log de entrada + outbox + log de saída, um commit); os leitores
+simulam o polling dos workers/senders. O banco é um arquivo temporário
+novo para cada perfil.
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from sqlalchemy import func, select
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import sessionmaker
+
+from backend.db.session import Base, create_db_engine
+from backend.db.models import ConversationSession, MessageLog, OutboundMessage
+
+def write_message(SessionMaker, phone: str, text: str):
+    db = SessionMaker()
+    try:
+        session = db.query(ConversationSession).filter(ConversationSession.phone == phone).first()
+        if session is None:
+            session = ConversationSession(phone=phone, current_step="initial", conversation_data="{}")
+            db.add(session)
+        session.current_step = "awaiting_service"
+        session.conversation_data = f'{{"last": "{text}"}}'
+
+        db.add(MessageLog(phone=phone, message=text, direction="in"))
+        db.add(OutboundMessage(phone=phone, message="resposta " + text))
+        db.add(MessageLog(phone=phone, message="resposta " + text, direction="out"))
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+def read_pending(SessionMaker):
+    db = SessionMaker()
+    try:
+        db.execute(
+            select(func.count()).select_from(OutboundMessage).where(OutboundMessage.status == "pending")
+        ).scalar()
+    finally:
+        db.close()
+
+def run_profile(tuned: bool, writers: int, readers: int, seconds: float) -> dict:
+    directory = tempfile.mkdtemp(prefix="bench_db_")
+    engine = create_db_engine(f"sqlite:///{os.path.join(directory, 'bench.db')}", tuned=tuned)
+    Base.metadata.create_all(bind=engine)
+    SessionMaker = sessionmaker(autoflush=False, expire_on_commit=False, bind=engine)
+
+    deadline = time.perf_counter() + seconds
+    latencies = []
+    counters = {"commits": 0, "locked": 0, "reads": 0}
+    lock = threading.Lock()
+
+    def writer(worker_id: int):
+        rng = random.Random(worker_id)
+        n = 0
+        while time.perf_counter() < deadline:
+            phone = f"55{worker_id}{rng.randrange(50):02d}"
+            started = time.perf_counter()
+            try:
+                write_message(SessionMaker, phone, f"msg {worker_id}-{n}")
+            except OperationalError:
+                with lock:
+                    counters["locked"] += 1
+                continue
+            elapsed = time.perf_counter() - started
+            with lock:
+                counters["commits"] += 1
+                latencies.append(elapsed)
+            n += 1
+
+    def reader():
+        while time.perf_counter() < deadline:
+            try:
+                read_pending(SessionMaker)
+            except OperationalError:
+                with lock:
+                    counters["locked"] += 1
+                continue
+            with lock:
+                counters["reads"] += 1
+            time.sleep(0.005)
+
+    threads = [threading.Thread(target=writer, args=(i,)) for i in range(writers)]
+    threads += [threading.Thread(target=reader) for _ in range(readers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    engine.dispose()
+
+    latencies.sort()
+    return {
+        "tx_per_s": counters["commits"] / seconds,
+        "p50_ms": statistics.median(latencies) * 1000 if latencies else 0,
+        "p95_ms": latencies[int(len(latencies) * 0.95)] * 1000 if latencies else 0,
+        "locked": counters["locked"],
+        "reads": counters["reads"],
+    }
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--writers", type=int, default=8)
+    parser.add_argument("--readers", type=int, default=2)
+    parser.add_argument("--seconds", type=float, default=5)
+    args = parser.parse_args()
+
+    print(f"{'perfil':>8} {'tx/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'locked':>7} {'leituras':>9}")
+    for name, tuned in (("padrão", False), ("tunado", True)):
+        result = run_profile(tuned, args.writers, args.readers, args.seconds)
+        print(
+            f"{name:>8} {result['tx_per_s']:>8.1f} {result['p50_ms']:>8.2f} "
+            f"{result['p95_ms']:>8.2f} {result['locked']:>7} {result['reads']:>9}"
+        )
+
+if __name__ == "__main__":
+    main()
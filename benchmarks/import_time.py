@@ -0,0 +1,49 @@
+"""
+Mede o tempo de import (cold start) do engine e compara com o orçamento.
+
+Uso:
+    python benchmarks/import_time.py [--runs 5] [--budget-ms 1500]
+
+Cada execução roda em um processo novo, como em um cold start no Render.
+Sai com código 1 se a mediana passar do orçamento.
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SNIPPET = (
+    "import time; t = time.perf_counter(); import {module}; "
+    "print((time.perf_counter() - t) * 1000)"
+)
+
+def measure(module: str, runs: int) -> list:
+    samples = []
+    for _ in range(runs):
+        env = dict(os.environ, PYTHONPATH=ROOT, PYTHONDONTWRITEBYTECODE="1")
+        out = subprocess.run(
+            [sys.executable, "-c", SNIPPET.format(module=module)],
+            cwd=ROOT, env=env, capture_output=True, text=True, check=True
+        ).stdout.strip().splitlines()
+        samples.append(float(out[-1]))
+    return samples
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--budget-ms", type=float, default=float(os.getenv("ENGINE_IMPORT_BUDGET_MS", "1500")))
+    args = parser.parse_args()
+
+    engine = measure("backend.ai.engine", args.runs)
+    print(f"backend.ai.engine        mediana={statistics.median(engine):8.1f} ms  (min {min(engine):.1f})")
+
+    median = statistics.median(engine)
+    status = "OK" if median <= args.budget_ms else "ACIMA DO ORÇAMENTO"
+    print(f"orçamento={args.budget_ms:.0f} ms → {status}")
+    sys.exit(0 if median <= args.budget_ms else 1)
+
+if __name__ == "__main__":
+    main()
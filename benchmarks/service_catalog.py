@@ -0,0 +1,114 @@
+"""
+Compara a busca de serviço do ServiceCatalog (índice invertido + trigramas)
+com a varredura linear anterior (substring do nome normalizado em cada
+serviço), em catálogos sintéticos de tamanhos crescentes.
+
+Uso:
+    python benchmarks/service_catalog.py [--sizes 24,1000,5000,20000] [--queries 2000]
+
+O catálogo real (data/price_list.json) é expandido com variações de nome
+(modificadores + palavras sintéticas), mantendo as categorias originais.
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from backend.ai.catalog import ServiceCatalog
+from backend.ai.text import normalize
+
+MODIFIERS = [
+    "Express", "Premium", "Completa", "Infantil", "Masculina", "Avulsa",
+    "Pacote", "Retoque", "Manutenção", "Noiva", "Detox", "Clássica",
+]
+SYLLABLES = ["ba", "ce", "di", "fo", "gu", "la", "me", "ni", "po", "ra", "se", "ti", "vo", "za"]
+
+def scaled_services(base: list, size: int, rng: random.Random) -> list:
+    services = list(base)
+    seen = {normalize(s["name"]) for s in services}
+
+    while len(services) < size:
+        source = rng.choice(base)
+        word = "".join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4))).capitalize()
+        name = f"{source['name']} {rng.choice(MODIFIERS)} {word}"
+        if normalize(name) in seen:
+            continue
+        seen.add(normalize(name))
+        services.append(dict(source, name=name))
+
+    return services[:size]
+
+def typo(word: str, rng: random.Random) -> str:
+    if len(word) < 5:
+        return word
+    i = rng.randrange(1, len(word) - 1)
+    return word[:i] + rng.choice("aeiou") + word[i + 1:]
+
+def build_queries(services: list, count: int, rng: random.Random) -> list:
+    queries = []
+    for _ in range(count):
+        service = rng.choice(services)
+        name = normalize(service["name"])
+        kind = rng.randrange(4)
+        if kind == 0:
+            queries.append(name)
+        elif kind == 1:
+            queries.append(f"quero agendar {name} por favor")
+        elif kind == 2:
+            queries.append(" ".join(typo(w, rng) for w in name.split()))
+        else:
+            queries.append(str(rng.randint(1, len(services))))
+    return queries
+
+def linear_detect(services: list, text: str):
+    """Implementação anterior de detect_service_by_number_or_name."""
+    if text.isdigit():
+        index = int(text) - 1
+        if 0 <= index < len(services):
+            return services[index]
+
+    for service in services:
+        if normalize(service["name"]) in text:
+            return service
+
+    return None
+
+def timed(func, queries: list) -> float:
+    started = time.perf_counter()
+    for query in queries:
+        func(query)
+    return (time.perf_counter() - started) / len(queries) * 1e6
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", default="24,1000,5000,20000")
+    parser.add_argument("--queries", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    base = ServiceCatalog.from_file().services
+
+    print(f"{'serviços':>9} {'build ms':>9} {'linear µs':>10} {'find µs':>9} {'fuzzy µs':>9}")
+
+    for size in (int(s) for s in args.sizes.split(",")):
+        rng = random.Random(args.seed)
+        services = scaled_services(base, size, rng)
+
+        started = time.perf_counter()
+        catalog = ServiceCatalog(services)
+        build_ms = (time.perf_counter() - started) * 1000
+
+        queries = build_queries(catalog.services, args.queries, rng)
+
+        linear = timed(lambda q: linear_detect(catalog.services, q), queries)
+        strict = timed(lambda q: catalog.find(q), queries)
+        fuzzy = timed(lambda q: catalog.find(q, fuzzy=True), queries)
+
+        print(f"{size:>9} {build_ms:>9.1f} {linear:>10.1f} {strict:>9.1f} {fuzzy:>9.1f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,23 @@
+import os
+import tempfile
+
+# Banco SQLite isolado para os testes (antes de importar o backend)
+_tmp_dir = tempfile.mkdtemp(prefix="olhar_tests_")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_tmp_dir, 'test.db')}"
+os.environ.setdefault("DB_ASYNC", "false")
+
+import pytest
+
+from backend.core.session_cache import session_cache
+from backend.db.init_db import init_db
+from backend.db.session import Base, engine
+
+@pytest.fixture(autouse=True)
+def clean_db():
+    init_db()
+    yield
+    # Sessões em cache apontariam para linhas que deixam de existir
+    session_cache.clear()
+    with engine.begin() as conn:
+        for table in reversed(Base.metadata.sorted_tables):
+            conn.execute(table.delete())
@@ -0,0 +1,87 @@
+import pytest
+
+from backend.integrations.availability import DayAvailability, slots_needed
+
+# 09:00 → linha 2, 09:30 → linha 3, ..., 18:30 → linha 21
+DAY = {f"{9 + i // 2:02d}:{(i % 2) * 30:02d}": 2 + i for i in range(20)}
+
+def _day(busy=(), slots=DAY):
+    busy_rows = {slots[hora] for hora in busy}
+    return DayAvailability(slots, lambda row_idx: row_idx not in busy_rows)
+
+@pytest.mark.parametrize("minutes, expected", [
+    (None, 1), (0, 1), (1, 1), (30, 1), (31, 2), (45, 2), (60, 2), (61, 3), (90, 3), (120, 4),
+])
+def test_slots_needed_rounds_up(minutes, expected):
+    assert slots_needed(minutes) == expected
+
+def test_empty_day_has_everything_free():
+    day = _day()
+
+    assert day.start_times(30) == list(DAY)
+    # 60 min: o último início possível é 18:00 (18:00 + 18:30)
+    assert day.start_times(60)[-1] == "18:00"
+    assert day.start_times(120)[-1] == "17:00"
+
+def test_fits_mask_needs_every_slot_free():
+    day = _day(busy=["10:30"])
+
+    # 60 min não cabe começando 10:00 (10:30 ocupado) nem 10:30
+    starts = day.start_times(60)
+    assert "09:30" in starts
+    assert "10:00" not in starts
+    assert "10:30" not in starts
+    assert "11:00" in starts
+
+    mask = day.fits_mask(60)
+    assert not (mask >> day.position_of("10:00")) & 1
+    assert (mask >> day.position_of("11:00")) & 1
+
+def test_service_does_not_run_past_the_end_of_the_day():
+    day = _day()
+
+    assert day.rows_for("18:30", 30) == [21]
+    assert day.rows_for("18:30", 60) is None
+    assert day.slot_rows("18:30", 60) is None
+    assert day.rows_for("18:00", 90) is None
+
+def test_rows_for_returns_rows_in_order():
+    day = _day()
+
+    assert day.rows_for("10:00", 90) == [4, 5, 6]
+
+def test_rows_for_rejects_unknown_or_off_grid_times():
+    day = _day()
+
+    assert day.rows_for("08:30", 30) is None
+    assert day.rows_for("10:15", 30) is None
+    assert day.rows_for("abc", 30) is None
+
+def test_slot_rows_ignores_occupancy():
+    day = _day(busy=["10:00"])
+
+    assert day.rows_for("10:00", 60) is None
+    assert day.slot_rows("10:00", 60) == [4, 5]
+
+def test_gap_in_the_sheet_breaks_the_sequence():
+    slots = dict(DAY)
+    del slots["11:00"]
+    day = _day(slots=slots)
+
+    assert day.rows_for("10:30", 60) is None
+    assert day.slot_rows("10:30", 60) is None
+    assert day.rows_for("11:30", 60) == [slots["11:30"], slots["12:00"]]
+
+def test_set_free_updates_the_bitmap():
+    day = _day()
+
+    day.set_free(4, False)  # 10:00
+    assert "10:00" not in day.start_times(30)
+    assert day.rows_for("09:30", 60) is None
+
+    day.set_free(4, True)
+    assert day.rows_for("09:30", 60) == [3, 4]
+
+    # Linha fora do dia: ignorada
+    day.set_free(999, False)
+    assert day.start_times(30) == list(DAY)
@@ -0,0 +1,156 @@
+import re
+
+import pytest
+
+from backend.core.slot_leases import acquire_slot_lease
+from backend.db.models import SlotLease
+from backend.db.session import SessionLocal
+from backend.integrations import sheets
+
+DATE = "21/10/2026"
+SERVICE = "Lash Lifting"  # 60 min = 2 slots
+PHONE = "5511999990000"
+
+class FakeAgenda:
+    """Aba Agenda em memória, com o subconjunto da API do gspread usado em sheets.py."""
+
+    def __init__(self):
+        self.rows = [["Data", "Hora", "Cliente", "Serviço", "Telefone", "Status"]]
+        for hour in range(9, 19):
+            for minute in (0, 30):
+                self.rows.append([DATE, f"{hour:02d}:{minute:02d}", "", "", "", ""])
+
+        self.writes = 0
+        self.after_write = None       # simula outra pessoa editando logo após a escrita
+        self.fail_write_after = None  # aplica N updates do lote e falha
+
+    def _range(self, rng):
+        match = re.fullmatch(r"([A-F])(\d*):([A-F])(\d*)", rng)
+        first = int(match[2]) - 1 if match[2] else 0
+        last = int(match[4]) if match[4] else len(self.rows)
+        return ord(match[1]) - 65, ord(match[3]) - 65, first, last
+
+    def get(self, rng):
+        c0, c1, first, last = self._range(rng)
+        return [list(row[c0:c1 + 1]) for row in self.rows[first:last]]
+
+    def batch_get(self, ranges):
+        return [self.get(rng) for rng in ranges]
+
+    def batch_update(self, updates):
+        self.writes += 1
+        for i, update in enumerate(updates):
+            if self.fail_write_after == i:
+                self.fail_write_after = None
+                raise ConnectionError("timeout")
+
+            c0, _, first, _ = self._range(update["range"])
+            for offset, value in enumerate(update["values"][0]):
+                self.rows[first][c0 + offset] = value
+
+        if self.after_write is not None:
+            hook, self.after_write = self.after_write, None
+            hook(self)
+
+    def _row(self, hora):
+        return next(row for row in self.rows if row[:2] == [DATE, hora])
+
+    def cells(self, hora):
+        return self._row(hora)[2:]
+
+    def set_cells(self, hora, values):
+        self._row(hora)[2:] = values
+
+@pytest.fixture
+def agenda(monkeypatch):
+    ws = FakeAgenda()
+    monkeypatch.setattr(sheets, "_sheet_call", lambda name, op: op(ws))
+    sheets.invalidate_agenda_cache()
+    yield ws
+    sheets.invalidate_agenda_cache()
+
+def _leases() -> int:
+    db = SessionLocal()
+    try:
+        return db.query(SlotLease).count()
+    finally:
+        db.close()
+
+def _book(hora="10:00"):
+    return sheets.book_appointment(PHONE, "Ana Souza", SERVICE, DATE, hora)
+
+def test_booking_writes_all_slots_and_releases_lease(agenda):
+    assert _book() == sheets.BOOKING_BOOKED
+
+    assert agenda.cells("10:00") == ["Ana Souza", SERVICE, PHONE, "Agendado"]
+    assert agenda.cells("10:30") == ["RESERVADO (Ana Souza)", SERVICE, PHONE, "Agendado"]
+    assert _leases() == 0
+
+    # Snapshot atualizado com a própria escrita: o slot some das opções
+    assert "10:00" not in sheets.get_agenda_snapshot().day(DATE).start_times(60)
+
+def test_slot_leased_by_another_chat_is_a_conflict(agenda):
+    assert acquire_slot_lease(DATE, ["10:30"], "5511888880000")
+
+    assert _book() == sheets.BOOKING_CONFLICT
+    assert agenda.writes == 0
+    # A reserva alheia continua; a nossa não ficou para trás
+    assert _leases() == 1
+
+def test_slot_taken_after_snapshot_is_a_conflict(agenda):
+    sheets.get_agenda_snapshot().day(DATE)
+    agenda.set_cells("10:30", ["Bia", "Sobrancelha", "5511777770000", "Agendado"])
+
+    assert _book() == sheets.BOOKING_CONFLICT
+    assert agenda.writes == 0
+    assert agenda.cells("10:00") == ["", "", "", ""]
+    assert _leases() == 0
+
+def test_overwritten_during_booking_rolls_back_only_our_rows(agenda):
+    def manual_edit(ws):
+        ws.set_cells("10:30", ["Bia", "Sobrancelha", "5511777770000", "Agendado"])
+
+    agenda.after_write = manual_edit
+
+    assert _book() == sheets.BOOKING_CONFLICT
+    assert agenda.cells("10:00") == ["", "", "", ""]
+    assert agenda.cells("10:30") == ["Bia", "Sobrancelha", "5511777770000", "Agendado"]
+    assert _leases() == 0
+
+def test_failed_write_is_an_error_and_is_rolled_back(agenda):
+    # Primeira linha gravada, a segunda não: falha de I/O no meio do lote
+    agenda.fail_write_after = 1
+
+    assert _book() == sheets.BOOKING_ERROR
+    assert agenda.cells("10:00") == ["", "", "", ""]
+    assert agenda.cells("10:30") == ["", "", "", ""]
+    assert _leases() == 0
+
+def test_retry_after_successful_write_is_booked(agenda):
+    # Primeira execução grava a planilha; o commit no banco falha e o job é refeito
+    assert _book() == sheets.BOOKING_BOOKED
+    writes = agenda.writes
+
+    assert _book() == sheets.BOOKING_BOOKED
+    assert agenda.writes == writes
+
+    # Mesmo com o snapshot descartado (outro processo refaz o job)
+    sheets.invalidate_agenda_cache()
+    assert _book() == sheets.BOOKING_BOOKED
+    assert agenda.writes == writes
+    assert _leases() == 0
+
+def test_same_slot_booked_by_another_phone_is_still_a_conflict(agenda):
+    assert sheets.book_appointment("5511777770000", "Bia", SERVICE, DATE, "10:00") == sheets.BOOKING_BOOKED
+
+    assert _book() == sheets.BOOKING_CONFLICT
+    assert agenda.cells("10:00")[2] == "5511777770000"
+
+def test_stale_snapshot_with_own_booking_is_booked(agenda):
+    sheets.get_agenda_snapshot().day(DATE)
+    agenda.set_cells("10:00", ["Ana Souza", SERVICE, PHONE, "Agendado"])
+    agenda.set_cells("10:30", ["RESERVADO (Ana Souza)", SERVICE, PHONE, "Agendado"])
+
+    assert _book() == sheets.BOOKING_BOOKED
+    assert agenda.writes == 0
+    assert _leases() == 0
@@ -0,0 +1,84 @@
+from datetime import date
+
+import pytest
+
+from backend.ai import datetime_parser
+from backend.ai.datetime_parser import parse_date_and_time
+from backend.ai.text import normalize
+
+TODAY = date(2026, 10, 16)  # sexta-feira
+
+def _parse(text: str):
+    found_date, found_time = parse_date_and_time(normalize(text), TODAY)
+    return (found_date.isoformat() if found_date else None), found_time
+
+@pytest.mark.parametrize("text, expected", [
+    ("hoje", "2026-10-16"),
+    ("amanhã", "2026-10-17"),
+    ("amanha", "2026-10-17"),
+    ("depois de amanhã", "2026-10-18"),
+    ("dia 20", "2026-10-20"),
+    ("dia 5", "2026-11-05"),           # dia já passou: próximo mês
+    ("dia 20/11", "2026-11-20"),
+    ("20/11", "2026-11-20"),
+    ("05/01", "2027-01-05"),           # data já passou: próximo ano
+    ("20/11/27", "2027-11-20"),
+    ("sexta", "2026-10-16"),
+    ("próxima sexta", "2026-10-23"),
+    ("terça-feira que vem", "2026-10-20"),
+])
+def test_dates(text, expected):
+    assert _parse(text) == (expected, None)
+
+@pytest.mark.parametrize("text, expected", [
+    ("15h", "15:00"),
+    ("às 9h", "09:00"),
+    ("14h30", "14:30"),
+    ("15:30", "15:30"),
+    ("16 horas", "16:00"),
+    ("3 da tarde", "15:00"),
+    ("às 4 da tarde", "16:00"),
+    ("9 e meia da manhã", "09:30"),
+    ("as 10", "10:00"),
+    ("meio-dia", "12:00"),
+])
+def test_times(text, expected):
+    assert _parse(text) == (None, expected)
+
+@pytest.mark.parametrize("text", ["dia 31/02", "31/04", "dia 32", "25h", "14:75", "quero marcar"])
+def test_invalid_or_missing_values_are_none(text):
+    assert _parse(text) == (None, None)
+
+@pytest.mark.parametrize("text, expected", [
+    # Frases reais (benchmarks/data/datetime_heldout.jsonl) que o extrator
+    # anterior errava: período, "e meia", dia da semana, dia que já passou
+    ("dia 5 às 14h30", ("2026-11-05", "14:30")),
+    ("as 3 da tarde de amanhã", ("2026-10-17", "15:00")),
+    ("amanha 2 da tarde", ("2026-10-17", "14:00")),
+    ("as 10 e meia de sabado", ("2026-10-17", "10:30")),
+    ("terca feira que vem 16h", ("2026-10-20", "16:00")),
+    ("meio dia de quinta", ("2026-10-22", "12:00")),
+    ("sexta-feira, 9:30", ("2026-10-16", "09:30")),
+    ("pode ser as 9 e meia", (None, "09:30")),
+])
+def test_held_out_phrases(text, expected):
+    assert _parse(text) == expected
+
+def test_first_date_and_first_time_win():
+    assert _parse("amanhã às 15h ou sexta 10h") == ("2026-10-17", "15:00")
+
+def test_token_cache_keys_dates_by_reference_day():
+    assert _parse("amanhã") == ("2026-10-17", None)
+
+    next_day, _ = parse_date_and_time("amanha", date(2026, 10, 20))
+    assert next_day == date(2026, 10, 21)
+
+def test_token_cache_is_bounded(monkeypatch):
+    monkeypatch.setattr(datetime_parser, "_TOKEN_CACHE_MAX", 3)
+    datetime_parser._token_cache.clear()
+
+    for hour in range(9, 19):
+        _parse(f"{hour}h")
+
+    assert len(datetime_parser._token_cache) <= 3
+    assert _parse("18h") == (None, "18:00")
@@ -0,0 +1,64 @@
+import pytest
+
+from backend.core import dedupe
+from backend.core.dedupe import DedupeStore
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(dedupe.time, "monotonic", lambda: now[0])
+    return now
+
+def test_duplicate_within_window_is_a_hit(clock):
+    store = DedupeStore(capacity=10, ttl_seconds=60)
+
+    assert store.seen_or_add("a") is False
+    clock[0] += 59
+    assert store.seen_or_add("a") is True
+    assert (store.hits, store.misses) == (1, 1)
+
+def test_expired_id_is_accepted_again(clock):
+    store = DedupeStore(capacity=10, ttl_seconds=60)
+    store.seen_or_add("a")
+    store.seen_or_add("b")
+
+    clock[0] += 61
+    store.seen_or_add("c")
+    # "a" e "b" saíram pela janela, não por capacidade
+    assert len(store) == 1
+    assert store.evictions == 0
+
+    assert store.seen_or_add("a") is False
+
+def test_expiry_stops_at_first_recent_id(clock):
+    store = DedupeStore(capacity=10, ttl_seconds=60)
+    store.seen_or_add("a")
+    clock[0] += 30
+    store.seen_or_add("b")
+
+    clock[0] += 31
+    assert store.seen_or_add("b") is True
+    assert len(store) == 1
+
+def test_capacity_evicts_oldest_first(clock):
+    store = DedupeStore(capacity=3, ttl_seconds=60)
+    for message_id in ("a", "b", "c"):
+        store.seen_or_add(message_id)
+
+    # Hit não renova a posição: a ordem é a de inserção
+    assert store.seen_or_add("a") is True
+    store.seen_or_add("d")
+
+    assert store.evictions == 1
+    assert len(store) == 3
+    assert store.seen_or_add("b") is True
+    assert store.seen_or_add("a") is False
+
+def test_discard_lets_redelivery_through(clock):
+    store = DedupeStore(capacity=10, ttl_seconds=60)
+    store.seen_or_add("a")
+    store.discard("a")
+    store.discard("nunca-visto")
+
+    assert store.seen_or_add("a") is False
+    assert store.stats()["misses"] == 2
@@ -0,0 +1,41 @@
+import pytest
+
+from backend.ai import engine
+from backend.ai.catalog import get_catalog
+
+PHONE = "5511999990000"
+
+def _confirmation_session() -> dict:
+    service = get_catalog().find("lash lifting")
+    return {
+        "service": service,
+        "date": "2026-10-21",
+        "time": "10:00",
+        "name": "Ana Souza",
+        "last_activity": engine.get_brazil_time().isoformat(),
+    }
+
+@pytest.mark.parametrize("message", ["opa", "Opa!", "ei", "hey", "e aí", "alô"])
+def test_casual_greeting_keeps_booking_in_progress(message):
+    reply, update = engine.generate_ai_response(
+        phone=PHONE,
+        message=message,
+        current_step="awaiting_confirmation",
+        session_data=_confirmation_session(),
+    )
+
+    assert update["current_step"] == "awaiting_confirmation"
+    assert update["conversation_data"]["time"] == "10:00"
+    assert "confirmar" in reply
+
+@pytest.mark.parametrize("message", ["oi", "Olá", "bom dia", "Boa noite"])
+def test_reset_greeting_starts_new_conversation(message):
+    reply, update = engine.generate_ai_response(
+        phone=PHONE,
+        message=message,
+        current_step="awaiting_confirmation",
+        session_data=_confirmation_session(),
+    )
+
+    assert update["current_step"] == "awaiting_welcome_response"
+    assert "time" not in update["conversation_data"]
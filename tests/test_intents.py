@@ -0,0 +1,51 @@
+import random
+
+import pytest
+
+from backend.ai.intents import INTENT_TABLE, match_intents
+from backend.ai.text import normalize
+
+def naive_intents(text: str) -> tuple:
+    """Comportamento anterior: um any(palavra in text) por intenção."""
+    found = [
+        (priority, intent)
+        for intent, priority, keywords in INTENT_TABLE
+        if any(normalize(keyword) in text for keyword in keywords)
+    ]
+    return tuple(intent for _, intent in sorted(found))
+
+@pytest.mark.parametrize("message", [
+    "sim",
+    "Não quero, obrigada",
+    "quero cancelar",
+    "pode ser, quero confirmar",
+    "qual o endereço e o telefone?",
+    "quero falar com a dona",
+    "tem quais serviços?",
+    "nao preciso agora, depois eu vejo",
+    "manda o insta pra eu ver as fotos",
+    "tchau, até logo",
+    "",
+])
+def test_matches_previous_any_behavior(message):
+    text = normalize(message)
+    assert match_intents(text) == naive_intents(text)
+
+def test_matches_previous_any_behavior_on_random_text():
+    # Frases montadas com pedaços das palavras-chave, para exercitar
+    # sobreposições ("nao quero" x "nao" x "quero", "servico" x "quais servico")
+    keywords = [normalize(keyword) for _, _, words in INTENT_TABLE for keyword in words]
+    fillers = ["a", "o", "eu", "tudo", "bem", "x", " ", "?", "agora", "por favor"]
+    rng = random.Random(11)
+
+    for _ in range(3000):
+        parts = rng.choices(keywords + fillers, k=rng.randint(1, 6))
+        text = rng.choice(["", " "]).join(parts)
+        assert match_intents(text) == naive_intents(text), text
+
+def test_results_are_ordered_by_priority():
+    intents = match_intents(normalize("sim, quero falar com um atendente"))
+
+    priority = {intent: value for intent, value, _ in INTENT_TABLE}
+    assert intents[0] == "human_handoff"
+    assert [priority[intent] for intent in intents] == sorted(priority[intent] for intent in intents)
@@ -0,0 +1,177 @@
+import asyncio
+import os
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import update
+
+from backend.core import jobs
+from backend.db.models import OutboundMessage, WebhookJob
+from backend.routes import webhook
+from backend.db.session import SessionLocal
+
+def _enqueue(message_id: str, phone: str):
+    assert jobs.enqueue_job(message_id, phone, {"text": message_id})
+
+def _set_job(message_id: str, **values):
+    db = SessionLocal()
+    try:
+        db.execute(update(WebhookJob).where(WebhookJob.message_id == message_id).values(**values))
+        db.commit()
+    finally:
+        db.close()
+
+def _status(message_id: str) -> str:
+    db = SessionLocal()
+    try:
+        return db.query(WebhookJob).filter(WebhookJob.message_id == message_id).one().status
+    finally:
+        db.close()
+
+def test_enqueue_rejects_duplicate_message_id():
+    assert jobs.enqueue_job("m1", "5511", {})
+    assert not jobs.enqueue_job("m1", "5511", {})
+
+def test_claim_keeps_order_per_phone():
+    _enqueue("a1", "5511")
+    _enqueue("a2", "5511")
+    _enqueue("b1", "5522")
+
+    first = jobs.claim_next_job()
+    second = jobs.claim_next_job()
+
+    assert first["message_id"] == "a1"
+    # a2 fica bloqueado enquanto a1 está em processamento
+    assert second["message_id"] == "b1"
+    assert jobs.claim_next_job() is None
+
+    jobs.complete_job(first["id"])
+    assert jobs.claim_next_job()["message_id"] == "a2"
+
+def test_failed_job_blocks_later_jobs_of_same_phone_until_retry():
+    _enqueue("a1", "5511")
+    _enqueue("a2", "5511")
+
+    job = jobs.claim_next_job()
+    jobs.fail_job(job["id"], job["attempts"], "erro")
+
+    # a1 voltou para "pending" com backoff: a2 continua atrás dele
+    assert _status("a1") == "pending"
+    assert jobs.claim_next_job() is None
+
+    _set_job("a1", next_attempt_at=datetime.now() - timedelta(seconds=1))
+    assert jobs.claim_next_job()["message_id"] == "a1"
+
+def test_complete_job_ignores_job_claimed_by_other_process():
+    _enqueue("a1", "5511")
+    job = jobs.claim_next_job()
+    _set_job("a1", claimed_by="outro-host:1:abc")
+
+    jobs.complete_job(job["id"])
+    assert _status("a1") == "processing"
+
+def test_abandoned_job_is_requeued_after_lease():
+    _enqueue("a1", "5511")
+    job = jobs.claim_next_job()
+
+    assert jobs.requeue_abandoned_jobs() == 0
+    assert jobs.heartbeat_job(job["id"])
+
+    _set_job("a1", updated_at=datetime.now() - timedelta(seconds=jobs.JOB_LEASE_SECONDS + 1))
+    assert jobs.requeue_abandoned_jobs() == 1
+    assert _status("a1") == "pending"
+    assert not jobs.heartbeat_job(job["id"])
+
+def test_startup_requeues_jobs_of_dead_process_only():
+    _enqueue("dead", "5511")
+    _enqueue("alive", "5522")
+    _enqueue("remote", "5533")
+    for _ in range(3):
+        jobs.claim_next_job()
+
+    _set_job("dead", claimed_by=f"{jobs.HOSTNAME}:999999999:dead")
+    _set_job("alive", claimed_by=f"{jobs.HOSTNAME}:{os.getppid()}:irmao")
+    _set_job("remote", claimed_by="outro-host:1:abc")
+
+    assert jobs.requeue_orphaned_jobs() == 1
+    assert _status("dead") == "pending"
+    assert _status("alive") == "processing"
+    assert _status("remote") == "processing"
+
+def _fake_pipeline(monkeypatch):
+    monkeypatch.setattr(webhook, "is_robot_muted", lambda phone: False)
+    monkeypatch.setattr(
+        webhook,
+        "generate_ai_response",
+        lambda **kwargs: (
+            "resposta",
+            {"current_step": "awaiting_service", "conversation_data": {}, "status": "active"}
+        )
+    )
+
+def _outbox_count() -> int:
+    db = SessionLocal()
+    try:
+        return db.query(OutboundMessage).count()
+    finally:
+        db.close()
+
+def test_job_is_done_in_the_same_commit_as_the_reply(monkeypatch):
+    _fake_pipeline(monkeypatch)
+    _enqueue("a1", "5511")
+    job = jobs.claim_next_job()
+
+    asyncio.run(webhook.process_webhook_job(job))
+
+    assert _status("a1") == "done"
+    assert _outbox_count() == 1
+
+def test_lost_lease_rolls_back_the_reply(monkeypatch):
+    _fake_pipeline(monkeypatch)
+    _enqueue("a1", "5511")
+    job = jobs.claim_next_job()
+    _set_job("a1", claimed_by="outro-host:1:abc")
+
+    with pytest.raises(webhook.JobLeaseLostError):
+        asyncio.run(webhook.process_webhook_job(job))
+
+    assert _status("a1") == "processing"
+    assert _outbox_count() == 0
+
+def test_worker_survives_bookkeeping_errors(monkeypatch):
+    claimed = [
+        {"id": 2, "phone": "5522", "attempts": 1, "message_id": "b1", "payload": {}},
+        {"id": 1, "phone": "5511", "attempts": 1, "message_id": "a1", "payload": {}},
+    ]
+    handled = []
+
+    def locked(*args):
+        raise RuntimeError("database is locked")
+
+    async def handler(job):
+        handled.append(job["id"])
+        raise ValueError("falha no handler")
+
+    monkeypatch.setattr(jobs, "claim_next_job", lambda: claimed.pop() if claimed else None)
+    monkeypatch.setattr(jobs, "fail_job", locked)
+    monkeypatch.setattr(jobs, "complete_job", locked)
+    monkeypatch.setattr(jobs.settings, "JOB_POLL_INTERVAL", 0.01)
+    monkeypatch.setattr(jobs, "_wakeup", None)
+    monkeypatch.setattr(jobs, "_stopping", None)
+
+    async def run():
+        jobs._wakeup = asyncio.Event()
+        jobs._stopping = asyncio.Event()
+        task = asyncio.create_task(jobs._worker_loop(0, handler))
+        for _ in range(100):
+            if len(handled) == 2:
+                break
+            await asyncio.sleep(0.01)
+        jobs._stopping.set()
+        jobs._wakeup.set()
+        await asyncio.wait_for(task, timeout=1)
+
+    asyncio.run(run())
+
+    # O fail_job do primeiro job falhou e o worker ainda pegou o segundo
+    assert handled == [1, 2]
@@ -0,0 +1,86 @@
+import asyncio
+
+import pytest
+
+from backend.core import message_log
+from backend.core.config import settings
+from backend.db.models import MessageLog
+from backend.db.session import SessionLocal
+
+@pytest.fixture(autouse=True)
+def empty_buffer():
+    message_log._buffer.clear()
+    for key in message_log.message_log_stats:
+        message_log.message_log_stats[key] = 0
+    yield
+    message_log._buffer.clear()
+
+def _logged() -> list:
+    db = SessionLocal()
+    try:
+        return [row.message for row in db.query(MessageLog).order_by(MessageLog.id)]
+    finally:
+        db.close()
+
+def _reject(bad: str, monkeypatch):
+    """Faz o banco recusar qualquer lote que contenha a mensagem `bad`."""
+    insert_rows = message_log._insert_rows
+
+    def insert_or_fail(rows):
+        if any(row["message"] == bad for row in rows):
+            raise ValueError(f"linha recusada: {bad}")
+        insert_rows(rows)
+
+    monkeypatch.setattr(message_log, "_insert_rows", insert_or_fail)
+
+def test_flush_writes_buffered_rows_in_order():
+    for text in ("oi", "quero agendar", "sobrancelha"):
+        message_log.record_message("5511", text, "in")
+
+    assert asyncio.run(message_log.flush_message_logs()) == 3
+    assert _logged() == ["oi", "quero agendar", "sobrancelha"]
+    assert message_log.get_message_log_stats()["buffered"] == 0
+
+def test_rejected_row_does_not_hold_back_the_batch(monkeypatch):
+    _reject("ruim", monkeypatch)
+    for text in ("a", "ruim", "b"):
+        message_log.record_message("5511", text, "in")
+
+    assert asyncio.run(message_log.flush_message_logs()) == 2
+    assert _logged() == ["a", "b"]
+
+    stats = message_log.get_message_log_stats()
+    assert stats["flush_errors"] == 1
+    assert stats["buffered"] == 1
+    assert message_log._buffer[0]["attempts"] == 1
+
+def test_row_is_dropped_after_max_attempts(monkeypatch):
+    _reject("ruim", monkeypatch)
+    message_log.record_message("5511", "ruim", "in")
+
+    for _ in range(settings.MESSAGE_LOG_MAX_ATTEMPTS):
+        asyncio.run(message_log.flush_message_logs())
+
+    stats = message_log.get_message_log_stats()
+    assert stats["failed_dropped"] == 1
+    assert stats["buffered"] == 0
+    assert _logged() == []
+
+def test_database_outage_does_not_count_attempts(monkeypatch):
+    def unavailable(rows):
+        raise ConnectionError("banco fora do ar")
+
+    async def down():
+        return False
+
+    monkeypatch.setattr(message_log, "_insert_rows", unavailable)
+    monkeypatch.setattr(message_log, "_db_available", down)
+    message_log.record_message("5511", "oi", "in")
+
+    for _ in range(settings.MESSAGE_LOG_MAX_ATTEMPTS + 1):
+        asyncio.run(message_log.flush_message_logs())
+
+    stats = message_log.get_message_log_stats()
+    assert stats["failed_dropped"] == 0
+    assert stats["buffered"] == 1
+    assert message_log._buffer[0]["attempts"] == 0
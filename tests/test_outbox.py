@@ -0,0 +1,109 @@
+import asyncio
+from datetime import datetime
+
+import pytest
+
+from backend.core import outbox
+from backend.db.models import OutboundMessage
+from backend.db.session import SessionLocal
+
+class FakeResponse:
+    def __init__(self, status_code: int, body: dict = None):
+        self.status_code = status_code
+        self.text = "erro"
+        self._body = body or {}
+
+    def json(self):
+        return self._body
+
+def _queue_and_claim(phone: str = "5511") -> dict:
+    outbox.enqueue_outbound_message(phone, "olá")
+    return outbox.claim_next_batch()
+
+def _message() -> OutboundMessage:
+    db = SessionLocal()
+    try:
+        return db.query(OutboundMessage).one()
+    finally:
+        db.close()
+
+def _deliver(monkeypatch, response):
+    async def fake_post(phone, message):
+        if isinstance(response, Exception):
+            raise response
+        return response
+
+    monkeypatch.setattr(outbox, "post_whatsapp_text_async", fake_post)
+    outbox.phone_buckets.clear()
+    asyncio.run(outbox._deliver(_queue_and_claim()))
+
+@pytest.mark.parametrize("status_code", [400, 401, 403, 404])
+def test_permanent_client_errors_fail_immediately(monkeypatch, status_code):
+    _deliver(monkeypatch, FakeResponse(status_code))
+
+    message = _message()
+    assert message.status == "failed"
+    assert message.attempts == 1
+
+@pytest.mark.parametrize("status_code", [408, 429, 500, 503])
+def test_transient_errors_are_retried(monkeypatch, status_code):
+    _deliver(monkeypatch, FakeResponse(status_code))
+
+    message = _message()
+    assert message.status == "pending"
+    assert message.next_attempt_at > datetime.now()
+
+def test_network_errors_are_retried(monkeypatch):
+    _deliver(monkeypatch, ConnectionError("timeout"))
+
+    assert _message().status == "pending"
+
+def test_success_marks_sent(monkeypatch):
+    _deliver(monkeypatch, FakeResponse(200, {"messageId": "abc"}))
+
+    message = _message()
+    assert message.status == "sent"
+    assert message.zapi_message_id == "abc"
+
+def test_non_dict_json_body_still_marks_sent(monkeypatch):
+    _deliver(monkeypatch, FakeResponse(200, ["ok"]))
+
+    message = _message()
+    assert message.status == "sent"
+    assert message.zapi_message_id is None
+
+def test_sender_survives_delivery_errors(monkeypatch):
+    batches = [{"phone": "5511", "ids": [1], "attempts": 0, "message": "olá"}] * 2
+    delivered = []
+
+    def claim():
+        return batches.pop() if batches else None
+
+    async def flaky_deliver(batch):
+        delivered.append(batch)
+        if len(delivered) == 1:
+            raise RuntimeError("database is locked")
+
+    monkeypatch.setattr(outbox, "claim_next_batch", claim)
+    monkeypatch.setattr(outbox, "_deliver", flaky_deliver)
+    monkeypatch.setattr(outbox.settings, "JOB_POLL_INTERVAL", 0.01)
+    # Eventos do loop do teste; restaurados pelo monkeypatch no fim
+    monkeypatch.setattr(outbox, "_wakeup", None)
+    monkeypatch.setattr(outbox, "_stopping", None)
+
+    async def run():
+        outbox._wakeup = asyncio.Event()
+        outbox._stopping = asyncio.Event()
+        task = asyncio.create_task(outbox._sender_loop(0))
+        for _ in range(100):
+            if len(delivered) == 2:
+                break
+            await asyncio.sleep(0.01)
+        outbox._stopping.set()
+        outbox._wakeup.set()
+        await asyncio.wait_for(task, timeout=1)
+
+    asyncio.run(run())
+
+    assert len(delivered) == 2
+    assert outbox.outbox_stats["sender_errors"] >= 1
@@ -0,0 +1,145 @@
+import json
+import os
+
+import pytest
+
+from backend.ai import menu
+from backend.ai.catalog import CatalogProvider, ServiceCatalog, tokenize
+from backend.ai.text import normalize
+
+@pytest.fixture(scope="module")
+def catalog():
+    return ServiceCatalog.from_file()
+
+def _names(ranked) -> list:
+    return [service["name"] for _, service in ranked]
+
+# --------------------------------------------------
+# BUSCA
+# --------------------------------------------------
+
+def test_number_and_exact_name(catalog):
+    assert catalog.find("17")["name"] == "Alongamento em Fibra de Vidro"
+    assert catalog.find("99") is None
+    assert catalog.find("virilha cavada")["name"] == "Virilha Cavada"
+    assert catalog.number_of(catalog.find("lash lifting")) == 10
+
+def test_name_inside_message(catalog):
+    assert catalog.find("quero fazer lash lifting amanha")["name"] == "Lash Lifting"
+    # Plural simples
+    assert catalog.find("depilar as axilas")["name"] == "Axila"
+
+def test_most_specific_name_wins(catalog):
+    # "mao comum" também está inteiro na mensagem, mas tem menos tokens
+    assert _names(catalog.match("quero pe e mao comum hoje"))[:2] == ["Pé e Mão Comum", "Mão Comum"]
+
+def test_anchor_index_finds_every_name_in_message(catalog):
+    # O índice por token mais raro deve achar os mesmos nomes que a varredura completa
+    for service in catalog.services:
+        text = normalize(f"quero {service['name']} e buço por favor")
+        present = set(tokenize(text))
+        expected = {
+            other["name"] for other in catalog.services
+            if set(tokenize(normalize(other["name"]))) <= present
+        }
+        assert set(_names(catalog.match(text, fuzzy=False, limit=50))) >= expected
+
+def test_strict_find_ignores_partial_names(catalog):
+    assert catalog.find("virilha") is None
+    assert catalog.find("sobrancelia") is None
+
+def test_fuzzy_accepts_typos(catalog):
+    ranked = catalog.match("sobrancelia")
+    assert _names(ranked) == ["Sobrancelha"]
+    assert 0.5 <= ranked[0][0] < 1.0
+    assert catalog.find("sobrancelia", fuzzy=True)["name"] == "Sobrancelha"
+
+def test_fuzzy_ambiguous_partial_returns_options(catalog):
+    assert catalog.find("virilha", fuzzy=True) is None
+    assert _names(catalog.match("virilha")) == ["Virilha Completa", "Virilha Cavada"]
+
+def test_short_tokens_are_not_fuzzy(catalog):
+    # Abaixo de FUZZY_MIN_LENGTH um typo não vira candidato
+    assert catalog.match("bxo") == []
+
+# --------------------------------------------------
+# RECARGA
+# --------------------------------------------------
+
+def _write_services(path, names):
+    services = [{"name": name, "category": "Depilação", "price": 10.0} for name in names]
+    path.write_text(json.dumps({"services": services}), encoding="utf-8")
+
+def _touch(path, step: int):
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + step))
+
+def test_reload_swaps_catalog_and_notifies_listeners(tmp_path):
+    path = tmp_path / "price_list.json"
+    _write_services(path, ["Sobrancelha"])
+    provider = CatalogProvider(file_path=str(path), check_interval=0)
+
+    seen = []
+    provider.add_reload_listener(lambda catalog: seen.append(catalog.version))
+
+    first = provider.get()
+    assert first.version == 1 and len(first) == 1
+
+    # Sem mudança em disco: mesmo objeto, listener não é chamado de novo
+    assert provider.get() is first
+
+    _write_services(path, ["Sobrancelha", "Buço"])
+    _touch(path, 1_000_000)
+    second = provider.get()
+
+    assert second.version == 2
+    assert second.find("buco")["name"] == "Buço"
+    assert first.find("buco") is None
+    assert seen == [1, 2]
+
+def test_failed_reload_keeps_last_catalog(tmp_path):
+    path = tmp_path / "price_list.json"
+    _write_services(path, ["Sobrancelha"])
+    provider = CatalogProvider(file_path=str(path), check_interval=0)
+    first = provider.get()
+
+    path.write_text("{ inválido", encoding="utf-8")
+    _touch(path, 1_000_000)
+
+    assert provider.get() is first
+    assert provider.stats()["reload_errors"] == 1
+
+def test_listener_error_does_not_block_others(tmp_path):
+    path = tmp_path / "price_list.json"
+    _write_services(path, ["Sobrancelha"])
+    provider = CatalogProvider(file_path=str(path), check_interval=0)
+
+    def broken(catalog):
+        raise RuntimeError("cache quebrado")
+
+    seen = []
+    provider.add_reload_listener(broken)
+    provider.add_reload_listener(lambda catalog: seen.append(catalog.version))
+
+    assert provider.get().version == 1
+    assert seen == [1]
+
+def test_services_menu_is_invalidated_on_reload(monkeypatch, tmp_path):
+    path = tmp_path / "price_list.json"
+    _write_services(path, ["Sobrancelha"])
+    provider = CatalogProvider(file_path=str(path), check_interval=0)
+    provider.add_reload_listener(menu.invalidate_services_menu)
+    monkeypatch.setattr(menu, "catalog_provider", provider)
+    menu.invalidate_services_menu()
+
+    assert "Buço" not in menu.get_services_menu().text
+
+    _write_services(path, ["Sobrancelha", "Buço"])
+    _touch(path, 1_000_000)
+
+    updated = menu.get_services_menu()
+    assert updated.version == 2
+    assert "2. Buço" in updated.text
+    assert list(menu._menus) == [2]
+
+    menu.invalidate_services_menu()
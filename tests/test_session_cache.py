@@ -0,0 +1,133 @@
+import asyncio
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy import event, update
+
+from backend.core import session_cache as session_cache_module
+from backend.core.session_cache import CachedSession, SessionCache, session_cache
+from backend.db.models import ConversationSession
+from backend.db.session import SessionLocal, engine
+from backend.routes import webhook
+
+PHONE = "5511999990000"
+
+@pytest.fixture
+def statements():
+    seen = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        seen.append(statement)
+
+    event.listen(engine, "before_cursor_execute", record)
+    yield seen
+    event.remove(engine, "before_cursor_execute", record)
+
+def _load(phone: str = PHONE) -> CachedSession:
+    db = SessionLocal()
+    try:
+        return asyncio.run(webhook.get_or_create_session_async(db, phone))
+    finally:
+        db.close()
+
+def _save(session: CachedSession):
+    db = SessionLocal()
+    try:
+        asyncio.run(webhook.persist_session(db, session))
+    finally:
+        db.close()
+
+def _saved_session() -> CachedSession:
+    session = _load()
+    webhook.update_session(session, current_step="awaiting_service", conversation_data={"status": "awaiting_service"})
+    _save(session)
+    return session
+
+def _session_writes(statements: list) -> list:
+    return [sql for sql in statements if sql.startswith(("INSERT INTO conversation_sessions", "UPDATE conversation_sessions"))]
+
+def test_cached_session_is_reused_without_select(statements):
+    session = _saved_session()
+    statements.clear()
+
+    assert _load() is session
+    assert not any("FROM conversation_sessions" in sql for sql in statements)
+    assert session_cache.stats()["hits"] >= 1
+
+def test_only_dirty_fields_are_written(statements):
+    session = _saved_session()
+    statements.clear()
+
+    webhook.update_session(session, current_step="awaiting_date", status="active")
+    _save(session)
+
+    [sql] = _session_writes(statements)
+    set_clause = sql.split(" WHERE ")[0]
+    assert "current_step" in set_clause
+    assert "last_interaction" in set_clause
+    # status não mudou; dados e mute não foram tocados
+    for column in ("conversation_data", "status", "is_muted"):
+        assert column not in set_clause
+
+    # Nada alterado: nenhuma escrita
+    statements.clear()
+    webhook.update_session(session, current_step="awaiting_date")
+    _save(session)
+    assert _session_writes(statements) == []
+
+def test_version_conflict_discards_entry_and_rereads():
+    session = _saved_session()
+
+    # Outro processo atendeu o mesmo telefone nesse meio-tempo
+    db = SessionLocal()
+    try:
+        db.execute(
+            update(ConversationSession)
+            .where(ConversationSession.phone == PHONE)
+            .values(current_step="awaiting_name", last_interaction=datetime.now() + timedelta(seconds=1))
+        )
+        db.commit()
+    finally:
+        db.close()
+
+    webhook.update_session(session, current_step="awaiting_time")
+    with pytest.raises(webhook.StaleSessionError):
+        _save(session)
+
+    assert session_cache.stats()["conflicts"] == 1
+    assert session_cache.stats()["size"] == 0
+
+    fresh = _load()
+    assert fresh is not session
+    assert fresh.current_step == "awaiting_name"
+
+def test_idle_entries_expire_after_ttl(monkeypatch):
+    clock = [1000.0]
+    monkeypatch.setattr(session_cache_module, "time", SimpleNamespace(monotonic=lambda: clock[0]))
+
+    cache = SessionCache(capacity=10, ttl_seconds=60)
+    session = CachedSession(PHONE, "awaiting_service", {}, "active", False, version=datetime.now())
+    cache.put(session)
+
+    clock[0] += 30
+    assert cache.get(PHONE) is session
+
+    # O uso renova a entrada: 59 s depois do último get ainda vale
+    clock[0] += 59
+    assert cache.get(PHONE) is session
+
+    clock[0] += 61
+    assert cache.get(PHONE) is None
+    assert cache.stats()["expired"] == 1
+
+def test_new_or_dirty_sessions_are_not_cached():
+    cache = SessionCache(capacity=10, ttl_seconds=60)
+
+    cache.put(CachedSession(PHONE, "initial", {}, "active", False, is_new=True))
+    assert cache.get(PHONE) is None
+
+    session = CachedSession(PHONE, "initial", {}, "active", False, version=datetime.now())
+    session.set("current_step", "awaiting_service")
+    cache.put(session)
+    assert cache.get(PHONE) is None